@@ -1,16 +1,16 @@
+from authorization_server.apis import utils as api_utils
+
+
 class ApiError(Exception):
     """Base Error Class"""
 
+    code = 400
+
     def __init__(self, message=None, envelop=None):
         super().__init__()
         self.envelop = envelop
-        self.code = 400
-        self.message = message
         # message could be a) the message only; b) the envelop only; c) both the envelop and the message
-        if self.envelop and self.message:
-            self.message = self.envelop.replace('{description}', self.message)
-        elif self.envelop:
-            self.message = self.envelop
+        self.message = api_utils.wrap(envelop, message) if envelop else message
 
     def as_dict(self):
         return {
@@ -25,36 +25,28 @@ class ApiError(Exception):
 
 
 class BadRequest400Error(ApiError):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.code = 400
+    code = 400
 
 
 class NotAuthorization401(ApiError):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.code = 401
+    code = 401
 
 
 class Forbidden403Error(ApiError):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.code = 403
+    code = 403
 
 
 class NotFound404Error(ApiError):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.code = 404
+    code = 404
 
 
 class Conflict409Error(ApiError):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.code = 409
+    code = 409
 
 
 class Server500Error(ApiError):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.code = 500
+    code = 500
+
+
+class ServiceUnavailable503Error(ApiError):
+    code = 503
@@ -1,7 +1,8 @@
 from flask import Blueprint
 from flask_restplus import Api
-from authorization_server.apis import errors as api_errors
-from authorization_server.apis.namespaces import client
+from authorization_server import errors
+from authorization_server.apis import errors as api_errors, utils as api_utils
+from authorization_server.apis.namespaces import client, keys, metrics
 
 
 api_v1 = Blueprint('apis', __name__)
@@ -23,8 +24,18 @@ def default_error_handler(error):
 @api.errorhandler(api_errors.NotFound404Error)
 @api.errorhandler(api_errors.Conflict409Error)
 @api.errorhandler(api_errors.Server500Error)
+@api.errorhandler(api_errors.ServiceUnavailable503Error)
 def handle_error(error):
     return error.to_response()
 
 
+@api.errorhandler(errors.CryptoExecutorError)
+def handle_crypto_executor_error(error):
+    error = api_errors.ServiceUnavailable503Error(message=str(error), envelop=api_utils.RESPONSE_503)
+    response, code = error.to_response()
+    return response, code, {'Retry-After': '1'}
+
+
 api.add_namespace(client.api, '/client')
+api.add_namespace(keys.api, '/keys')
+api.add_namespace(metrics.api, '/metrics')
@@ -1,10 +1,11 @@
 import json
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import exc
-from flask import request
+from flask import request, current_app
 from flask_restplus import Resource, fields
-from authorization_server import models, oauth_code
-from authorization_server.app import db, bcrypt
+from authorization_server import models, oauth_code, urls, utils
+from authorization_server.app import db, secret_cache, secret_hasher, client_cache
 from authorization_server.apis.namespace import NameSpace
 from authorization_server.apis import utils as api_utils, errors as api_errors
 
@@ -33,7 +34,29 @@ authorization_code_dto = api.model('JwtToken', {
                                 required=True,
                                 description="The type of the authorisation. Only 'authorization_code' is supported"),
     'code': fields.String(required=True, description='JWS-type token for requesting a JWT Access Token'),
-    'client_secret': fields.String(required=True, max_length=20, description="Password provided at registration time")
+    'client_secret': fields.String(required=True, max_length=64, description="Password provided at registration time")
+})
+
+batch_authorization_code_dto = api.model('BatchJwtToken', {
+    'client_secret': fields.String(required=True, max_length=64, description="Password provided at registration time"),
+    'codes': fields.List(fields.Nested(api.model('BatchJwtTokenCode', {
+        'grand_type': fields.String(max_length=40,
+                                    required=True,
+                                    description="The type of the authorisation. Only 'authorization_code' is "
+                                                "supported"),
+        'code': fields.String(required=True, description='JWS-type token for requesting a JWT Access Token')
+    })), required=True, description='Authorisation codes to exchange, all issued to the same client')
+})
+
+# Unique fields of a registration and how they are named in conflict errors
+UNIQUE_REGISTRATION_FIELDS = {'email': 'Email', 'web_url': 'Web url', 'redirect_uri': 'Redirect uri'}
+
+introspection_dto = api.model('Introspection', {
+    'client_id': fields.String(max_length=40, required=True, description='Unique client_id of the caller'),
+    'client_secret': fields.String(required=True, max_length=64, description="Password provided at registration time"),
+    'token': fields.String(description='JWT Access Token to introspect'),
+    'tokens': fields.List(fields.String,
+                          description='Batch of JWT Access Tokens to introspect in a single call instead of a token')
 })
 
 
@@ -48,38 +71,7 @@ class Registration(Resource):
         '''Register a new client application
         '''
 
-        if not isinstance(api.payload, dict):
-            raise api_errors.BadRequest400Error(
-                message='Incorrect type of object received. Instead a json object is expected',
-                envelop=api_utils.RESPONSE_400)
-
-        # Do we have all expected fields?
-        expected_fields = registration_dto.keys()
-        for key in expected_fields:
-            if key not in api.payload:
-                raise api_errors.BadRequest400Error(message=f"Required key '{key}' not found",
-                                                    envelop=api_utils.RESPONSE_400)
-
-        # Ensure that both the received redirect_uri and web_url are valid and start by https
-        if not all(map(api_utils.is_url_valid, (api.payload['web_url'], api.payload['redirect_uri']))):
-            raise api_errors.Conflict409Error(message=f"Either the 'redirect_uri' or 'web_url' is not a valid url. "
-                                                      f"A valid url must start by 'https://'",
-                                              envelop=api_utils.RESPONSE_409)
-
-        # has the client already registered?
-        if db.session.query(models.Application).filter_by(email=api.payload['email']).first():
-            raise api_errors.Conflict409Error(message=f"Email '{api.payload['email']}' has already been registered",
-                                              envelop=api_utils.RESPONSE_409)
-
-        # Let's register the client
-        data = api.payload
-        data['id'] = models.Application.generate_id()
-        db.session.add(models.Application(**data))
-        db.session.commit()
-
-        response = dict(api_utils.RESPONSE_201_REGISTRATION_POST)
-        response['id'] = data['id']
-        return response, 201
+        return register_client(api.payload)
 
 
 @api.route('/verification')
@@ -93,78 +85,230 @@ class Verification(Resource):
         '''Verify a client application registration given a one-off token provided a registration time
         '''
 
+        return verify_client(api.payload, request.url.replace('verification', 'registration'))
+
+
+@api.route('/')
+class Token(Resource):
+
+    @api.expect(authorization_code_dto)
+    @api.response_error(api_errors.BadRequest400Error(message=api_utils.RESPONSE_400))
+    @api.response_error(api_errors.NotAuthorization401(message=api_utils.RESPONSE_401))
+    @api.response_error(api_errors.Forbidden403Error(message=api_utils.RESPONSE_403))
+    @api.response(201, json.dumps(api_utils.RESPONSE_201_TOKEN_POST), body=False)
+    def post(self):
+
+        return issue_token(api.payload)
+
+
+@api.route('/batch')
+class BatchToken(Resource):
+
+    @api.expect(batch_authorization_code_dto)
+    @api.response_error(api_errors.BadRequest400Error(message=api_utils.RESPONSE_400))
+    @api.response(200, json.dumps(api_utils.RESPONSE_200_BATCH_TOKEN_POST), body=False)
+    def post(self):
+        '''Exchange several authorisation codes of a client for JWT Access Tokens in a single call
+        '''
+
         if not isinstance(api.payload, dict):
             raise api_errors.BadRequest400Error(
                 message='Incorrect type of object received. Instead a json object is expected',
                 envelop=api_utils.RESPONSE_400)
 
         # Do we have all expected fields?
-        expected_fields = verification_dto.keys()
+        expected_fields = batch_authorization_code_dto.keys()
         for key in expected_fields:
             if key not in api.payload:
                 raise api_errors.BadRequest400Error(message=f"Required key '{key}' not found",
                                                     envelop=api_utils.RESPONSE_400)
 
-        # Client should exist, should not have verified before and the token should match the one stored in the db
-        try:
-            db_data = db.session.\
-                query(models.Application).\
-                filter_by(id=api.payload['id'], reg_token=api.payload['reg_token'], is_allowed=True).\
-                one()
-        except exc.NoResultFound:
-            raise api_errors.Conflict409Error(message=f"Client '{api.payload['id']}' may not yet have registered "
-                                                      f"or token is invalid. Please register first at "
-                                                      f"{request.url.replace('verification', 'registration')}",
-                                              envelop=api_utils.RESPONSE_409)
-        else:
-            client_secret = api_utils.generate_password(10)
-            db_data.client_secret = bcrypt.generate_password_hash(client_secret).decode('utf-8')
-            db_data.token = None
-            db.session.add(db_data)
-            db.session.commit()
-
-            response = dict(api_utils.RESPONSE_201_VERIFICATION_POST)
-            response['id'] = db_data.id
-            response['client_secret'] = client_secret
-            return response, 201
+        codes = api.payload['codes']
+        batch_limit = current_app.config['TOKEN_BATCH_LIMIT']
+        if not isinstance(codes, list) or len(codes) > batch_limit or \
+                not all(isinstance(code, dict) for code in codes):
+            raise api_errors.BadRequest400Error(message=f"'codes' must be a list of at most {batch_limit} objects",
+                                                envelop=api_utils.RESPONSE_400)
 
+        batch = oauth_code.AuthorisationTokenBatch(
+            client_secret=api.payload['client_secret'],
+            codes=[{'grand_type': code.get('grand_type'), 'code': code.get('code')} for code in codes])
+        valid = set(batch.validate_request())
 
-@api.route('/')
-class Token(Resource):
+        tokens = [{'token': auth_code.response(), 'token_type': 'bearer'} if auth_code in valid
+                  else token_error(auth_code.errors).as_dict() for auth_code in batch.tokens]
+        return {'tokens': tokens}, 200, {'Cache-Control': 'no-store', 'Pragma': 'no-cache'}
 
-    @api.expect(authorization_code_dto)
+
+def token_error(errors):
+    '''Map the errors of an oauth_code.AuthorisationToken request onto the matching ApiError
+    '''
+
+    if errors['code'] == 400:
+        return api_errors.BadRequest400Error(message=errors['error_description'], envelop=api_utils.RESPONSE_400)
+    if errors['code'] == 401:
+        return api_errors.NotAuthorization401(message=errors['error_description'], envelop=api_utils.RESPONSE_401)
+    return api_errors.Forbidden403Error(message=errors['error_description'], envelop=api_utils.RESPONSE_403)
+
+
+def register_client(payload):
+    '''Register a new client application
+
+    :return: tuple (response, code)
+    '''
+
+    if not isinstance(payload, dict):
+        raise api_errors.BadRequest400Error(
+            message='Incorrect type of object received. Instead a json object is expected',
+            envelop=api_utils.RESPONSE_400)
+
+    # Do we have all expected fields?
+    expected_fields = registration_dto.keys()
+    for key in expected_fields:
+        if key not in payload:
+            raise api_errors.BadRequest400Error(message=f"Required key '{key}' not found",
+                                                envelop=api_utils.RESPONSE_400)
+
+    # Ensure that both the received redirect_uri and web_url are valid and start by https
+    if not all(map(urls.is_url_valid, (payload['web_url'], payload['redirect_uri']))):
+        raise api_errors.Conflict409Error(message=f"Either the 'redirect_uri' or 'web_url' is not a valid url. "
+                                                  f"A valid url must start by 'https://'",
+                                          envelop=api_utils.RESPONSE_409)
+
+    # Let's register the client. Whether it has already registered is told by the unique constraints of the table
+    # rather than checked beforehand: a single round trip that also holds under concurrent registrations
+    data = payload
+    data['id'] = models.Application.generate_id()
+    db.session.add(models.Application(**data))
+    try:
+        db.session.commit()
+    except IntegrityError as ex:
+        db.session.rollback()
+        column = utils.duplicate_column(ex)
+        if column not in UNIQUE_REGISTRATION_FIELDS:
+            raise
+        raise api_errors.Conflict409Error(message=f"{UNIQUE_REGISTRATION_FIELDS[column]} '{data[column]}' has already "
+                                                  f"been registered",
+                                          envelop=api_utils.RESPONSE_409)
+    client_cache.invalidate(data['id'])
+
+    response = dict(api_utils.RESPONSE_201_REGISTRATION_POST)
+    response['id'] = data['id']
+    return response, 201
+
+
+def verify_client(payload, registration_url):
+    '''Verify a client application registration given its one-off registration token, issuing its client secret
+
+    :param registration_url: url of the registration resource, to point unregistered clients at
+    :return: tuple (response, code)
+    '''
+
+    if not isinstance(payload, dict):
+        raise api_errors.BadRequest400Error(
+            message='Incorrect type of object received. Instead a json object is expected',
+            envelop=api_utils.RESPONSE_400)
+
+    # Do we have all expected fields?
+    expected_fields = verification_dto.keys()
+    for key in expected_fields:
+        if key not in payload:
+            raise api_errors.BadRequest400Error(message=f"Required key '{key}' not found",
+                                                envelop=api_utils.RESPONSE_400)
+
+    # Client should exist, should not have verified before and the token should match the one stored in the db
+    try:
+        db_data = db.session.\
+            query(models.Application).\
+            filter_by(id=payload['id'], reg_token=payload['reg_token'], is_allowed=True).\
+            one()
+    except exc.NoResultFound:
+        raise api_errors.Conflict409Error(message=f"Client '{payload['id']}' may not yet have registered "
+                                                  f"or token is invalid. Please register first at {registration_url}",
+                                          envelop=api_utils.RESPONSE_409)
+    else:
+        client_secret = api_utils.generate_password(current_app.config['CLIENT_SECRET_LENGTH'])
+        db_data.client_secret = secret_hasher.hash(client_secret)
+        db_data.token = None
+        db.session.add(db_data)
+        db.session.commit()
+        secret_cache.invalidate(db_data.id)
+        client_cache.invalidate(db_data.id)
+
+        response = dict(api_utils.RESPONSE_201_VERIFICATION_POST)
+        response['id'] = db_data.id
+        response['client_secret'] = client_secret
+        return response, 201
+
+
+def issue_token(payload):
+    '''Exchange an authorisation code for a JWT Access Token
+
+    :return: tuple (response, code, headers)
+    '''
+
+    if not isinstance(payload, dict):
+        raise api_errors.BadRequest400Error(
+            message='Incorrect type of object received. Instead a json object is expected',
+            envelop=api_utils.RESPONSE_400)
+
+    # Do we have all expected fields?
+    expected_fields = authorization_code_dto.keys()
+    for key in expected_fields:
+        if key not in payload:
+            raise api_errors.BadRequest400Error(message=f"Required key '{key}' not found",
+                                                envelop=api_utils.RESPONSE_400)
+    auth_code = oauth_code.AuthorisationToken(url_args={
+        'grand_type': payload['grand_type'],
+        'code': payload['code'],
+        'client_secret': payload['client_secret']
+    })
+
+    # Validate request
+    if not auth_code.validate_request():
+        raise token_error(auth_code.errors)
+    return {'token': auth_code.response(), 'token_type': 'bearer'}, 201, \
+           {'Cache-Control': 'no-store', 'Pragma': 'no-cache'}
+
+
+@api.route('/introspection')
+class Introspection(Resource):
+
+    @api.expect(introspection_dto)
     @api.response_error(api_errors.BadRequest400Error(message=api_utils.RESPONSE_400))
     @api.response_error(api_errors.NotAuthorization401(message=api_utils.RESPONSE_401))
-    @api.response_error(api_errors.Forbidden403Error(message=api_utils.RESPONSE_403))
-    @api.response(201, json.dumps(api_utils.RESPONSE_201_TOKEN_POST), body=False)
+    @api.response(200, json.dumps(api_utils.RESPONSE_200_INTROSPECTION_POST), body=False)
     def post(self):
+        '''Introspect one JWT Access Token -or a batch of them- as defined by RFC 7662. Only registered clients,
+        authenticated with their client_id and client_secret, may introspect tokens
+        '''
 
         if not isinstance(api.payload, dict):
             raise api_errors.BadRequest400Error(
                 message='Incorrect type of object received. Instead a json object is expected',
                 envelop=api_utils.RESPONSE_400)
 
-        # Do we have all expected fields?
-        expected_fields = authorization_code_dto.keys()
-        for key in expected_fields:
+        for key in ('client_id', 'client_secret'):
             if key not in api.payload:
                 raise api_errors.BadRequest400Error(message=f"Required key '{key}' not found",
                                                     envelop=api_utils.RESPONSE_400)
-        auth_code = oauth_code.AuthorisationToken(url_args={
-            'grand_type': api.payload['grand_type'],
-            'code': api.payload['code'],
-            'client_secret': api.payload['client_secret']
-        })
-
-        # Validate request
-        if not auth_code.validate_request():
-            if auth_code.errors['code'] == 400:
-                raise api_errors.BadRequest400Error(message=auth_code.errors['error_description'],
+        if not oauth_code.authenticate_client(api.payload['client_id'], api.payload['client_secret']):
+            raise api_errors.NotAuthorization401(message="The client provided a 'client_id' and 'client_secret' that "
+                                                         "don't match",
+                                                 envelop=api_utils.RESPONSE_401)
+
+        if 'tokens' in api.payload:
+            tokens = api.payload['tokens']
+            batch_limit = current_app.config['INTROSPECTION_BATCH_LIMIT']
+            if not isinstance(tokens, list) or len(tokens) > batch_limit:
+                raise api_errors.BadRequest400Error(message=f"'tokens' must be a list of at most {batch_limit} "
+                                                            f"tokens",
                                                     envelop=api_utils.RESPONSE_400)
-            if auth_code.errors['code'] == 401:
-                raise api_errors.NotAuthorization401(message=auth_code.errors['error_description'],
-                                                     envelop=api_utils.RESPONSE_401)
-            raise api_errors.Forbidden403Error(message=auth_code.errors['error_description'],
-                                               envelop=api_utils.RESPONSE_403)
-        return {'token': auth_code.response(), 'token_type': 'bearer'}, 201, \
-               {'Cache-Control': 'no-store', 'Pragma': 'no-cache'}
+            return {'tokens': [oauth_code.introspect_token(token) for token in tokens]}, 200, \
+                {'Cache-Control': 'no-store', 'Pragma': 'no-cache'}
+
+        if 'token' not in api.payload:
+            raise api_errors.BadRequest400Error(message="Required key 'token' not found",
+                                                envelop=api_utils.RESPONSE_400)
+        return oauth_code.introspect_token(api.payload['token']), 200, \
+            {'Cache-Control': 'no-store', 'Pragma': 'no-cache'}
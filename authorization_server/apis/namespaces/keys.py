@@ -0,0 +1,24 @@
+from flask import request, jsonify, current_app
+from flask_restplus import Resource
+from authorization_server.app import key_ring
+from authorization_server.apis.namespace import NameSpace
+
+api = NameSpace('keys', description="Public keys used by resource servers to verify the JWT Tokens issued by the "
+                                    "Authorisation server")
+
+
+@api.route('/jwks.json')
+class Jwks(Resource):
+
+    @api.response(200, 'JWK Set -rfc7517- of all active public keys', body=False)
+    @api.response(304, 'The JWK Set has not changed since the ETag provided in If-None-Match', body=False)
+    def get(self):
+        '''Publish the public keys used to sign JWT Tokens, including those about to sign and those retiring
+        '''
+
+        document, digest = key_ring.jwks()
+        response = jsonify(document)
+        response.set_etag(digest)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['JWKS_MAX_AGE']
+        return response.make_conditional(request)
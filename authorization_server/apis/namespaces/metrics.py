@@ -0,0 +1,53 @@
+import os
+
+from flask import current_app
+from flask_restplus import Resource
+from authorization_server import pool
+from authorization_server.app import db, client_cache, introspection_cache, user_cache, redirect_registry
+from authorization_server.apis import errors as api_errors, utils as api_utils
+from authorization_server.apis.namespace import NameSpace
+
+api = NameSpace('metrics', description="Internal metrics of the worker process serving the request. Only served if "
+                                       "METRICS_ENABLED is set")
+
+# Per-process caches reported by /metrics/caches
+CACHES = {
+    'client_cache': client_cache,
+    'introspection_cache': introspection_cache,
+    'user_cache': user_cache,
+    'redirect_registry': redirect_registry
+}
+
+
+def ensure_enabled():
+    if not current_app.config['METRICS_ENABLED']:
+        raise api_errors.NotFound404Error(message='Metrics are not enabled', envelop=api_utils.RESPONSE_404)
+
+
+@api.route('/pool')
+class Pool(Resource):
+
+    @api.response_error(api_errors.NotFound404Error(message=api_utils.RESPONSE_404))
+    @api.response(200, 'Connections checked out, idle and in overflow and checkout wait time percentiles in '
+                       'milliseconds', body=False)
+    def get(self):
+        '''Report the state of the database connection pool of the worker process, so that pools can be sized
+        '''
+
+        ensure_enabled()
+        return pool.pool_stats(db.engine.pool), 200, {'Cache-Control': 'no-store'}
+
+
+@api.route('/caches')
+class Caches(Resource):
+
+    @api.response_error(api_errors.NotFound404Error(message=api_utils.RESPONSE_404))
+    @api.response(200, 'Hits, misses, size and maximum size of each per-process cache', body=False)
+    def get(self):
+        '''Report the hit and miss counters of the caches of the worker process, so that caches can be sized
+        '''
+
+        ensure_enabled()
+        response = {name: cache.stats() for name, cache in CACHES.items()}
+        response['pid'] = os.getpid()
+        return response, 200, {'Cache-Control': 'no-store'}
@@ -1,34 +1,72 @@
-import string
 import re
+import string
 
+from collections import namedtuple
 from secrets import choice
 
+PLACEHOLDER = '{description}'
+ENVELOP_NAME = re.compile(r'RESPONSE_(\d{3})(?:_(\w+))?$')
+
+Envelop = namedtuple('Envelop', ['template', 'prefix', 'suffix'])
+
 RESPONSE_201 = "A new object has been created. Uri: {description}"
 RESPONSE_201_REGISTRATION_POST = {'id': 'Unique Client ID'}
 RESPONSE_201_VERIFICATION_POST = {'id': 'Unique Client ID', 'client_secret': "Client's secret password"}
 RESPONSE_201_TOKEN_POST = {'token': 'JWT Access Token', 'token_type': "Type of token issued. Only 'bearer' supported"}
+RESPONSE_200_BATCH_TOKEN_POST = {'tokens': "A list with, for each code and in the same order, either a 'token' and "
+                                           "'token_type' or an 'error'"}
+RESPONSE_200_INTROSPECTION_POST = {'active': 'Whether the token was issued by us and has not expired',
+                                   'token_type': "Type of the token. Only 'bearer' supported"}
 RESPONSE_400 = "Invalid received data: {description}"
 RESPONSE_401 = "Unauthorised Access to resource: Please see error description: {description}"
 RESPONSE_403 = "Forbidden Access to resource: Please see error description: {description}"
 RESPONSE_404 = "The required object has not been found. Please see error description: {description}"
 RESPONSE_409 = "An error while processing the request occurred. Please see error description: {description}"
 RESPONSE_500 = "Internal Server Error. Please see error description: {description}"
+RESPONSE_503 = "The service is temporarily overloaded. Please see error description: {description}"
+
+
+def make_envelop(template):
+    '''Split an envelop around its '{description}' placeholder once so that wrapping a message up is a concatenation
+    '''
+    prefix, placeholder, suffix = template.partition(PLACEHOLDER)
+    return Envelop(template, prefix, suffix if placeholder else None)
+
+
+def build_catalog(namespace):
+    '''Return a dictionary of the Envelop of every RESPONSE_<CODE>[_<METHOD>] string of a namespace by tuple
+    (code, method)
+    '''
+    catalog = {}
+    for name, value in namespace.items():
+        match = ENVELOP_NAME.match(name)
+        if match and isinstance(value, str):
+            catalog[(int(match.group(1)), match.group(2))] = make_envelop(value)
+    return catalog
+
+
+def wrap(envelop, message=None):
+    '''Wrap a message up with an envelop, given as an Envelop or as its template
+    '''
+    if not isinstance(envelop, Envelop):
+        envelop = ENVELOPS.get(envelop) or make_envelop(envelop)
+    if not message or envelop.suffix is None:
+        return envelop.template
+    return envelop.prefix + message + envelop.suffix
 
 
 def make_response(code, method=None, message=None):
-    '''Build a response as a tuple (message, code) where the message is wrapped up with an envelop that is evaluated
-    at runtime from these modules' CONSTANTS
+    '''Build a response as a tuple (message, code) where the message is wrapped up with the envelop of the code -and
+    method- in the message catalog
 
     :param code: response code
     :param method: a suffix to add to the variable name
     :param message: response message
     :return: tuple response
+    :raises KeyError: if there is no envelop for the code and method
     '''
 
-    envelop = eval('RESPONSE_' + str(code) + ('' if not method else ('_' + method)))
-    if message:
-        envelop = envelop.replace('{description}', message)
-    return {'message': envelop}, code
+    return {'message': wrap(MESSAGES[(code, method)], message)}, code
 
 
 def generate_password(length):
@@ -44,19 +82,6 @@ def generate_password(length):
     return password
 
 
-def is_url_valid(url):
-    '''Check whether an url is valid using Django Validation rules:
-    https://codereview.stackexchange.com/questions/19663/http-url-validating. However we don't want to scrape
-    ftp-like urls
-    '''
-
-    url_regex = re.compile(
-        r'^(?:https)://'  # https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|'  # ...or ipv4
-        r'\[?[A-F0-9]*:[A-F0-9:]+\]?)'  # ...or ipv6
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-
-    return url_regex.match(url) is not None
+# Message catalog: the envelops of this module by tuple (code, method) and by template, built once at import
+MESSAGES = build_catalog(globals())
+ENVELOPS = {envelop.template: envelop for envelop in MESSAGES.values()}
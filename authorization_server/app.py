@@ -1,32 +1,59 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
-from flask_beaker_session import session as beaker_session
-from authorization_server import config
+from authorization_server import config, errors, keys, cache, claims, executor, hashers, replay, replicas, sessions, \
+    urls
 
-db = SQLAlchemy()
+db = replicas.RoutingSQLAlchemy()
 migrate = Migrate()
 bcrypt = Bcrypt()
-session = beaker_session.Session()
+session = sessions.ServerSideSessions()
+key_ring = keys.KeyRing()
+introspection_cache = cache.TTLCache()
+secret_cache = cache.VerifiedSecretCache()
+client_cache = cache.ClientCache()
+redirect_registry = urls.RedirectRegistry()
+user_cache = cache.TTLCache()
+crypto_executor = executor.CryptoExecutor()
+secret_hasher = hashers.SecretHasher(crypto_executor)
+replay_set = replay.ReplaySet()
+claims_validator = claims.ClaimsValidator()
 login_manager = LoginManager()
 login_manager.login_view = "frontend.login"
 login_manager.login_message = "Please log in to see restricted access web pages"
 login_manager.login_message_category = "info"
 
 
+def handle_crypto_executor_error(error):
+    '''Answer a request whose hashing or signing could not be run in time -the crypto executor is saturated- with a 503
+    so that clients back off, rather than with a 500. The API blueprint answers it with its own envelope.
+    '''
+    return str(error), 503, {'Retry-After': '1'}
+
+
 def create_app(config_class=config.Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
     db.init_app(app)
-    session.init_app(app)
     # require to import models here so that migrate knows what to generate
     from authorization_server import models
+    session.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
     login_manager.init_app(app)
+    key_ring.init_app(app)
+    introspection_cache.init_app(app, 'INTROSPECTION_CACHE')
+    secret_cache.init_app(app, 'CLIENT_SECRET_CACHE')
+    client_cache.init_app(app, 'CLIENT_CACHE')
+    redirect_registry.init_app(app, 'REDIRECT_REGISTRY')
+    user_cache.init_app(app, 'USER_CACHE')
+    crypto_executor.init_app(app)
+    secret_hasher.init_app(app)
+    replay_set.init_app(app)
+    claims_validator.init_app(app)
+    app.register_error_handler(errors.CryptoExecutorError, handle_crypto_executor_error)
 
     from authorization_server.frontend.views import frontend
     from authorization_server.apis.handler import api_v1
@@ -35,4 +62,12 @@ def create_app(config_class=config.Config):
     app.register_blueprint(api_v1, url_prefix='/api')
     app.register_blueprint(auth, url_prefix='/auth')
 
+    from authorization_server import commands, retention
+    app.cli.add_command(commands.keys_cli)
+    app.cli.add_command(commands.codes_cli)
+    app.cli.add_command(commands.clients_cli)
+    app.cli.add_command(commands.users_cli)
+    app.cli.add_command(commands.sessions_cli)
+    retention.scheduler.init_app(app)
+
     return app
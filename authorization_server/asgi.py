@@ -0,0 +1,110 @@
+'''ASGI serving mode for the client registration, verification and token endpoints, e.g.:
+
+    uvicorn --factory 'authorization_server.asgi:create_asgi_app'
+
+Requests are parsed and answered on the event loop while their blocking work -the same validation as the Flask
+resources, database round trips and cryptography- runs in a bounded thread pool, so slow clients and idle keep-alive
+connections do not hold a thread. The cryptography is further offloaded to the crypto executor processes if
+CRYPTO_EXECUTOR_WORKERS is set. The rest of the application is still served by the WSGI app from create_app.
+'''
+
+import asyncio
+import json
+
+from concurrent import futures
+from authorization_server import config, errors
+from authorization_server.app import create_app, db
+from authorization_server.apis import errors as api_errors, utils as api_utils
+from authorization_server.apis.namespaces import client
+
+ROUTES = {
+    '/api/client/': lambda payload, url: client.issue_token(payload),
+    '/api/client/registration': lambda payload, url: client.register_client(payload),
+    '/api/client/verification': lambda payload, url: client.verify_client(
+        payload, url.replace('verification', 'registration'))
+}
+
+
+class ASGIApp:
+    '''ASGI 3 application serving the POST-only resources in ROUTES within the context of a Flask app
+    '''
+
+    def __init__(self, app, workers=None):
+        self.app = app
+        self.executor = futures.ThreadPoolExecutor(max_workers=workers or app.config['ASGI_EXECUTOR_WORKERS'],
+                                                   thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        handler = ROUTES.get(scope['path'])
+        if handler is None:
+            error = api_errors.NotFound404Error(message=f"'{scope['path']}' does not exist",
+                                                envelop=api_utils.RESPONSE_404)
+            return await self.respond(send, *error.to_response())
+        if scope['method'] != 'POST':
+            return await self.respond(send, {'message': 'The method is not allowed for the requested URL.'}, 405,
+                                      {'Allow': 'POST'})
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+
+        host = dict(scope['headers']).get(b'host', b'localhost').decode('latin-1')
+        url = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}{scope['path']}"
+        loop = asyncio.get_event_loop()
+        await self.respond(send, *await loop.run_in_executor(self.executor, self.dispatch, handler, payload, url))
+
+    def dispatch(self, handler, payload, url):
+        '''Run a handler in the context of the Flask app and turn its outcome into a tuple (body, code[, headers])
+        '''
+
+        with self.app.app_context():
+            try:
+                return handler(payload, url)
+            except api_errors.ApiError as error:
+                return error.to_response()
+            except errors.CryptoExecutorError as ex:
+                error = api_errors.ServiceUnavailable503Error(message=str(ex), envelop=api_utils.RESPONSE_503)
+                return error.to_response() + ({'Retry-After': '1'},)
+            except Exception:
+                self.app.logger.exception('Unhandled error serving an ASGI request')
+                return api_errors.Server500Error(message='Internal Server Error').to_response()
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    async def respond(send, body, code, headers=None):
+        content = json.dumps(body).encode()
+        headers = dict(headers or {}, **{'Content-Type': 'application/json', 'Content-Length': str(len(content))})
+        await send({
+            'type': 'http.response.start',
+            'status': code,
+            'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+
+def create_asgi_app(config_class=config.Config):
+    return ASGIApp(create_app(config_class))
@@ -1,7 +1,14 @@
 from flask_wtf import FlaskForm
-from wtforms import SubmitField
+from wtforms import HiddenField, SubmitField
+from wtforms.validators import DataRequired
 
 
 class AuthorisationForm(FlaskForm):
+    # The consent ticket is signed, short-lived, single-use and bound to the resource owner, which makes a session-held
+    # CSRF token redundant
+    class Meta:
+        csrf = False
+
+    ticket = HiddenField(validators=[DataRequired()])
     cancel = SubmitField('Cancel')
     allow = SubmitField('Allow')
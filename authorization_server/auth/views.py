@@ -1,5 +1,6 @@
-from flask import Blueprint, request, render_template, redirect, session, url_for
-from authorization_server import utils, oauth_code
+from flask import Blueprint, request, render_template, redirect, url_for
+from flask_login import current_user
+from authorization_server import consent, utils, oauth_code
 from authorization_server.auth.forms import AuthorisationForm
 
 auth = Blueprint('auth', __name__, static_folder='../static/auth')
@@ -16,7 +17,7 @@ def code_request():
     # Is the request valid both in format and semantics => show authorisation form
     if valid_request:
         form = AuthorisationForm()
-        session['auth_code_request'] = auth_code.as_dict()
+        form.ticket.data = consent.issue_ticket(auth_code, current_user.get_id())
         return render_template('auth/code.html', client_app=auth_code, form=form, errors=False)
 
     # ... Or perhaps there is an error that the user should know as specified by oAuth 2.0? => show error on page
@@ -39,17 +40,17 @@ def code_response():
     ''' Handle the authorisation response to be sent to a client after user's decision.
     '''
 
-    # Not coming from code_request? => redirect to code_request
-    if 'auth_code_request' not in session:
-        return redirect(url_for('auth.code_request'))
-
-    # Coming from code_request but form was not submitted => redirect back to code_request
+    # Form was not submitted => redirect back to code_request
     form = AuthorisationForm()
     if not form.validate_on_submit():
         return redirect(url_for('auth.code_request'))
 
+    # Not coming from code_request -the ticket is forged, expired, used or someone else's-? => redirect to code_request
+    auth_code_request = consent.redeem_ticket(form.ticket.data, current_user.get_id())
+    if auth_code_request is None:
+        return redirect(url_for('auth.code_request'))
+
     # Process response from Resource Owner
-    auth_code_request = session['auth_code_request']
     url = auth_code_request['redirect_uri']
     if form.cancel.data:
         error_description = "The resource owner explicitly denied the required sought permissions"
@@ -0,0 +1,161 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class TTLCache:
+    '''Thread-safe and size-bounded LRU mapping whose entries expire after a time-to-live. Used as a per-process cache
+    shared by all threads of a worker.
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, prefix):
+        '''Size and time-to-live the cache from the '<prefix>_SIZE' and '<prefix>_TTL' settings. The cache is emptied.
+        '''
+        self.maxsize = app.config[f"{prefix}_SIZE"]
+        self.ttl = app.config[f"{prefix}_TTL"]
+        self.clear()
+
+    def get(self, key, default=None, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            try:
+                expires, stored, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, now=None):
+        '''Store a value for 'ttl' seconds -or the cache's default time-to-live-, evicting the least recently used
+        entry if the cache is full
+        '''
+        now = time.monotonic() if now is None else now
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = now + ttl, now, value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[2]
+
+    def age(self, key, now=None):
+        '''Return the seconds since a live entry was stored or None if there is no such entry
+        '''
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+        return now - entry[1] if entry is not None and entry[0] > now else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VerifiedSecretCache(TTLCache):
+    '''Remember, for a short time, that a client authenticated with its secret so that repeat authentications cost
+    an HMAC instead of a bcrypt round. Only an HMAC -keyed with a per-process random key- of the client id, the
+    secret and the stored hash is kept, never the secret itself. As the stored hash is part of the HMAC, an entry no
+    longer matches once the client's secret is rewritten, even in processes that were not told to invalidate it.
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        super().__init__(maxsize, ttl)
+        self._key = secrets.token_bytes(32)
+
+    def _digest(self, client_id, secret, pw_hash):
+        message = '\0'.join((str(client_id), secret, pw_hash)).encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def is_verified(self, client_id, secret, pw_hash):
+        digest = self.get(client_id)
+        return digest is not None and hmac.compare_digest(digest, self._digest(client_id, secret, pw_hash))
+
+    def remember(self, client_id, secret, pw_hash):
+        self.set(client_id, self._digest(client_id, secret, pw_hash))
+
+    def invalidate(self, client_id):
+        self.pop(client_id)
+
+
+class ClientCache(TTLCache):
+    '''Read-through cache of the metadata of client applications -name, description, urls and secret hash-, which
+    rarely changes, so that requesting a code or exchanging it for a token does not query the database every time.
+    Entries are invalidated whenever a client is updated by this process; other processes see the update within the
+    cache's time-to-live at most.
+    '''
+
+    def fetch_many(self, client_ids, loader):
+        '''Return a dictionary of the metadata of the given clients that exist
+
+        :param loader: callable that, given the ids of the clients not cached, returns a dictionary of their metadata
+        '''
+        clients = {}
+        missing = []
+        for client_id in set(client_ids):
+            client = self.get(client_id)
+            if client is None:
+                missing.append(client_id)
+            else:
+                clients[client_id] = client
+        if missing:
+            loaded = loader(missing)
+            for client_id, client in loaded.items():
+                self.set(client_id, client)
+            clients.update(loaded)
+        return clients
+
+    def fetch(self, client_id, loader):
+        '''Return the metadata of a client or None if it does not exist
+        '''
+        return self.fetch_many([client_id], loader).get(client_id)
+
+    def refresh(self, client_id, loader, min_age, now=None):
+        '''Load the metadata of a client again, unless its entry was stored less than 'min_age' seconds ago, and return
+        it. Bounds how often requests -i.e. failed authentications- can make the cache go back to the database.
+        '''
+        age = self.age(client_id, now)
+        if age is not None and age < min_age:
+            return self.get(client_id, now=now)
+        self.invalidate(client_id)
+        return self.fetch(client_id, loader)
+
+    def invalidate(self, client_id):
+        self.pop(client_id)
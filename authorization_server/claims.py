@@ -0,0 +1,56 @@
+import time
+
+from authorization_server import errors
+
+TIME_CLAIMS = ('exp', 'nbf', 'iat')
+
+
+class ClaimsValidator:
+    '''Validate the time claims -rfc7519- of authorisation codes and access tokens: 'exp', 'nbf' and 'iat' are integer
+    seconds since the epoch, so checking them is a couple of integer comparisons. A leeway of JWT_CLOCK_SKEW seconds
+    absorbs the clock differences between the servers issuing and checking them.
+
+    Codes and tokens are signed with the same keys, so their claims also carry the 'token_use' they were issued for
+    and are only valid for that use: a code never passes for an access token nor the other way round.
+    '''
+
+    def __init__(self, app=None, leeway=0, required=('exp',)):
+        self.leeway = leeway
+        self.required = required
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.leeway = app.config['JWT_CLOCK_SKEW']
+        app.extensions['claims_validator'] = self
+
+    def issue(self, lifetime, token_use, now=None):
+        '''Return the time and 'token_use' claims of a code or token valid for 'lifetime' seconds from now
+        '''
+        now = int(time.time()) if now is None else now
+        return {'iat': now, 'nbf': now, 'exp': now + lifetime, 'token_use': token_use}
+
+    def validate(self, claims, token_use, now=None):
+        '''Raise errors.ExpiredClaimsError if the claims have expired and errors.InvalidClaimsError if they are
+        otherwise invalid, i.e. they were issued for a use other than 'token_use'
+
+        :return: the claims
+        '''
+        now = time.time() if now is None else now
+        if claims.get('token_use') != token_use:
+            raise errors.InvalidClaimsError(f"The claims were not issued for '{token_use}'")
+        for name in self.required:
+            if name not in claims:
+                raise errors.InvalidClaimsError(f"The '{name}' claim is missing")
+        for name in (name for name in TIME_CLAIMS if name in claims):
+            value = claims[name]
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise errors.InvalidClaimsError(f"The '{name}' claim is not an integer")
+
+        if 'exp' in claims and claims['exp'] <= now - self.leeway:
+            raise errors.ExpiredClaimsError('The claims have expired')
+        if 'nbf' in claims and claims['nbf'] > now + self.leeway:
+            raise errors.InvalidClaimsError('The claims are not valid yet')
+        if 'iat' in claims and claims['iat'] > now + self.leeway:
+            raise errors.InvalidClaimsError('The claims were issued in the future')
+        return claims
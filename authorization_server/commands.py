@@ -0,0 +1,186 @@
+import os
+import time
+import click
+
+from concurrent import futures
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from authorization_server import keys, models, onboarding, partitions, retention, urls
+from authorization_server.app import db, key_ring, secret_hasher, redirect_registry
+
+keys_cli = AppGroup('keys', help='Manage the keys used to sign authorisation codes and JWT Tokens')
+codes_cli = AppGroup('codes', help='Manage the issued authorisation codes')
+clients_cli = AppGroup('clients', help='Manage the client applications')
+users_cli = AppGroup('users', help='Manage the resource owners')
+sessions_cli = AppGroup('sessions', help='Manage the server-side sessions')
+
+
+@keys_cli.command('rotate')
+@click.option('--alg', type=click.Choice(sorted(keys.KEY_PARAMETERS)), default=None,
+              help='Algorithm the new key signs with. Defaults to that of the configured private key')
+@click.option('--size', default=2048, show_default=True, help='Size in bits of the new key if it is an RSA key')
+def rotate_keys(alg, size):
+    '''Generate a new private key in JWT_KEYS_DIR and delete the keys that are no longer published. The new key is
+    published straight away and starts signing JWK_ROTATION_OVERLAP seconds later, when the current signing key starts
+    retiring. Meant to be scheduled -i.e. cron- every rotation period.
+    '''
+
+    keys_dir = current_app.config['JWT_KEYS_DIR']
+    if not keys_dir:
+        raise click.UsageError('JWT_KEYS_DIR is not configured')
+
+    os.makedirs(keys_dir, mode=0o700, exist_ok=True)
+    alg = alg or current_app.config['JWT_ALGORITHM']
+    jwk_obj = keys.generate_key(alg, **({'size': size} if alg == 'RS256' else {}))
+    path = os.path.join(keys_dir, f"{int(time.time())}-{jwk_obj.thumbprint()}.pem")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as fh:
+        fh.write(jwk_obj.export_to_pem(private_key=True, password=None))
+    click.echo(f"New key '{jwk_obj.thumbprint()}' written to '{path}'")
+
+    key_ring.refresh()
+    for expired in key_ring.expired_files():
+        os.remove(expired)
+        click.echo(f"Expired key file '{expired}' deleted")
+
+
+@codes_cli.command('purge')
+@click.option('--batch-size', type=int, default=None,
+              help='Consecutive ids deleted per transaction. Defaults to AUTH_CODE_PURGE_BATCH_SIZE')
+@click.option('--grace', type=int, default=None,
+              help='Seconds expired codes are kept before being purged. Defaults to AUTH_CODE_PURGE_GRACE')
+def purge_codes(batch_size, grace):
+    '''Delete the authorisation codes that expired more than a grace period ago
+    '''
+
+    try:
+        report = retention.purge_codes(batch_size or current_app.config['AUTH_CODE_PURGE_BATCH_SIZE'],
+                                       current_app.config['AUTH_CODE_PURGE_GRACE'] if grace is None else grace)
+    except ValueError as ex:
+        raise click.UsageError(str(ex))
+    click.echo(f"{report.deleted} authorisation codes deleted in {report.batches} batches and "
+               f"{report.seconds:.2f} seconds")
+    for name in report.partitions:
+        click.echo(f"Partition '{name}' dropped")
+
+
+@sessions_cli.command('purge')
+def purge_sessions():
+    '''Delete the expired sessions of the file and SQL session stores. Meant to be scheduled -i.e. cron-. Other stores
+    expire sessions by themselves.
+    '''
+
+    store = current_app.extensions['sessions'].store
+    if not hasattr(store, 'purge'):
+        click.echo(f"{type(store).__name__} expires sessions by itself")
+        return
+    click.echo(f"{store.purge()} expired sessions deleted")
+
+
+@codes_cli.command('partition')
+def partition_codes():
+    '''Partition the authorisation codes table by day -MySQL only- so that purges drop whole partitions. Set
+    AUTH_CODE_PARTITIONED afterwards. The foreign key to the application table is dropped as MySQL does not support
+    foreign keys on partitioned tables.
+    '''
+
+    try:
+        with db.engine.begin() as connection:
+            statements = partitions.partition(connection, current_app.config['AUTH_CODE_PARTITION_DAYS_AHEAD'])
+    except ValueError as ex:
+        raise click.UsageError(str(ex))
+    if not statements:
+        click.echo('The authorisation codes table is partitioned already')
+    for statement in statements:
+        click.echo(statement)
+
+
+def open_credentials(path):
+    '''Open a new file only readable by its owner for the credentials generated by an import
+    '''
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        raise click.UsageError(f"'{path}' already exists")
+    return os.fdopen(fd, 'w', newline='')
+
+
+@clients_cli.command('import')
+@click.argument('source', type=click.File('r'))
+@click.argument('credentials', type=click.Path(dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Format of SOURCE. Defaults to its extension')
+@click.option('--chunk-size', default=1000, show_default=True, help='Clients inserted per statement')
+@click.option('--workers', type=int, default=os.cpu_count(), show_default=True,
+              help='Processes hashing the client secrets if CLIENT_SECRET_SCHEME is a slow scheme')
+def import_clients(source, credentials, fmt, chunk_size, workers):
+    '''Import the client applications of SOURCE -a CSV or JSON Lines file with their name, description, email, web_url
+    and redirect_uri- as verified clients. Their generated id and client secret are written to the new CREDENTIALS file
+    as CSV. Rows that cannot be imported are reported and skipped.
+    '''
+
+    fmt = fmt or ('jsonl' if source.name.endswith(('.jsonl', '.json')) else 'csv')
+    rows = onboarding.read_rows(source, fmt)
+
+    def reject(line, reason):
+        click.echo(f"Line {line}: {reason}", err=True)
+
+    with open_credentials(credentials) as output:
+        if workers > 1 and secret_hasher.default.slow:
+            with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                report = onboarding.import_clients(rows, output, reject, chunk_size, pool)
+        else:
+            report = onboarding.import_clients(rows, output, reject, chunk_size)
+    click.echo(f"{report.imported} clients imported and {report.rejected} rejected in {report.seconds:.2f} seconds")
+
+
+@clients_cli.command('add-redirect-uri')
+@click.argument('client_id')
+@click.argument('uri')
+def add_redirect_uri(client_id, uri):
+    '''Allow a client application to use URI as redirect uri besides the one it registered with. Other processes
+    accept it within REDIRECT_REGISTRY_TTL seconds.
+    '''
+
+    if not urls.is_url_valid(uri):
+        raise click.UsageError(f"'{uri}' is not a valid url. A valid url must start by 'https://'")
+    if db.session.query(models.Application.id).filter_by(id=client_id).scalar() is None:
+        raise click.UsageError(f"Client '{client_id}' does not exist")
+
+    uri = urls.normalise(uri)
+    db.session.add(models.RedirectURI(application_id=client_id, uri=uri))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise click.UsageError(f"'{uri}' is already a redirect uri of client '{client_id}'")
+    redirect_registry.invalidate(client_id)
+    click.echo(f"'{uri}' added to the redirect uris of client '{client_id}'")
+
+
+@users_cli.command('import')
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Format of SOURCE. Defaults to its extension')
+@click.option('--chunk-size', default=1000, show_default=True, help='Users inserted per statement')
+@click.option('--workers', type=int, default=os.cpu_count(), show_default=True,
+              help='Processes hashing the plaintext passwords')
+def import_users(source, fmt, chunk_size, workers):
+    '''Import the resource owners of SOURCE -a CSV or JSON Lines file with their firstname, lastname, email and either
+    a bcrypt password_hash or a plaintext password-. SOURCE is streamed, so its size is not bound by memory. Rows that
+    cannot be imported -i.e. emails already registered- are reported and skipped.
+    '''
+
+    fmt = fmt or ('jsonl' if source.name.endswith(('.jsonl', '.json')) else 'csv')
+    rows = onboarding.read_rows(source, fmt)
+
+    def reject(line, reason):
+        click.echo(f"Line {line}: {reason}", err=True)
+
+    if workers > 1:
+        with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            report = onboarding.import_users(rows, reject, chunk_size, pool)
+    else:
+        report = onboarding.import_users(rows, reject, chunk_size)
+    click.echo(f"{report.imported} users imported and {report.rejected} rejected in {report.seconds:.2f} seconds")
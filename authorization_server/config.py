@@ -5,7 +5,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 from jwcrypto import jwk
 from os.path import join
-from authorization_server import utils, errors
+from authorization_server import utils, errors, keys, pool, replicas
 
 path = Path(__file__).resolve()
 ROOT_PATH = str(path.parents[1])
@@ -15,7 +15,7 @@ dot_env = load_dotenv(join(ROOT_PATH, '.env'))
 @utils.init_class
 class ConfigMixin:
 
-    alg = "RS256"  # as defined by RFC7518
+    alg = "RS256"  # as defined by RFC7518 -or RFC8037 for EdDSA-. Given by the type of the private key
     private_key = None  # private key as PEM
     private_jwk = None  # private key as a JWK - rfc7517
     public_key = None  # public key as PEM
@@ -27,11 +27,15 @@ class ConfigMixin:
             jwk_obj = jwk.JWK.from_pem(fh.read())
         if not jwk_obj.has_private:
             raise errors.ConfigError(f"The filename '{filename}' does not contain a private key")
+        if not keys.algorithm_for(jwk_obj):
+            raise errors.ConfigError(f"The filename '{filename}' does not contain an RSA, EC P-256 or Ed25519 key")
         return jwk_obj
 
     @classmethod
     def init(cls):
-        jwk_obj = cls.load_private_key(os.getenv('JWT_RSA_PRIVATE_PATH'))
+        # JWT_RSA_PRIVATE_PATH is still honoured from the times only RSA keys were supported
+        jwk_obj = cls.load_private_key(os.getenv('JWT_PRIVATE_KEY_PATH') or os.getenv('JWT_RSA_PRIVATE_PATH'))
+        cls.alg = keys.algorithm_for(jwk_obj)
         cls.private_key = jwk_obj.export_to_pem(private_key=True, password=None).decode()
         cls.public_key = jwk_obj.export_to_pem(private_key=False)
 
@@ -49,6 +53,19 @@ class Config(ConfigMixin):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = f"mysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@" \
                               f"{os.getenv('DB_HOST')}/{os.getenv('DB')}"
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': pool.MeteredQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),  # connections kept open per process
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),  # connections opened beyond pool_size under load
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # seconds waited for a connection before failing
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 3600)),  # seconds before reopening. Keep below wait_timeout
+        'pool_pre_ping': bool(int(os.getenv('DB_POOL_PRE_PING', 1))),  # test connections on checkout
+    }
+    if os.getenv('DB_ISOLATION_LEVEL'):  # i.e. 'READ COMMITTED'. Else that of the server
+        SQLALCHEMY_ENGINE_OPTIONS['isolation_level'] = os.getenv('DB_ISOLATION_LEVEL')
+    # Optional comma-separated uris of read replicas serving read-only lookups
+    SQLALCHEMY_BINDS = replicas.replica_binds(uri for uri in os.getenv('DB_REPLICA_URIS', '').split(',') if uri)
+    METRICS_ENABLED = bool(int(os.getenv('METRICS_ENABLED', 0)))  # serve internal metrics under /api/metrics
 
     JWT_ALGORITHM = ConfigMixin.alg
     JWT_PRIVATE_KEY = ConfigMixin.private_key
@@ -56,6 +73,44 @@ class Config(ConfigMixin):
     JWT_PUBLIC_KEY = ConfigMixin.public_key
     JWK_PUBLIC = ConfigMixin.public_jwk
     AUTH_CODE_EXPIRATION_TIME = 60  # value in seconds from now
+    CONSENT_TICKET_MAX_AGE = 30  # seconds the resource owner has to allow or cancel an authorisation request
     AUTH_CODE_ENCODING = 'utf-8'  # Encoding needed for JWS Auth code
+    AUTH_CODE_STATELESS = bool(int(os.getenv('AUTH_CODE_STATELESS', 0)))  # self-contained codes not stored in the db
+    AUTH_CODE_REPLAY_STORE = 'authorization_server.replay.MemoryReplayStore'  # redeemed stateless codes store
+    AUTH_CODE_REPLAY_BUCKET = 10  # seconds of expiry grouped together by the in-memory replay store
+    AUTH_CODE_PURGE_INTERVAL = int(os.getenv('AUTH_CODE_PURGE_INTERVAL', 0))  # seconds between in-app purges. 0 => off
+    AUTH_CODE_PURGE_GRACE = 300  # seconds expired codes are kept before being purged
+    AUTH_CODE_PURGE_BATCH_SIZE = 1000  # consecutive ids deleted per transaction
+    AUTH_CODE_PARTITIONED = bool(int(os.getenv('AUTH_CODE_PARTITIONED', 0)))  # set after 'flask codes partition'
+    AUTH_CODE_PARTITION_DAYS_AHEAD = 7  # days of partitions created in advance
     AUTH_TOKEN_EXPIRATION_TIME = 1800  # value in seconds from now
+    JWT_CLOCK_SKEW = 30  # seconds of leeway when checking the 'exp', 'nbf' and 'iat' claims of codes and tokens
+    TOKEN_BATCH_LIMIT = 100  # maximum number of authorisation codes exchanged in a single request
+    JWT_KEYS_DIR = os.getenv('JWT_KEYS_DIR')  # Optional folder of rotated private keys as PEM files
+    JWK_ROTATION_OVERLAP = 3600  # seconds a key is published before it signs and kept after it is replaced
+    JWK_REFRESH_INTERVAL = 60  # seconds between scans of JWT_KEYS_DIR
+    JWKS_MAX_AGE = 3600  # seconds resource servers may cache the JWKS document
+    INTROSPECTION_CACHE_SIZE = 10000  # verified access tokens kept per process
+    INTROSPECTION_CACHE_TTL = 60  # seconds a verified access token is trusted without verifying its signature again
+    INTROSPECTION_BATCH_LIMIT = 500  # maximum number of access tokens introspected in a single request
+    CLIENT_SECRET_CACHE_SIZE = 1000  # clients whose last successful authentication is remembered per process
+    CLIENT_SECRET_CACHE_TTL = 300  # seconds a successful authentication is remembered
+    CLIENT_CACHE_SIZE = 1000  # clients whose metadata is kept per process
+    CLIENT_CACHE_TTL = 60  # seconds the metadata of a client is used without reading it again
+    CLIENT_SECRET_RECHECK_INTERVAL = 5  # seconds before a failed authentication reads the client's secret again
+    REDIRECT_REGISTRY_SIZE = 1000  # clients whose redirect uris are kept per process
+    REDIRECT_REGISTRY_TTL = 60  # seconds the redirect uris of a client are used without reading them again
+    USER_CACHE_SIZE = 1000  # logged-in users whose identity is kept per process
+    USER_CACHE_TTL = 60  # seconds the identity of a logged-in user is used without reading it again
+    CLIENT_SECRET_LENGTH = 40  # characters of generated client secrets
+    CLIENT_SECRET_SCHEME = 'hmac-sha256'  # scheme new client secrets are hashed with: 'hmac-sha256' or 'bcrypt'
+    CLIENT_SECRET_HMAC_KEY = os.getenv('CLIENT_SECRET_HMAC_KEY')  # key of 'hmac-sha256'. Unset => 'bcrypt' is used
     RESTPLUS_MASK_SWAGGER = False  # Do not show X-FIELDS in swagger
+    CRYPTO_EXECUTOR_WORKERS = int(os.getenv('CRYPTO_EXECUTOR_WORKERS', 0))  # processes hashing and signing. 0 => inline
+    CRYPTO_EXECUTOR_QUEUE_DEPTH = 64  # cryptographic jobs pending or running before new ones are rejected
+    CRYPTO_EXECUTOR_TIMEOUT = 5  # seconds a request waits for a cryptographic job
+    ASGI_EXECUTOR_WORKERS = int(os.getenv('ASGI_EXECUTOR_WORKERS', 32))  # threads blocking on the DB for ASGI requests
+    SESSION_STORE = os.getenv('SESSION_STORE', 'authorization_server.sessions.FileStore')  # server-side sessions store
+    SESSION_FILE_DIR = os.getenv('SESSION_FILE_DIR', join(ROOT_PATH, '.sessions'))  # folder of the file store
+    SESSION_MEMORY_SIZE = 10000  # sessions kept per process by the in-memory store
+    SESSION_KV_CLIENT = os.getenv('SESSION_KV_CLIENT', 'authorization_server.sessions.LocalKeyValueClient')
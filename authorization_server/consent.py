@@ -0,0 +1,62 @@
+'''Consent tickets: the validated authorisation request of '/auth/code_request' carried to '/auth/code_response' in
+the consent form itself instead of the session, so that any node can serve the response. A ticket is signed with
+SECRET_KEY, bound to the resource owner it was shown to and expires CONSENT_TICKET_MAX_AGE seconds after being issued.
+A ticket is also single-use: its random nonce is redeemed against the replay set, as stateless codes are.
+'''
+
+import secrets
+import time
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from authorization_server.app import replay_set
+
+SALT = 'consent-ticket'
+TICKET_FIELDS = ('client_id', 'redirect_uri', 'state', 'scope')
+
+
+def serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=SALT)
+
+
+def issue_ticket(auth_code, user_id):
+    '''Return the ticket of a validated authorisation request for the given resource owner
+    '''
+    return serializer().dumps([str(user_id), secrets.token_urlsafe(16), int(time.time())] +
+                              [getattr(auth_code, field) for field in TICKET_FIELDS])
+
+
+def _load(ticket, user_id):
+    '''Return the values of a ticket as a tuple (nonce, issued, authorisation request) or None if the ticket is forged,
+    expired or was issued to another resource owner
+    '''
+    if not isinstance(ticket, str) or not ticket:
+        return None
+    try:
+        values = serializer().loads(ticket, max_age=current_app.config['CONSENT_TICKET_MAX_AGE'])
+    except BadSignature:
+        return None
+    if not isinstance(values, list) or len(values) != len(TICKET_FIELDS) + 3 or values[0] != str(user_id):
+        return None
+    return values[1], values[2], dict(zip(TICKET_FIELDS, values[3:]))
+
+
+def load_ticket(ticket, user_id):
+    '''Return the authorisation request of a ticket as a dictionary or None if the ticket is forged, expired or was
+    issued to another resource owner
+    '''
+    values = _load(ticket, user_id)
+    return values[2] if values else None
+
+
+def redeem_ticket(ticket, user_id):
+    '''Return the authorisation request of a ticket as load_ticket does, marking the ticket as used so that it is only
+    returned once. None is returned as well if the ticket was already redeemed.
+    '''
+    values = _load(ticket, user_id)
+    if not values:
+        return None
+    nonce, issued, auth_code_request = values
+    if not replay_set.redeem(f"{SALT}:{nonce}", issued + current_app.config['CONSENT_TICKET_MAX_AGE']):
+        return None
+    return auth_code_request
@@ -1,3 +1,18 @@
 class ConfigError(Exception):
     '''Exception thrown when an error occurs in the app configuration file
-    '''
\ No newline at end of file
+    '''
+
+
+class CryptoExecutorError(Exception):
+    '''Exception thrown when a cryptographic operation cannot be run by the crypto executor in time
+    '''
+
+
+class InvalidClaimsError(Exception):
+    '''Exception thrown when the claims of an authorisation code or access token are missing or not valid
+    '''
+
+
+class ExpiredClaimsError(InvalidClaimsError):
+    '''Exception thrown when an authorisation code or access token has expired
+    '''
@@ -0,0 +1,127 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import flask_bcrypt
+
+from concurrent import futures
+from jwcrypto import jws
+from authorization_server import errors, keys
+
+
+def hash_password(password, rounds):
+    return flask_bcrypt.generate_password_hash(password, rounds)
+
+
+def check_password(pw_hash, password):
+    return flask_bcrypt.check_password_hash(pw_hash, password)
+
+
+@functools.lru_cache(maxsize=8)
+def _parsed_key(private_jwk):
+    return keys.ParsedJWK.from_json(private_jwk)
+
+
+def sign(payload, header, private_jwk):
+    '''Sign a payload and return it as a compact JWS. The private key is given as a JSON-serialised JWK so that it can
+    be sent to a worker process, which parses it only once.
+    '''
+    jws_obj = jws.JWS(payload)
+    jws_obj.add_signature(_parsed_key(private_jwk), None, json.dumps(header))
+    return jws_obj.serialize(compact=True)
+
+
+class CryptoExecutor:
+    '''Run CPU-bound cryptography -bcrypt hashing and JWS signing- in a pool of worker processes so that it does not
+    hold the GIL of the threads serving requests. The number of jobs pending or running is bounded and so is the time
+    a request waits for its job; both surface as errors.CryptoExecutorError.
+
+    With no workers configured, jobs are run inline in the calling thread.
+    '''
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.timeout = None
+        self.log_rounds = 12
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._private_jwks = {}
+        atexit.register(self.shutdown)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.workers = app.config['CRYPTO_EXECUTOR_WORKERS']
+        self.timeout = app.config['CRYPTO_EXECUTOR_TIMEOUT']
+        self.log_rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self._slots = threading.BoundedSemaphore(app.config['CRYPTO_EXECUTOR_QUEUE_DEPTH'])
+        app.extensions['crypto_executor'] = self
+
+    def _get_pool(self):
+        # The pool is created on first use -and again after a fork- so that each worker of a pre-forking WSGI server
+        # gets its own processes
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = futures.ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def run(self, func, *args):
+        '''Run func(*args) in the pool and wait for its result
+
+        :param func: a module-level -picklable- function
+        '''
+
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise errors.CryptoExecutorError('Too many cryptographic operations are pending. Please try again later')
+        try:
+            future = self._get_pool().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise errors.CryptoExecutorError(f"A cryptographic operation did not complete within {self.timeout} "
+                                             f"seconds")
+
+    def generate_password_hash(self, password):
+        return self.run(hash_password, password, self.log_rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self.run(check_password, pw_hash, password)
+
+    def sign(self, payload, signing_entry, header=None):
+        '''Sign a payload with a key of the key ring, adding its 'alg' and 'kid' to the protected header
+
+        :param payload: bytes to be signed
+        :param signing_entry: keys.KeyEntry of the key to sign with
+        :param header: additional protected header parameters
+        :return: the compact serialisation of the JWS
+        '''
+
+        header = dict(header or {}, alg=signing_entry.alg, kid=signing_entry.kid)
+        if not self.workers:
+            jws_obj = jws.JWS(payload)
+            jws_obj.add_signature(signing_entry.private, None, json.dumps(header))
+            return jws_obj.serialize(compact=True)
+
+        private_jwk = self._private_jwks.get(signing_entry.kid)
+        if private_jwk is None:
+            private_jwk = self._private_jwks[signing_entry.kid] = signing_entry.private.export_private()
+        return self.run(sign, payload, header, private_jwk)
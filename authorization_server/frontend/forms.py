@@ -1,8 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
-from authorization_server.app import db
-from authorization_server import models
+from wtforms.validators import DataRequired, Email, Length, EqualTo
 
 INVALID_EMAIL_ERROR = 'Please enter a valid email address'
 EMAIL_EXIST_ERROR = 'The email provided already exists. Please use another one'
@@ -23,11 +21,6 @@ class RegistrationForm(FlaskForm):
                                                  EqualTo('password', message=DIFFERENT_PASSWORD_ERROR)])
     submit = SubmitField('Sign Up')
 
-    def validate_email(self, email):
-        data = db.session.query(models.User).filter(models.User.email == email.data).first()
-        if data:
-            raise ValidationError(EMAIL_EXIST_ERROR)
-
 
 class LoginForm(FlaskForm):
     email = StringField('Email Address', validators=[DataRequired(),
@@ -1,8 +1,10 @@
 from flask import Blueprint, render_template, request, redirect,  url_for, flash
 from flask_login import login_user, logout_user, current_user, login_required
-from authorization_server.frontend.forms import RegistrationForm, SimpleLoginForm, GrandTypeLoginForm
-from authorization_server import models, oauth_code
-from authorization_server.app import db, bcrypt
+from sqlalchemy import exc
+from authorization_server.frontend.forms import RegistrationForm, SimpleLoginForm, GrandTypeLoginForm, \
+    EMAIL_EXIST_ERROR
+from authorization_server import models, oauth_code, utils
+from authorization_server.app import db, crypto_executor, user_cache
 
 frontend = Blueprint('frontend', __name__, static_folder='../static/frontend')
 LOGIN_ERROR_MESSAGE = 'Login Unsuccessful. Please check email and password'
@@ -12,13 +14,22 @@ LOGIN_ERROR_MESSAGE = 'Login Unsuccessful. Please check email and password'
 def register():
     form = RegistrationForm()
     if form.validate_on_submit():
-        enc_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        enc_password = crypto_executor.generate_password_hash(form.password.data).decode('utf-8')
         user = models.User(**{key: value for key, value in form.data.items()
                               if key not in ('confirm_password', 'submit', 'csrf_token')})
         user.password = enc_password
         db.session.add(user)
-        db.session.commit()
-        return redirect(url_for('frontend.login'))
+        # Rely on the unique constraint rather than checking the email beforehand: a single round trip that also holds
+        # under concurrent sign-ups
+        try:
+            db.session.commit()
+        except exc.IntegrityError as ex:
+            db.session.rollback()
+            if utils.duplicate_column(ex) != 'email':
+                raise
+            form.email.errors.append(EMAIL_EXIST_ERROR)
+        else:
+            return redirect(url_for('frontend.login'))
     return render_template('frontend/register.html', form=form)
 
 
@@ -37,7 +48,7 @@ def login():
         return redirect(url_for('frontend.profile'))
     if form.validate_on_submit():
         user = db.session.query(models.User).filter(models.User.email == form.email.data).first()
-        if not user or not bcrypt.check_password_hash(user.password, form.password.data):
+        if not user or not crypto_executor.check_password_hash(user.password, form.password.data):
             flash(LOGIN_ERROR_MESSAGE, category='danger')
         else:
             login_user(user)
@@ -48,6 +59,7 @@ def login():
 @frontend.route("/logout")
 @login_required
 def logout():
+    user_cache.pop(current_user.get_id())
     logout_user()
     return redirect(url_for('frontend.login'))
 
@@ -0,0 +1,120 @@
+import hashlib
+import hmac
+import itertools
+import secrets
+
+from authorization_server import errors, executor
+
+
+class BcryptHasher:
+    '''Slow, salted hashing suitable for low-entropy secrets. Hashes are stored in bcrypt's own modular crypt format,
+    e.g. '$2b$12$...', which is also how client secrets were stored before schemes were tagged.
+    '''
+
+    name = 'bcrypt'
+    slow = True
+
+    def __init__(self, crypto_executor):
+        self.crypto_executor = crypto_executor
+
+    def identify(self, pw_hash):
+        return pw_hash.startswith('$2')
+
+    def hash(self, secret):
+        return self.crypto_executor.generate_password_hash(secret).decode('utf-8')
+
+    def verify(self, pw_hash, secret):
+        return self.crypto_executor.check_password_hash(pw_hash, secret)
+
+    def hash_many(self, values, pool):
+        rounds = itertools.repeat(self.crypto_executor.log_rounds)
+        return [pw_hash.decode('utf-8') for pw_hash in pool.map(executor.hash_password, values, rounds,
+                                                                chunksize=16)]
+
+
+class HMACSHA256Hasher:
+    '''Fast keyed hashing for high-entropy, machine-generated secrets: guessing such a secret is infeasible whatever the
+    cost of the hash, so a slow KDF only slows down legitimate clients. Hashes are stored as
+    'hmac-sha256$<salt>$<hex digest>' and the key is never stored alongside them.
+    '''
+
+    name = 'hmac-sha256'
+    slow = False
+
+    def __init__(self, key):
+        self.key = key.encode() if isinstance(key, str) else key
+
+    def identify(self, pw_hash):
+        return pw_hash.startswith(f"{self.name}$")
+
+    def _digest(self, salt, secret):
+        return hmac.new(self.key, f"{salt}${secret}".encode(), hashlib.sha256).hexdigest()
+
+    def hash(self, secret):
+        salt = secrets.token_hex(8)
+        return f"{self.name}${salt}${self._digest(salt, secret)}"
+
+    def verify(self, pw_hash, secret):
+        try:
+            _, salt, digest = pw_hash.split('$')
+        except ValueError:
+            return False
+        return hmac.compare_digest(digest, self._digest(salt, secret))
+
+
+class SecretHasher:
+    '''Hash and verify client secrets with pluggable schemes. New secrets are hashed with the CLIENT_SECRET_SCHEME
+    scheme while secrets stored with any other known scheme are still verified, and flagged to be rehashed.
+    '''
+
+    def __init__(self, crypto_executor, app=None):
+        self.crypto_executor = crypto_executor
+        self.schemes = {}
+        self.default = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # The HMAC key is never SECRET_KEY: rotating or leaking the key that signs sessions must not affect the stored
+        # client secrets and the other way round
+        key = app.config.get('CLIENT_SECRET_HMAC_KEY')
+        self.schemes = {BcryptHasher.name: BcryptHasher(self.crypto_executor)}
+        if key:
+            self.schemes[HMACSHA256Hasher.name] = HMACSHA256Hasher(key)
+        scheme = app.config['CLIENT_SECRET_SCHEME']
+        if scheme == HMACSHA256Hasher.name and not key:
+            app.logger.warning(f"Client secret scheme '{scheme}' needs CLIENT_SECRET_HMAC_KEY to be set. New client "
+                               f"secrets are hashed with '{BcryptHasher.name}' instead")
+            scheme = BcryptHasher.name
+        if scheme not in self.schemes:
+            raise errors.ConfigError(f"Client secret scheme '{scheme}' is unknown")
+        self.default = self.schemes[scheme]
+        app.extensions['secret_hasher'] = self
+
+    def identify(self, pw_hash):
+        '''Return the scheme a hash was made with or None if it is not recognised
+        '''
+        return next((scheme for scheme in self.schemes.values() if pw_hash and scheme.identify(pw_hash)), None)
+
+    def hash(self, secret):
+        return self.default.hash(secret)
+
+    def hash_many(self, values, pool=None):
+        '''Hash several secrets with the default scheme, spreading them across the processes of a concurrent.futures
+        pool if the scheme is slow
+        '''
+        if pool is not None and self.default.slow:
+            return self.default.hash_many(values, pool)
+        return [self.default.hash(value) for value in values]
+
+    def verify(self, pw_hash, secret):
+        '''Verify a secret against its stored hash
+
+        :return: tuple (verified, needs_rehash) where needs_rehash tells whether the hash was not made with the
+        default scheme
+        '''
+        scheme = self.identify(pw_hash)
+        if scheme is None:
+            return False, False
+        verified = scheme.verify(pw_hash, secret)
+        return verified, verified and scheme is not self.default
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from collections import namedtuple
+from jwcrypto import jwk
+
+KeyEntry = namedtuple('KeyEntry', ['kid', 'alg', 'private', 'public', 'activates'])
+
+# JWS algorithms -rfc7518 and rfc8037- used to sign with each supported type of key, alongside the parameters to
+# generate a new key of that type
+ALGORITHMS = {
+    ('RSA', None): 'RS256',
+    ('EC', 'P-256'): 'ES256',
+    ('OKP', 'Ed25519'): 'EdDSA'
+}
+KEY_PARAMETERS = {
+    'RS256': {'kty': 'RSA', 'size': 2048},
+    'ES256': {'kty': 'EC', 'crv': 'P-256'},
+    'EdDSA': {'kty': 'OKP', 'crv': 'Ed25519'}
+}
+
+
+def algorithm_for(jwk_obj):
+    '''Return the JWS algorithm a key signs with or None if the type of key is not supported
+    '''
+    curve = jwk_obj.key_curve if jwk_obj.key_type in ('EC', 'OKP') else None
+    return ALGORITHMS.get((jwk_obj.key_type, curve))
+
+
+def generate_key(alg, **kwargs):
+    '''Generate a new private key that signs with the given JWS algorithm
+    '''
+    parameters = dict(KEY_PARAMETERS[alg])
+    parameters.update(kwargs)
+    return jwk.JWK.generate(**parameters)
+
+
+class ParsedJWK(jwk.JWK):
+    '''A JWK that builds its underlying cryptographic key objects once. jwcrypto rebuilds -and validates- the RSA or
+    EC key from the JWK numbers on every sign or verify operation, which costs more than the operation itself.
+    '''
+
+    def get_op_key(self, operation=None, arg=None):
+        op_keys = self.__dict__.setdefault('_op_keys', {})
+        try:
+            return op_keys[(operation, arg)]
+        except KeyError:
+            op_key = op_keys[(operation, arg)] = super().get_op_key(operation, arg)
+            return op_key
+
+
+class KeyRing:
+    '''Process-wide collection of ready-to-use JWK objects indexed by their 'kid'. Keys are parsed once when the
+    application is created so that signing and verifying codes and tokens does not pay for JSON parsing and key
+    reconstruction on every request. The ring is shared by all threads of a worker and is safe to be read while it is
+    being reloaded.
+
+    Keys are rotated with an overlap window. Each key has an activation time and at any time the ring holds:
+
+    1) Pending keys: published but not yet signing so that resource servers can cache them beforehand
+    2) The signing key: the most recently activated key
+    3) Retiring keys: replaced less than 'overlap' seconds ago. They still verify but no longer sign
+    Keys replaced more than 'overlap' seconds ago are dropped.
+    '''
+
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self._entries = []
+        self._files = {}
+        self._jwks = None
+        self.overlap = 0
+        self.keys_dir = None
+        self.refresh_interval = 60
+        self._refreshed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.overlap = app.config['JWK_ROTATION_OVERLAP']
+        self.keys_dir = app.config.get('JWT_KEYS_DIR')
+        self.refresh_interval = app.config['JWK_REFRESH_INTERVAL']
+        self.load(app.config['JWK_PRIVATE'])
+        app.extensions['key_ring'] = self
+
+    @staticmethod
+    def key_id(jwk_obj):
+        '''Return the 'kid' of a JWK object or its RFC 7638 thumbprint when none was given
+        '''
+        return jwk_obj.key_id or jwk_obj.thumbprint()
+
+    def _parse(self, private_jwk, activates):
+        private_key = ParsedJWK.from_json(private_jwk)
+        alg = algorithm_for(private_key)
+        if not alg:
+            raise ValueError(f"Keys of type '{private_key.key_type}' are not supported")
+        kid = self.key_id(private_key)
+        public_obj = json.loads(private_key.export_public())
+        public_obj.update({'kid': kid, 'alg': alg, 'use': 'sig'})
+        return KeyEntry(kid, alg, private_key, ParsedJWK.from_json(json.dumps(public_obj)), activates)
+
+    def load(self, private_jwk):
+        '''Parse a private key as a JSON-serialised JWK and make it the only -and signing- key of the ring. If a keys
+        directory was configured, the keys stored in there are added to the ring too.
+
+        :param private_jwk: private key as a JWK - rfc7517
+        :return: the 'kid' of the loaded key
+        '''
+        entry = self._parse(private_jwk, 0)
+        with self._lock:
+            self._entries = [entry]
+            self._files = {}
+            self._jwks = None
+        if self.keys_dir:
+            self.refresh()
+        return entry.kid
+
+    def add(self, private_jwk, activates=None):
+        '''Add a key to the ring that will start signing at 'activates' -a timestamp- or now if not given
+
+        :return: the 'kid' of the added key
+        '''
+        entry = self._parse(private_jwk, time.time() if activates is None else activates)
+        with self._lock:
+            self._entries = sorted([e for e in self._entries if e.kid != entry.kid] + [entry],
+                                   key=lambda e: e.activates)
+            self._jwks = None
+        return entry.kid
+
+    def refresh(self, now=None):
+        '''Synchronise the ring with the private keys stored as PEM files in the keys directory. A key becomes active
+        'overlap' seconds after its file was written so that it is published before it signs anything.
+        '''
+        now = time.time() if now is None else now
+        with self._lock:
+            self._refreshed = now
+            try:
+                filenames = sorted(name for name in os.listdir(self.keys_dir) if name.endswith('.pem'))
+            except OSError:
+                return
+            for filename in filenames:
+                path = os.path.join(self.keys_dir, filename)
+                mtime = os.stat(path).st_mtime
+                if path in self._files and self._files[path][0] == mtime:
+                    continue
+                with open(path, 'rb') as fh:
+                    private_key = jwk.JWK.from_pem(fh.read())
+                kid = self.add(private_key.export_private(), activates=mtime + self.overlap)
+                self._files[path] = mtime, kid
+
+    def expired_files(self, now=None):
+        '''Return the PEM files of the keys directory whose keys are no longer published
+        '''
+        published = {entry.kid for entry in self.published(now)}
+        with self._lock:
+            return [path for path, (_, kid) in self._files.items() if kid not in published]
+
+    def _maybe_refresh(self):
+        if self.keys_dir and time.time() - self._refreshed >= self.refresh_interval:
+            self.refresh()
+
+    def published(self, now=None):
+        '''Return the pending, signing and retiring keys -in that order- at a given timestamp. Expired keys are dropped
+        from the ring along the way.
+        '''
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = self._entries
+            active = [e for e in entries if e.activates <= now] or entries[:1]
+            pending = [e for e in entries if e.activates > now and e not in active]
+            signing = active[-1]
+            retiring = [e for i, e in enumerate(active[:-1]) if now - active[i + 1].activates < self.overlap]
+            keep = pending[::-1] + [signing] + retiring[::-1]
+            if len(keep) != len(entries):
+                self._entries = sorted(keep, key=lambda e: e.activates)
+                self._jwks = None
+            return keep
+
+    def signing_entry(self, now=None):
+        '''Return the KeyEntry -kid, algorithm and private key- to sign codes and tokens with
+        '''
+        self._maybe_refresh()
+        now = time.time() if now is None else now
+        with self._lock:
+            active = [e for e in self._entries if e.activates <= now]
+            return active[-1] if active else self._entries[0]
+
+    @property
+    def signing_kid(self):
+        return self.signing_entry().kid
+
+    @property
+    def signing_key(self):
+        '''Private JWK used to sign codes and tokens
+        '''
+        return self.signing_entry().private
+
+    def verification_key(self, kid=None, now=None):
+        '''Return the public JWK identified by kid or that of the signing key if no kid is given. None is returned for
+        unknown or expired kids.
+        '''
+        if not kid:
+            return self.signing_entry(now).public
+        for entry in self.published(now):
+            if entry.kid == kid:
+                return entry.public
+        return None
+
+    def jwks(self, now=None):
+        '''Return the JWK Set -rfc7517- of all published public keys alongside a digest of it to be used as an ETag
+        '''
+        self._maybe_refresh()
+        entries = self.published(now)
+        with self._lock:
+            if self._jwks is None:
+                document = {'keys': [json.loads(entry.public.export_public()) for entry in entries]}
+                digest = hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()
+                self._jwks = document, digest
+            return self._jwks
+
+    def __contains__(self, kid):
+        return any(entry.kid == kid for entry in self._entries)
+
+    def __len__(self):
+        return len(self._entries)
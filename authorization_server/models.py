@@ -1,13 +1,30 @@
 import uuid
 
+from collections import namedtuple
 from datetime import datetime
 from flask_login import UserMixin
-from authorization_server.app import db, login_manager
+from sqlalchemy import event
+from authorization_server.app import db, login_manager, user_cache
+
+
+class UserIdentity(UserMixin, namedtuple('UserIdentity', ['id', 'firstname', 'lastname', 'email'])):
+    '''The fields of a logged-in user that requests need, kept in the user cache instead of the User row
+    '''
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.query(User).get(user_id)
+    '''Load the identity of a logged-in user, from the user cache if possible
+    '''
+    identity = user_cache.get(str(user_id))
+    if identity is None:
+        with db.read_only():
+            user = db.session.query(User).get(user_id)
+        if user is None:
+            return None
+        identity = UserIdentity(user.id, user.firstname, user.lastname, user.email)
+        user_cache.set(str(user_id), identity)
+    return identity
 
 
 class User(db.Model, UserMixin):
@@ -42,9 +59,25 @@ class Application(db.Model):
         return str(uuid.uuid4()).replace('-', '')
 
 
+class RedirectURI(db.Model):
+    '''Redirect uris a client may use besides the one it registered with
+    '''
+
+    __tablename__ = 'redirect_uri'
+    __table_args__ = (
+        db.UniqueConstraint('application_id', 'uri'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.String(length=40), db.ForeignKey('application.id'), nullable=False)
+    uri = db.Column(db.String(length=255), nullable=False)
+
+
 class AuthorisationCode(db.Model):
 
     __tablename__ = 'authorisation_code'
+    __table_args__ = (
+        db.Index('ix_authorisation_code_created', 'created'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     created = db.Column(db.DateTime, default=datetime.now)
     updated = db.Column(db.DateTime)
@@ -52,3 +85,21 @@ class AuthorisationCode(db.Model):
     application_id = db.Column(db.String(length=40), db.ForeignKey('application.id'))
     application = db.relationship('Application', back_populates='authorisation_code')
 
+
+class WebSession(db.Model):
+    '''Server-side sessions of the SQL session store
+    '''
+
+    __tablename__ = 'web_session'
+    id = db.Column(db.String(length=43), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires = db.Column(db.DateTime, nullable=False, index=True)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_user(mapper, connection, target):
+    '''Forget the cached identity of a user whose profile or password changes. Other processes pick the change up
+    within USER_CACHE_TTL seconds.
+    '''
+    user_cache.pop(str(target.id))
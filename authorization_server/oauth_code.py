@@ -1,13 +1,19 @@
 import base64
 import binascii
+import hashlib
 import json
 import abc
-
-from datetime import datetime, timedelta
-from jwcrypto import jws, jwk, jwt
-from sqlalchemy.orm import exc
-from authorization_server import config, models
-from authorization_server.app import db, bcrypt
+import secrets
+import time
+
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from jwcrypto import jws
+from sqlalchemy import false
+from authorization_server import config, errors, models, urls
+from authorization_server.app import db, key_ring, introspection_cache, secret_cache, secret_hasher, replay_set, \
+    claims_validator, crypto_executor, client_cache, redirect_registry
 
 CLIENT_INVALID_REQUEST_ERROR = 'invalid_request'
 CLIENT_ACCESS_DENIED_ERROR = 'access_denied'
@@ -18,6 +24,62 @@ CLIENT_SERVER_ERROR = 'server_error'
 RESOURCE_OWNER_ERROR = 1
 CLIENT_ERROR = 2
 
+NOT_ISSUED_ERROR_DESCRIPTION = "Either the client does not exist in our records or the 'authorization_code' has not " \
+                               "been issued by us"
+USED_ERROR_DESCRIPTION = "The client has used this 'authorization_code' already"
+
+# 'token_use' claims telling authorisation codes and access tokens -signed with the same keys- apart
+AUTH_CODE_USE = 'authorization_code'
+ACCESS_TOKEN_USE = 'access'
+
+ClientMetadata = namedtuple('ClientMetadata', ['id', 'name', 'description', 'web_url', 'redirect_uri', 'client_secret'])
+
+
+def is_stateless():
+    '''Whether authorisation codes are self-contained -identified by a random 'jti' and redeemed against the replay
+    set- rather than stored in the database
+    '''
+    return current_app.config['AUTH_CODE_STATELESS']
+
+
+def load_clients(client_ids):
+    '''Load the metadata of the given clients in a single query
+
+    :return: dictionary of ClientMetadata by client id
+    '''
+    columns = [getattr(models.Application, field) for field in ClientMetadata._fields]
+    rows = db.session.query(*columns).filter(models.Application.id.in_(client_ids)).all()
+    return {row.id: ClientMetadata(*row) for row in rows}
+
+
+def fetch_client(client_id):
+    '''Return the ClientMetadata of a client -from the client cache if possible- or None if it does not exist
+    '''
+    return client_cache.fetch(client_id, load_clients)
+
+
+def load_redirect_uris(client_ids):
+    '''Load the redirect uris of the given clients -the one they registered with and those added since- in a single
+    query
+
+    :return: dictionary of frozensets of normalised redirect uris by client id
+    '''
+    rows = db.session.query(models.Application.id, models.Application.redirect_uri, models.RedirectURI.uri).\
+        outerjoin(models.RedirectURI, models.RedirectURI.application_id == models.Application.id).\
+        filter(models.Application.id.in_(client_ids))
+    uris = {}
+    for client_id, redirect_uri, other_uri in rows:
+        uris.setdefault(client_id, set()).update(uri for uri in (redirect_uri, other_uri) if uri)
+    return {client_id: frozenset(map(urls.normalise, client_uris)) for client_id, client_uris in uris.items()}
+
+
+def is_redirect_uri_allowed(client, redirect_uri):
+    '''Whether a client may use a redirect uri: the one it registered with, as given by its ClientMetadata, or any other
+    in the redirect registry
+    '''
+    return redirect_uri == client.redirect_uri or redirect_registry.is_allowed(client.id, redirect_uri,
+                                                                               load_redirect_uris)
+
 
 class AuthorisationBase:
 
@@ -79,21 +141,25 @@ class AuthorisationCode(AuthorisationBase):
             self.errors['error_description'] = 'The client application provided an invalid identifier'
             return False
 
-        try:
-            client = db.session.query(models.Application).filter_by(id=self.client_id).one()
-        except exc.NoResultFound:
+        with db.read_only():
+            client = fetch_client(self.client_id)
+        if not client:
             self.errors['error_description'] = 'This client application is not registered with us'
             return False
 
+        # The registered redirect uri is used if none is given
+        redirect_uri = client.redirect_uri
         if self.redirect_uri:
             try:
-                decoded_uri = base64.urlsafe_b64decode(self.redirect_uri.encode()).decode()
-            except binascii.Error:
+                redirect_uri = base64.urlsafe_b64decode(self.redirect_uri.encode()).decode()
+            except (binascii.Error, UnicodeDecodeError):
                 self.errors['error_description'] = f"The client application's 'redirect_uri' argument is invalid"
-            else:
-                if decoded_uri != client.redirect_uri:
-                    self.errors['error_description'] = f"The client application's 'redirect_uri' is not registered with us"
-            if self.errors['error_description']:
+                return False
+            with db.read_only():
+                allowed = is_redirect_uri_allowed(client, redirect_uri)
+            if not allowed:
+                self.errors['error_description'] = f"The client application's 'redirect_uri' is not registered " \
+                                                   f"with us"
                 return False
 
         if not self.response_type or self.response_type != self.grand_type:
@@ -114,7 +180,7 @@ class AuthorisationCode(AuthorisationBase):
         self.name = client.name
         self.description = client.description
         self.web_url = client.web_url
-        self.redirect_uri = client.redirect_uri
+        self.redirect_uri = redirect_uri
 
         return True
 
@@ -122,28 +188,28 @@ class AuthorisationCode(AuthorisationBase):
         '''Given a valid request, craft an 'authorization code' to be sent back to the client as specified by oAuth
         '''
 
-        # Create a unique id in the database to be associated to this token
-        auth_code = models.AuthorisationCode(application_id=self.client_id)
-        db.session.add(auth_code)
-        db.session.commit()
-
-        exp_date = (datetime.utcnow() + timedelta(seconds=config.Config.AUTH_CODE_EXPIRATION_TIME)).\
-            strftime("%d-%m-%Y %H:%M:%S")
         payload = {
             'client_id': self.client_id,
-            'redirect_uri': base64.urlsafe_b64encode(self.redirect_uri.encode()).decode(),
-            'expiration_date': exp_date,
-            'code_id': auth_code.id
+            'redirect_uri': self.redirect_uri
         }
+        payload.update(claims_validator.issue(config.Config.AUTH_CODE_EXPIRATION_TIME, AUTH_CODE_USE))
+
+        if is_stateless():
+            payload['jti'] = secrets.token_urlsafe(16)
+        else:
+            # Create a unique id in the database to be associated to this token
+            auth_code = models.AuthorisationCode(application_id=self.client_id)
+            db.session.add(auth_code)
+            db.session.commit()
+            payload['code_id'] = auth_code.id
 
         # Create a JWS with given payload
-        jws_obj = jws.JWS(json.dumps(payload).encode(config.Config.AUTH_CODE_ENCODING))
-        private_key = jwk.JWK.from_json(config.Config.private_jwk)
-        jws_obj.add_signature(private_key, None, json.dumps({"alg": config.Config.JWT_ALGORITHM}))
+        code = crypto_executor.sign(json.dumps(payload).encode(config.Config.AUTH_CODE_ENCODING),
+                                    key_ring.signing_entry())
 
         # return code and state as defined by oAuth
         return {
-            'code': jws_obj.serialize(compact=True),
+            'code': code,
             'state': self.state
         }
 
@@ -154,8 +220,9 @@ class AuthorisationToken(AuthorisationBase):
         self.code = None
         self.client_secret = None
         self.grand_type = None
-        self.expiration_date = None
         self.code_id = None
+        self.jti = None
+        self.exp = None
         super().__init__(**kwargs)
 
     def validate_request(self):
@@ -163,6 +230,21 @@ class AuthorisationToken(AuthorisationBase):
         are classified as 400, 401 and 403.
         '''
 
+        if not self.validate_code():
+            return False
+
+        # Ensure the client provided exists. Whether the code was issued by us is found out when redeeming it
+        if not self.validate_grant(fetch_client(self.client_id)):
+            return False
+        redeemed = self.redeem()
+        db.session.commit()
+        return redeemed
+
+    def validate_code(self):
+        '''Validate the parts of the request that do not require the database: the arguments received and the
+        signature and payload of the authorisation code.
+        '''
+
         self.errors = {
             'code': 400,
             'error': None,
@@ -184,7 +266,6 @@ class AuthorisationToken(AuthorisationBase):
             return False
 
         # Ensure code is a valid JWS
-        private_jwk = jwk.JWK.from_json(config.Config.JWK_PRIVATE)
         jws_obj = jws.JWS()
         try:
             jws_obj.deserialize(self.code)
@@ -194,9 +275,12 @@ class AuthorisationToken(AuthorisationBase):
 
         # (2) ---> 403 Forbidden Permission Errors
         self.errors['code'] = 403
-        # Ensure code has been signed by us
+        # Ensure code has been signed by us with a key that is still published
+        verification_key = key_ring.verification_key(jws_obj.jose_header.get('kid'))
         try:
-            jws_obj.verify(private_jwk)
+            if not verification_key:
+                raise jws.InvalidJWSSignature('Unknown or expired key')
+            jws_obj.verify(verification_key)
         except jws.InvalidJWSSignature:
             self.errors['error_description'] = 'The client application provided a token that has not been signed in ' \
                                               'this authorisation server'
@@ -204,59 +288,217 @@ class AuthorisationToken(AuthorisationBase):
 
         # Ensure payload has the fields expected
         payload = json.loads(jws_obj.payload.decode(config.Config.AUTH_CODE_ENCODING))
-        expected_fields = ('client_id', 'redirect_uri', 'expiration_date', 'code_id')
+        expected_fields = ('client_id', 'redirect_uri', 'exp', 'jti' if is_stateless() else 'code_id')
         if not all(keywords in payload for keywords in expected_fields):
             self.errors['error_description'] = f"The client application did not provide all the required fields of " \
                                                f"the payload: '{', '.join(str(x) for x in expected_fields)}'"
             return False
 
+        # Ensure code has not expired before any database or hashing work is done
+        try:
+            claims_validator.validate(payload, AUTH_CODE_USE)
+        except errors.ExpiredClaimsError:
+            self.errors['error_description'] = "The client provided an expired 'authorization_code'"
+            return False
+        except errors.InvalidClaimsError as ex:
+            self.errors['error_description'] = f"The client provided an invalid 'authorization_code': {ex}"
+            return False
+
         self.client_id = payload['client_id']
         self.redirect_uri = payload['redirect_uri']
-        self.expiration_date = payload['expiration_date']
-        self.code_id = payload['code_id']
+        self.code_id = payload.get('code_id')
+        self.jti = payload.get('jti')
+        self.exp = payload['exp']
+        return True
 
-        # Ensure both that the client provided exists and the existing code was issued by us previously
-        try:
-            db_auth, db_app = db.session.query(models.AuthorisationCode, models.Application).\
-                filter(models.Application.id == models.AuthorisationCode.application_id).\
-                filter(models.Application.id == self.client_id).\
-                filter(models.AuthorisationCode.id == self.code_id).\
-                one()
-        # --> very unlikely scenario
-        except exc.NoResultFound:
-            self.errors['error_description'] = "Either the client does not exist in our records or the " \
-                                               "'authorization_code' has not been issued by us"
-            return False
+    def validate_grant(self, client, authenticated=None):
+        '''Validate a verified authorisation code against the records of the client it was issued to. The code itself
+        is checked when it is redeemed.
 
-        if db_auth.used:
-            self.errors['error_description'] = "The client has used this 'authorization_code' already"
-            return False
+        :param client: ClientMetadata of the client or None if it does not exist
+        :param authenticated: whether the client_secret is already known to match that of the client. If None, it is
+        checked
+        '''
 
-        # Ensure code has not expired
-        if datetime.strptime(self.expiration_date, '%d-%m-%Y %H:%M:%S') > datetime.utcnow():
-            self.errors['error_description'] = "The client provided an expired 'authorization_code'"
+        if not client or client.id != self.client_id:
+            self.errors['error_description'] = NOT_ISSUED_ERROR_DESCRIPTION
             return False
 
         # (3) ---> 401 Authentication Error
         # Ensure client_id and client_secret coincide
-        if not bcrypt.check_password_hash(db_app.client_secret, self.client_secret):
+        if authenticated is None:
+            authenticated = self.authenticate(client)
+        if not authenticated:
             self.errors['code'] = 401
             self.errors['error_description'] = "The client provided a 'client_id' and 'client_secret' that don't match"
             return False
 
-        if self.redirect_uri != db_app.redirect_uri:
+        # Ensure the code was issued for a redirect uri the client may still use
+        if not is_redirect_uri_allowed(client, self.redirect_uri):
             self.errors['code'] = 403
             self.errors['error_description'] = "The client provided a 'redirect_uri' that does not match our records"
             return False
 
         return True
 
+    def redeem(self):
+        '''Mark the code as used. Codes are redeemed only once everything else is valid so that invalid requests do not
+        burn them. Redeeming is atomic: a single conditional UPDATE -or an add to the replay set for stateless codes-
+        so only one of several concurrent requests with the same code succeeds, whatever worker or node they hit.
+
+        The caller is expected to commit the session.
+        '''
+
+        if is_stateless():
+            if replay_set.redeem(self.jti, self.exp):
+                return True
+            self.errors['error_description'] = USED_ERROR_DESCRIPTION
+            return False
+
+        table = models.AuthorisationCode.__table__
+        result = db.session.execute(table.update().
+                                    where(table.c.id == self.code_id).
+                                    where(table.c.application_id == self.client_id).
+                                    where(table.c.used == false()).
+                                    values(used=True, updated=datetime.now()))
+        if result.rowcount == 1:
+            return True
+
+        # Failure path only: tell a code that was used already from one that was never issued
+        issued = db.session.query(models.AuthorisationCode.id).\
+            filter_by(id=self.code_id, application_id=self.client_id).\
+            scalar()
+        self.errors['error_description'] = \
+            USED_ERROR_DESCRIPTION if issued is not None else NOT_ISSUED_ERROR_DESCRIPTION
+        return False
+
+    def authenticate(self, client):
+        '''Check the client_secret provided against that stored for the client. Successful checks are remembered for
+        CLIENT_SECRET_CACHE_TTL seconds and secrets stored with a scheme other than CLIENT_SECRET_SCHEME are rehashed.
+
+        As the client's metadata may come from the client cache, a failed check is retried against the secret stored in
+        the database if it differs, i.e. the secret was renewed by another process. The database is only read again if
+        the cached metadata is older than CLIENT_SECRET_RECHECK_INTERVAL seconds, so that wrong secrets -or guesses of
+        them- are rejected from the cache. Likewise, a rehash only replaces the very hash that was verified.
+        '''
+        if secret_cache.is_verified(client.id, self.client_secret, client.client_secret):
+            return True
+        pw_hash = client.client_secret
+        authenticated, needs_rehash = secret_hasher.verify(pw_hash, self.client_secret)
+        if not authenticated:
+            stored = client_cache.refresh(client.id, load_clients, current_app.config['CLIENT_SECRET_RECHECK_INTERVAL'])
+            if not stored or stored.client_secret == pw_hash:
+                return False
+            pw_hash = stored.client_secret
+            authenticated, needs_rehash = secret_hasher.verify(pw_hash, self.client_secret)
+        if needs_rehash:
+            new_hash = secret_hasher.hash(self.client_secret)
+            rehashed = db.session.query(models.Application).\
+                filter_by(id=client.id, client_secret=pw_hash).\
+                update({'client_secret': new_hash})
+            db.session.commit()
+            client_cache.invalidate(client.id)
+            # --> the secret was renewed since it was cached
+            if not rehashed:
+                return False
+            pw_hash = new_hash
+        if authenticated:
+            secret_cache.remember(client.id, self.client_secret, pw_hash)
+        return authenticated
+
     def response(self):
         '''Given a valid request, craft an 'authorization token' to be sent back to the client as specified by oAuth
         '''
 
-        jwt_obj = jwt.JWT(header={"alg": config.Config.alg},
-                          claims={'expires_in': config.Config.AUTH_TOKEN_EXPIRATION_TIME})
-        jwt_obj.make_signed_token(jwk.JWK.from_json(config.Config.JWK_PRIVATE))
-        signed_jwt_token = jwt_obj.serialize()
-        return signed_jwt_token
+        claims = claims_validator.issue(config.Config.AUTH_TOKEN_EXPIRATION_TIME, ACCESS_TOKEN_USE)
+        claims['expires_in'] = config.Config.AUTH_TOKEN_EXPIRATION_TIME
+        return crypto_executor.sign(json.dumps(claims).encode(), key_ring.signing_entry())
+
+
+class AuthorisationTokenBatch:
+    '''Validate and answer several token requests of a client at once: all referenced clients not cached are fetched
+    in a single query, the client_secret is checked once per client rather than once per code and all codes are
+    redeemed in a single transaction.
+    '''
+
+    def __init__(self, client_secret, codes):
+        '''
+        :param client_secret: secret shared by all requests
+        :param codes: list of MultiDict like data structures with the 'grand_type' and 'code' of each request
+        '''
+        self.tokens = [AuthorisationToken(url_args=dict(code, client_secret=client_secret)) for code in codes]
+
+    def validate_request(self):
+        '''Validate every request, setting their errors. Return the list of requests that are valid.
+        '''
+
+        verified = [token for token in self.tokens if token.validate_code()]
+        clients = client_cache.fetch_many([token.client_id for token in verified], load_clients)
+
+        authenticated = {}
+        valid = []
+        for token in verified:
+            client = clients.get(token.client_id)
+            if client and client.id not in authenticated:
+                authenticated[client.id] = token.authenticate(client)
+            if token.validate_grant(client, authenticated.get(client.id) if client else None) and token.redeem():
+                valid.append(token)
+        db.session.commit()
+        return valid
+
+
+def authenticate_client(client_id, client_secret):
+    '''Whether a client_id and client_secret are the credentials of an existing client, for resources that clients
+    call with their credentials alone, i.e. introspection
+    '''
+
+    if not isinstance(client_id, str) or not isinstance(client_secret, str):
+        return False
+    client = fetch_client(client_id)
+    return client is not None and AuthorisationToken(url_args={'client_secret': client_secret}).authenticate(client)
+
+
+def verified_token_claims(token):
+    '''Return the claims of an access token issued by AuthorisationToken.response or None if the token is malformed, has
+    not been signed with any of our published keys, is not an access token -i.e. it is an authorisation code- or its
+    claims are not valid -i.e. it has expired-
+    '''
+
+    jws_obj = jws.JWS()
+    try:
+        jws_obj.deserialize(token)
+        verification_key = key_ring.verification_key(jws_obj.jose_header.get('kid'))
+        if not verification_key:
+            return None
+        jws_obj.verify(verification_key)
+        claims = json.loads(jws_obj.payload.decode(config.Config.AUTH_CODE_ENCODING))
+        claims_validator.validate(claims, ACCESS_TOKEN_USE)
+    except (jws.InvalidJWSObject, jws.InvalidJWSSignature, errors.InvalidClaimsError, ValueError, AttributeError,
+            TypeError):
+        return None
+    return claims
+
+
+def introspect_token(token):
+    '''Introspect an access token as per RFC 7662. Verifying a signature costs milliseconds, so the outcome is
+    cached by token digest for INTROSPECTION_CACHE_TTL seconds at most -and never beyond the token's expiry-.
+
+    A token is active for as long as the claims validator accepts it, i.e. until its 'exp' plus the JWT_CLOCK_SKEW
+    leeway, so that introspection and the resource path agree on it.
+    '''
+
+    if not isinstance(token, str):
+        return {'active': False}
+
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = introspection_cache.get(digest)
+    if claims is None:
+        claims = verified_token_claims(token) or {}
+        introspection_cache.set(digest, claims,
+                                ttl=claims['exp'] + claims_validator.leeway - time.time() if 'exp' in claims else None)
+
+    if not claims or ('exp' in claims and claims['exp'] + claims_validator.leeway <= time.time()):
+        return {'active': False}
+    response = dict(claims)
+    response.update({'active': True, 'token_type': 'bearer'})
+    return response
@@ -0,0 +1,222 @@
+'''Bulk import of client applications -i.e. when onboarding a partner- as registered and verified clients, with the
+same validation as the registration resource, and of resource owners -i.e. when migrating from another identity
+provider-.
+'''
+
+import csv
+import json
+import re
+import time
+
+from collections import namedtuple
+from sqlalchemy.exc import IntegrityError
+from authorization_server import hashers, models, urls, utils
+from authorization_server.app import db, secret_hasher, crypto_executor
+from authorization_server.apis import utils as api_utils
+
+CLIENT_FIELDS = ('name', 'description', 'email', 'web_url', 'redirect_uri')
+UNIQUE_CLIENT_FIELDS = ('email', 'web_url', 'redirect_uri')
+CREDENTIAL_FIELDS = ('id', 'email', 'client_secret')
+USER_FIELDS = ('firstname', 'lastname', 'email')
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+$')
+BCRYPT_PATTERN = re.compile(r'\$2[aby]?\$\d\d\$[./A-Za-z0-9]{53}$')
+
+ImportReport = namedtuple('ImportReport', ['imported', 'rejected', 'seconds'])
+
+
+def read_rows(fh, fmt):
+    '''Yield the rows of a CSV -with a header- or JSON Lines file as tuples (line number, row). Rows that cannot be
+    parsed are yielded as None.
+    '''
+
+    if fmt == 'csv':
+        yield from enumerate(csv.DictReader(fh), start=2)
+        return
+    for number, line in enumerate(fh, start=1):
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+def validate_row(row, columns, fields, unique_fields=(), seen=None):
+    '''Return why a row cannot be imported or None if it can
+
+    :param columns: columns of the table the row is inserted into
+    :param seen: dictionary of the values of each unique field taken by previous rows of the file. If None, repeated
+    values are only found by the unique constraints of the table
+    '''
+
+    if row is None:
+        return 'The row could not be parsed'
+    for field in fields:
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"Required field '{field}' not found"
+        if len(value) > columns[field].type.length:
+            return f"'{field}' is longer than {columns[field].type.length} characters"
+    for field in unique_fields if seen is not None else ():
+        if row[field] in seen[field]:
+            return f"{field} '{row[field]}' is repeated in the file"
+    return None
+
+
+def insert_chunk(table, records, reject):
+    '''Insert a chunk of rows in a single statement. If any row violates a unique constraint, the chunk is split in
+    halves that are inserted the same way, so that only the offending rows are rejected while the rest still go in
+    multi-row statements: a few rejected rows cost a number of statements logarithmic in the size of the chunk.
+
+    :param records: list of tuples (line number, row)
+    :return: the rows inserted
+    '''
+
+    try:
+        db.session.execute(table.insert(), [record for _, record in records])
+        db.session.commit()
+        return records
+    except IntegrityError as ex:
+        db.session.rollback()
+        if len(records) == 1:
+            line, record = records[0]
+            column = utils.duplicate_column(ex)
+            reject(line, f"{column} '{record[column]}' has already been registered" if column in record else
+                   str(ex.orig))
+            return []
+
+    middle = len(records) // 2
+    return insert_chunk(table, records[:middle], reject) + insert_chunk(table, records[middle:], reject)
+
+
+def import_clients(rows, output, reject, chunk_size=1000, pool=None):
+    '''Import client applications as registered and verified clients with a new id and client secret each.
+
+    Secrets are hashed -across the processes of 'pool' if the scheme is slow- and clients inserted a chunk at a time,
+    the credentials of each chunk being written to 'output' once inserted, so that neither the rows nor the
+    credentials of a whole file are ever held in memory.
+
+    :param rows: iterable of tuples (line number, row) as given by read_rows
+    :param output: text file the credentials are written to as CSV
+    :param reject: callable(line number, reason) called for every row that is not imported
+    :return: ImportReport
+    '''
+
+    started = time.monotonic()
+    table = models.Application.__table__
+    secret_length = db.get_app().config['CLIENT_SECRET_LENGTH']
+    seen = {field: set() for field in UNIQUE_CLIENT_FIELDS}
+    writer = csv.writer(output)
+    writer.writerow(CREDENTIAL_FIELDS)
+    imported = rejected = 0
+
+    def count_rejected(line, reason):
+        nonlocal rejected
+        rejected += 1
+        reject(line, reason)
+
+    def flush(chunk):
+        client_secrets = [api_utils.generate_password(secret_length) for _ in chunk]
+        for (_, record), pw_hash in zip(chunk, secret_hasher.hash_many(client_secrets, pool)):
+            record['client_secret'] = pw_hash
+        secrets_by_id = {record['id']: client_secret for (_, record), client_secret in zip(chunk, client_secrets)}
+        inserted = insert_chunk(table, chunk, count_rejected)
+        for _, record in inserted:
+            writer.writerow((record['id'], record['email'], secrets_by_id[record['id']]))
+        output.flush()
+        return len(inserted)
+
+    chunk = []
+    for line, row in rows:
+        reason = validate_row(row, table.c, CLIENT_FIELDS, UNIQUE_CLIENT_FIELDS, seen)
+        if reason is None and not all(map(urls.is_url_valid, (row['web_url'], row['redirect_uri']))):
+            reason = "Either the 'redirect_uri' or 'web_url' is not a valid url. A valid url must start by 'https://'"
+        if reason is not None:
+            count_rejected(line, reason)
+            continue
+
+        for field in UNIQUE_CLIENT_FIELDS:
+            seen[field].add(row[field])
+        record = {field: row[field] for field in CLIENT_FIELDS}
+        record.update(id=models.Application.generate_id(), is_allowed=True)
+        chunk.append((line, record))
+        if len(chunk) == chunk_size:
+            imported += flush(chunk)
+            chunk = []
+    if chunk:
+        imported += flush(chunk)
+    return ImportReport(imported, rejected, time.monotonic() - started)
+
+
+def hash_passwords(passwords, pool=None):
+    '''Hash passwords with bcrypt -as frontend.register does-, spreading them across the processes of a
+    concurrent.futures pool if given
+    '''
+    bcrypt_hasher = hashers.BcryptHasher(crypto_executor)
+    if pool is None:
+        return [bcrypt_hasher.hash(password) for password in passwords]
+    return bcrypt_hasher.hash_many(passwords, pool)
+
+
+def validate_user(row, columns):
+    '''Return why a resource owner cannot be imported or None if it can. A bcrypt 'password_hash' is imported as is;
+    otherwise a plaintext 'password' is required. Empty values -i.e. CSV cells- count as missing
+    '''
+
+    reason = validate_row(row, columns, USER_FIELDS)
+    if reason is not None:
+        return reason
+    if not EMAIL_PATTERN.match(row['email']):
+        return f"'{row['email']}' is not a valid email address"
+    if row.get('password_hash'):
+        pw_hash = row['password_hash']
+        if not isinstance(pw_hash, str) or not BCRYPT_PATTERN.match(pw_hash):
+            return "'password_hash' is not a bcrypt hash"
+    elif not isinstance(row.get('password'), str) or not row['password']:
+        return "Either 'password' or 'password_hash' is required"
+    return None
+
+
+def import_users(rows, reject, chunk_size=1000, pool=None):
+    '''Import resource owners a chunk at a time, hashing plaintext passwords across the processes of 'pool'. Memory
+    use does not grow with the number of rows: repeated emails -in the file or already registered- are only found by
+    the unique constraint of the table.
+
+    :param rows: iterable of tuples (line number, row) as given by read_rows
+    :param reject: callable(line number, reason) called for every row that is not imported
+    :return: ImportReport
+    '''
+
+    started = time.monotonic()
+    table = models.User.__table__
+    imported = rejected = 0
+
+    def count_rejected(line, reason):
+        nonlocal rejected
+        rejected += 1
+        reject(line, reason)
+
+    def flush(chunk):
+        plaintext = [record for _, record in chunk if record['password'] is None]
+        for record, pw_hash in zip(plaintext, hash_passwords([record.pop('plaintext') for record in plaintext], pool)):
+            record['password'] = pw_hash
+        for _, record in chunk:
+            record.pop('plaintext', None)
+        return len(insert_chunk(table, chunk, count_rejected))
+
+    chunk = []
+    for line, row in rows:
+        reason = validate_user(row, table.c)
+        if reason is not None:
+            count_rejected(line, reason)
+            continue
+
+        record = {field: row[field] for field in USER_FIELDS}
+        record.update(password=row.get('password_hash') or None, plaintext=row.get('password'))
+        chunk.append((line, record))
+        if len(chunk) == chunk_size:
+            imported += flush(chunk)
+            chunk = []
+    if chunk:
+        imported += flush(chunk)
+    return ImportReport(imported, rejected, time.monotonic() - started)
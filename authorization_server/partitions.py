@@ -0,0 +1,114 @@
+'''Optional day-based range partitioning of the 'authorisation_code' table -MySQL only- so that purging expired codes
+drops whole partitions instead of deleting rows. MySQL requires the partitioning column to be part of every unique key
+and does not support foreign keys on partitioned tables, so partitioning the table:
+
+1) Drops the foreign key to 'application'
+2) Makes 'created' not nullable and the primary key (id, created)
+3) Creates a partition per day from today until 'days_ahead' days from now, plus a catch-all 'pmax' partition
+'''
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import inspect, text
+
+TABLE = 'authorisation_code'
+CATCH_ALL = 'pmax'
+
+
+def partition_name(day):
+    return f"p{day.strftime('%Y%m%d')}"
+
+
+def partition_day(name):
+    '''Return the day a partition holds or None for the catch-all partition
+    '''
+    return None if name == CATCH_ALL else datetime.strptime(name[1:], '%Y%m%d').date()
+
+
+def day_partitions(first_day, last_day):
+    '''Return the definitions of the partitions of each day from first_day to last_day -both included- and the
+    catch-all partition
+    '''
+    days = (first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1))
+    definitions = [f"PARTITION {partition_name(day)} VALUES LESS THAN (TO_DAYS('{day + timedelta(days=1)}'))"
+                   for day in days]
+    return definitions + [f"PARTITION {CATCH_ALL} VALUES LESS THAN MAXVALUE"]
+
+
+def partition_statements(today, days_ahead, foreign_keys=()):
+    '''Return the statements that partition the table
+
+    :param foreign_keys: names of the foreign keys of the table, which have to be dropped
+    '''
+    statements = [f"ALTER TABLE {TABLE} DROP FOREIGN KEY {name}" for name in foreign_keys]
+    statements.append(f"ALTER TABLE {TABLE} MODIFY created DATETIME NOT NULL, DROP PRIMARY KEY, "
+                      f"ADD PRIMARY KEY (id, created)")
+    statements.append(f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(created)) "
+                      f"({', '.join(day_partitions(today, today + timedelta(days=days_ahead)))})")
+    return statements
+
+
+def maintenance_statements(partitions, cutoff, today, days_ahead):
+    '''Return the statements that create the partitions of the days to come and drop those of the days before cutoff
+
+    :param partitions: names of the existing partitions
+    :param cutoff: datetime before which codes can be purged
+    :return: tuple (statements, names of the partitions dropped)
+    '''
+    if not partitions:
+        raise ValueError(f"The '{TABLE}' table is not partitioned. Run 'flask codes partition' first or unset "
+                         f"AUTH_CODE_PARTITIONED")
+    days = [partition_day(name) for name in partitions if name != CATCH_ALL]
+    statements = []
+
+    newest = max(days) if days else today - timedelta(days=1)
+    if newest < today + timedelta(days=days_ahead):
+        definitions = day_partitions(newest + timedelta(days=1), today + timedelta(days=days_ahead))
+        statements.append(f"ALTER TABLE {TABLE} REORGANIZE PARTITION {CATCH_ALL} INTO ({', '.join(definitions)})")
+
+    # A partition can be dropped once the whole of its day is before the cutoff
+    expired = [partition_name(day) for day in sorted(days)
+               if datetime.combine(day + timedelta(days=1), datetime.min.time()) <= cutoff]
+    if expired:
+        statements.append(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(expired)}")
+    return statements, expired
+
+
+def existing_partitions(connection):
+    '''Return the names of the partitions of the table or an empty list if it is not partitioned
+    '''
+    if connection.dialect.name != 'mysql':
+        return []
+    rows = connection.execute(text("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                                   "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"),
+                              table=TABLE)
+    return [name for name, in rows]
+
+
+def partition(connection, days_ahead, today=None):
+    '''Partition the table by day. Nothing is done if it is already partitioned.
+
+    :return: the statements run
+    '''
+    if connection.dialect.name != 'mysql':
+        raise ValueError(f"Partitioning is not supported by '{connection.dialect.name}' databases")
+    if existing_partitions(connection):
+        return []
+    foreign_keys = [foreign_key['name'] for foreign_key in inspect(connection).get_foreign_keys(TABLE)]
+    statements = partition_statements(today or date.today(), days_ahead, foreign_keys)
+    for statement in statements:
+        connection.execute(text(statement))
+    return statements
+
+
+def maintain(connection, cutoff, days_ahead, today=None):
+    '''Create the partitions of the days to come and drop the expired ones. Raise ValueError if the table is not
+    partitioned
+
+    :return: names of the partitions dropped
+    '''
+    statements, expired = maintenance_statements(existing_partitions(connection), cutoff, today or date.today(),
+                                                 days_ahead)
+    for statement in statements:
+        connection.execute(text(statement))
+    return expired
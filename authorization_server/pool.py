@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+from collections import deque
+from sqlalchemy.pool import QueuePool
+
+
+class WaitTimes:
+    '''Bounded sample of the most recent connection checkout wait times
+    '''
+
+    def __init__(self, samples=1000):
+        self.count = 0
+        self._samples = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentiles(self, points=(50, 90, 99)):
+        '''Return the number of checkouts and the given percentiles and maximum -in milliseconds- of the wait times
+        sampled
+        '''
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        stats = {'count': count}
+        for point in points:
+            stats[f"p{point}"] = samples[min(len(samples) * point // 100, len(samples) - 1)] * 1000 if samples else None
+        stats['max'] = samples[-1] * 1000 if samples else None
+        return stats
+
+
+class MeteredQueuePool(QueuePool):
+    '''QueuePool that times how long every checkout takes, from the connection being requested to it being handed
+    over: waiting for a connection to be checked in, opening an overflow one and pre-pinging it.
+    '''
+
+    samples = 1000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_times = WaitTimes(self.samples)
+
+    def _timed_checkout(self, checkout):
+        started = time.perf_counter()
+        try:
+            return checkout()
+        finally:
+            self.wait_times.record(time.perf_counter() - started)
+
+    def connect(self):
+        return self._timed_checkout(super().connect)
+
+    def unique_connection(self):
+        # --> used by Engine.connect and Engine.raw_connection
+        return self._timed_checkout(super().unique_connection)
+
+    def recreate(self):
+        # --> keep the wait times when the pool is recreated, i.e. after a disconnection
+        pool = super().recreate()
+        pool.wait_times = self.wait_times
+        return pool
+
+
+def pool_stats(pool):
+    '''Return the state of the connection pool of this process: connections checked out, idle and in overflow, and the
+    checkout wait times if the pool is metered
+    '''
+
+    stats = {'pid': os.getpid(), 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0)
+        })
+    if isinstance(pool, MeteredQueuePool):
+        stats['checkout_wait'] = pool.wait_times.percentiles()
+    return stats
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from werkzeug.utils import import_string
+
+
+class MemoryReplayStore:
+    '''Per-process store of redeemed keys. Keys are grouped in buckets by the time they can be forgotten, so that
+    expired keys are dropped a whole bucket at a time rather than one by one. Only suitable for a single worker process;
+    deployments with several workers or nodes should plug a shared store in.
+    '''
+
+    def __init__(self, app=None, bucket_width=10):
+        self.bucket_width = bucket_width
+        self._buckets = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.bucket_width = app.config['AUTH_CODE_REPLAY_BUCKET']
+
+    def add(self, key, ttl, now=None):
+        '''Remember a key for at least 'ttl' seconds
+
+        :return: False if the key was already remembered, True otherwise
+        '''
+        now = time.time() if now is None else now
+        with self._lock:
+            for bucket in [bucket for bucket in self._buckets if (bucket + 1) * self.bucket_width <= now]:
+                del self._buckets[bucket]
+            if any(key in keys for keys in self._buckets.values()):
+                return False
+            self._buckets.setdefault(int((now + ttl) // self.bucket_width), set()).add(key)
+            return True
+
+    def __contains__(self, key):
+        now = time.time()
+        with self._lock:
+            return any(key in keys for bucket, keys in self._buckets.items() if (bucket + 1) * self.bucket_width > now)
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._buckets.values())
+
+
+class ReplaySet:
+    '''Enforce the single use of stateless authorisation codes -and of consent tickets- by remembering the 'jti' of
+    every redeemed code for as long as the code can be valid, i.e. until its 'exp' plus the JWT_CLOCK_SKEW leeway of
+    the claims validator.
+
+    The store is given by AUTH_CODE_REPLAY_STORE as the import path of a class built with the app and providing an
+    atomic 'add(key, ttl, now=None)' that returns whether the key was new, e.g. a wrapper around Redis' SET NX EX.
+    '''
+
+    def __init__(self, app=None):
+        self.leeway = 0
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.leeway = app.config['JWT_CLOCK_SKEW']
+        self.store = import_string(app.config['AUTH_CODE_REPLAY_STORE'])(app)
+        app.extensions['replay_set'] = self
+
+    def redeem(self, jti, exp, now=None):
+        '''Mark a code expiring at 'exp' as redeemed
+
+        :return: True the first time a code is redeemed and False afterwards
+        '''
+        now = time.time() if now is None else now
+        return self.store.add(jti, max(exp + self.leeway - now, 0), now)
@@ -0,0 +1,66 @@
+'''Route read-only lookups to read replicas. Replicas are given as extra binds -DB_REPLICA_URIS- and reads are only sent
+to them within 'db.read_only()' blocks; everything else, flushes included, goes to the primary. Once a session has
+flushed or committed -i.e. written, including through Core statements-, it keeps reading from the primary until it is
+closed at the end of the request, so that a request always reads its own writes.
+'''
+
+import random
+
+from contextlib import contextmanager
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def replica_binds(uris):
+    '''Return the SQLALCHEMY_BINDS entries of the given replica uris
+    '''
+    return {f"{REPLICA_BIND_PREFIX}{number}": uri for number, uri in enumerate(uris)}
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.read_only = False
+        self.sticky = False
+        super().__init__(db, **options)
+        self.replica_keys = sorted(key for key in self.app.config.get('SQLALCHEMY_BINDS') or {}
+                                   if key.startswith(REPLICA_BIND_PREFIX))
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.read_only and not self.sticky and not self._flushing and self.replica_keys:
+            return get_state(self.app).db.get_engine(self.app, bind=random.choice(self.replica_keys))
+        return super().get_bind(mapper, clause)
+
+    def close(self):
+        super().close()
+        self.sticky = False
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def stick_to_primary_after_flush(session, flush_context):
+    session.sticky = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def stick_to_primary_after_commit(session):
+    session.sticky = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    @contextmanager
+    def read_only(self):
+        '''Send the queries run within the block to a replica, unless the session has written already
+        '''
+        session = self.session()
+        previous = session.read_only
+        session.read_only = True
+        try:
+            yield session
+        finally:
+            session.read_only = previous
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from authorization_server import models, partitions
+from authorization_server.app import db
+
+PurgeReport = namedtuple('PurgeReport', ['deleted', 'batches', 'seconds', 'partitions'])
+
+
+def purge_codes(batch_size=1000, grace=0, now=None):
+    '''Delete the authorisation codes created more than AUTH_CODE_EXPIRATION_TIME + 'grace' seconds ago, used or not.
+
+    Codes are deleted in batches of consecutive primary keys, each in its own short transaction, so that neither a
+    long-running statement nor a long-held lock gets in the way of codes being issued and redeemed. As ids are given
+    in creation order, only the range of ids up to the newest expired code is walked.
+
+    If the table is partitioned by day -AUTH_CODE_PARTITIONED-, the partitions of the days before the cutoff are dropped
+    first and the partitions of the days to come are created.
+
+    :return: PurgeReport with the number of rows deleted, batches run and partitions dropped
+    '''
+
+    started = time.monotonic()
+    now = datetime.now() if now is None else now
+    cutoff = now - timedelta(seconds=current_app.config['AUTH_CODE_EXPIRATION_TIME'] + grace)
+    table = models.AuthorisationCode.__table__
+
+    dropped = []
+    if current_app.config['AUTH_CODE_PARTITIONED']:
+        dropped = partitions.maintain(db.session.connection(), cutoff,
+                                      current_app.config['AUTH_CODE_PARTITION_DAYS_AHEAD'], now.date())
+        db.session.commit()
+
+    lowest = db.session.query(func.min(table.c.id)).scalar()
+    highest = db.session.query(func.max(table.c.id)).filter(table.c.created < cutoff).scalar()
+    db.session.commit()
+
+    deleted = batches = 0
+    if highest is not None:
+        for start in range(lowest, highest + 1, batch_size):
+            result = db.session.execute(table.delete().
+                                        where(table.c.id >= start).
+                                        where(table.c.id < min(start + batch_size, highest + 1)).
+                                        where(table.c.created < cutoff))
+            db.session.commit()
+            deleted += result.rowcount
+            batches += 1
+    return PurgeReport(deleted, batches, time.monotonic() - started, dropped)
+
+
+class PurgeScheduler:
+    '''Purge expired authorisation codes every AUTH_CODE_PURGE_INTERVAL seconds from a daemon thread of the
+    application process. Disabled when the interval is 0, in which case 'flask codes purge' is expected to be scheduled
+    instead -i.e. cron-. Running it in every worker is harmless: purges are idempotent.
+    '''
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 0
+        self._thread = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        self.interval = app.config['AUTH_CODE_PURGE_INTERVAL']
+        app.extensions['purge_scheduler'] = self
+        if self.interval:
+            self.start()
+
+    def start(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='authorisation-code-purge', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                report = purge_codes(self.app.config['AUTH_CODE_PURGE_BATCH_SIZE'],
+                                     self.app.config['AUTH_CODE_PURGE_GRACE'])
+            finally:
+                db.session.remove()
+        self.app.logger.info(f"Purged {report.deleted} authorisation codes in {report.batches} batches, "
+                             f"{len(report.partitions)} partitions and {report.seconds:.2f} seconds")
+        return report
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception('Purging expired authorisation codes failed')
+
+
+scheduler = PurgeScheduler()
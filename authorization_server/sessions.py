@@ -0,0 +1,317 @@
+'''Server-side sessions for the frontend and the consent pages. The browser only holds a random session id in the
+session cookie while the session data is kept in a pluggable store given by SESSION_STORE as the import path of a class
+built with the app and providing:
+
+1) load(sid) returning the serialised session or None if it does not exist or has expired
+2) save(sid, data, ttl) storing the serialised session for 'ttl' seconds
+3) delete(sid)
+
+Session data is serialised with marshal -compact and fast, and unlike pickle unable to run code when loaded- so only
+built-in types, i.e. strings, numbers, booleans, None, lists, tuples and dictionaries, can be stored in a session.
+'''
+
+import marshal
+import os
+import re
+import secrets
+import struct
+import tempfile
+import threading
+import time
+
+from datetime import datetime, timedelta
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import import_string
+from authorization_server import cache
+
+FORMAT_VERSION = b'\x01'
+MARSHAL_VERSION = 4
+SID_PATTERN = re.compile(r'[A-Za-z0-9_-]{43}$')
+TABLE = 'web_session'
+
+
+def dumps(data):
+    return FORMAT_VERSION + marshal.dumps(data, MARSHAL_VERSION)
+
+
+def loads(blob):
+    '''Return the data of a serialised session or None if it cannot be read
+    '''
+    if not blob or blob[:1] != FORMAT_VERSION:
+        return None
+    try:
+        data = marshal.loads(blob[1:])
+    except (EOFError, ValueError, TypeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class MemoryStore:
+    '''Per-process LRU of the SESSION_MEMORY_SIZE most recently used sessions. Fastest, but only suitable for a single
+    worker process as sessions are neither shared nor kept across restarts.
+    '''
+
+    def __init__(self, app):
+        self._cache = cache.TTLCache(app.config['SESSION_MEMORY_SIZE'], app.permanent_session_lifetime.total_seconds())
+
+    def load(self, sid):
+        return self._cache.get(sid)
+
+    def save(self, sid, data, ttl):
+        self._cache.set(sid, data, ttl)
+
+    def delete(self, sid):
+        self._cache.pop(sid)
+
+
+class FileStore:
+    '''A file per session in SESSION_FILE_DIR, shared by the workers of a node. Each file starts with the expiry time
+    of the session and is replaced atomically, so that a request never reads a session being written by another.
+    Expired files are only removed by purge().
+    '''
+
+    HEADER = struct.Struct('>d')
+
+    def __init__(self, app):
+        self.directory = app.config['SESSION_FILE_DIR']
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def load(self, sid, now=None):
+        now = time.time() if now is None else now
+        try:
+            with open(self._path(sid), 'rb') as fh:
+                blob = fh.read()
+        except OSError:
+            return None
+        if len(blob) < self.HEADER.size or self.HEADER.unpack_from(blob)[0] <= now:
+            return None
+        return blob[self.HEADER.size:]
+
+    def save(self, sid, data, ttl, now=None):
+        now = time.time() if now is None else now
+        fd, path = tempfile.mkstemp(prefix='.', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(self.HEADER.pack(now + ttl) + data)
+            os.replace(path, self._path(sid))
+        except BaseException:
+            os.remove(path)
+            raise
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, now=None):
+        '''Remove the files of the expired sessions
+
+        :return: number of sessions removed
+        '''
+        removed = 0
+        for sid in filter(SID_PATTERN.match, os.listdir(self.directory)):
+            if self.load(sid, now) is None:
+                self.delete(sid)
+                removed += 1
+        return removed
+
+
+class SQLStore:
+    '''Sessions in the 'web_session' table of the primary database, shared by all workers and nodes. Replicas are never
+    read as a session may be read again before its last write reaches them. Expired rows are only deleted by purge().
+    '''
+
+    def __init__(self, app):
+        self.db = app.extensions['sqlalchemy'].db
+        self.table = self.db.metadata.tables[TABLE]
+
+    def load(self, sid, now=None):
+        now = datetime.now() if now is None else now
+        query = select([self.table.c.data]).where(self.table.c.id == sid).where(self.table.c.expires > now)
+        with self.db.engine.connect() as connection:
+            row = connection.execute(query).first()
+        return None if row is None else row[0]
+
+    def save(self, sid, data, ttl, now=None):
+        now = datetime.now() if now is None else now
+        values = {'data': data, 'expires': now + timedelta(seconds=ttl)}
+        update = self.table.update().where(self.table.c.id == sid).values(**values)
+        with self.db.engine.begin() as connection:
+            if connection.execute(update).rowcount:
+                return
+        try:
+            with self.db.engine.begin() as connection:
+                connection.execute(self.table.insert().values(id=sid, **values))
+        except IntegrityError:  # inserted by a concurrent request of the same session
+            with self.db.engine.begin() as connection:
+                connection.execute(update)
+
+    def delete(self, sid):
+        with self.db.engine.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.id == sid))
+
+    def purge(self, now=None):
+        '''Delete the rows of the expired sessions
+
+        :return: number of sessions removed
+        '''
+        now = datetime.now() if now is None else now
+        with self.db.engine.begin() as connection:
+            return connection.execute(self.table.delete().where(self.table.c.expires <= now)).rowcount
+
+
+class LocalKeyValueClient:
+    '''In-process stand-in for the client of a shared key-value store, with the subset of redis-py's API used by
+    KeyValueStore. Only suitable for development and tests.
+    '''
+
+    def __init__(self, app=None):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = None
+        return None if entry is None else entry[1]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = time.monotonic() + ex if ex else float('inf'), value
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return int(self._data.pop(key, None) is not None)
+
+
+class KeyValueStore:
+    '''Sessions in a key-value store shared by all workers and nodes, under 'session:<id>' keys that expire along with
+    the sessions. The client is given by SESSION_KV_CLIENT as the import path of a callable built with the app and
+    returning an object with redis-py's get(key), set(key, value, ex=seconds) and delete(key), e.g. a function
+    returning 'redis.Redis.from_url(app.config[...])'.
+    '''
+
+    PREFIX = 'session:'
+
+    def __init__(self, app):
+        self.client = import_string(app.config['SESSION_KV_CLIENT'])(app)
+
+    def load(self, sid):
+        return self.client.get(f"{self.PREFIX}{sid}")
+
+    def save(self, sid, data, ttl):
+        self.client.set(f"{self.PREFIX}{sid}", data, ex=max(int(ttl), 1))
+
+    def delete(self, sid):
+        self.client.delete(f"{self.PREFIX}{sid}")
+
+
+class ServerSideSession(SessionMixin):
+    '''Session whose data is only loaded from the store the first time it is used, so that requests that never touch
+    the session cost no round trip to the store. Those without a session cookie -i.e. API calls- never do, whereas
+    flask_login looks the session up at the end of every request that has one. As with Flask's own sessions, changes to
+    mutable values are not noticed unless 'modified' is set.
+    '''
+
+    def __init__(self, sid=None, loader=None):
+        self.sid = sid
+        self.modified = False
+        self.accessed = False
+        self._loader = loader
+        self._data = None if sid else {}
+
+    @property
+    def data(self):
+        self.accessed = True
+        if self._data is None:
+            self._data = self._loader(self.sid)
+            if self._data is None:
+                # Unknown or expired ids are never reused, so that a client cannot choose its own session id
+                self.sid = None
+                self._data = {}
+        return self._data
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    '''Open sessions lazily and write them back to the store -and set the cookie- only if they were modified
+    '''
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+
+    def load(self, sid):
+        return loads(self.store.load(sid))
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if not sid or not SID_PATTERN.match(sid):
+            return ServerSideSession()
+        return ServerSideSession(sid, self.load)
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session.modified:
+            return
+
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.save(session.sid, dumps(dict(session.data)), self.ttl)
+        response.set_cookie(app.session_cookie_name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+class ServerSideSessions:
+    '''Replace Flask's cookie-based sessions with server-side sessions kept in the SESSION_STORE store for
+    PERMANENT_SESSION_LIFETIME
+    '''
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = import_string(app.config['SESSION_STORE'])(app)
+        app.session_interface = ServerSideSessionInterface(self.store, app.permanent_session_lifetime.total_seconds())
+        app.extensions['sessions'] = self
@@ -0,0 +1,75 @@
+'''Validation and normalisation of the urls of client applications and the per-process registry of the redirect uris
+each client may use.
+'''
+
+import re
+
+from urllib.parse import urlsplit, urlunsplit
+from authorization_server import cache
+
+# Django's url validation rules -https://codereview.stackexchange.com/questions/19663/http-url-validating- restricted
+# to https as we don't want to scrape ftp-like urls
+URL_PATTERN = re.compile(
+    r'^(?:https)://'  # https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|'  # ...or ipv4
+    r'\[?[A-F0-9]*:[A-F0-9:]+\]?)'  # ...or ipv6
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_url_valid(url):
+    '''Check whether an url is a valid https url
+    '''
+    return isinstance(url, str) and URL_PATTERN.match(url) is not None
+
+
+def normalise(url):
+    '''Return the canonical form of an url as per RFC 3986: scheme and host in lower case, no default port and '/' as
+    empty path. The path and the query are kept as they are, so two redirect uris match only if they are the same but
+    for their case-insensitive parts. Strings that are not absolute urls are returned unchanged.
+    '''
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    userinfo = parts.netloc.rpartition('@')[0]
+    netloc = f"[{parts.hostname}]" if ':' in parts.hostname else parts.hostname
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, parts.fragment))
+
+
+class RedirectRegistry(cache.TTLCache):
+    '''Read-through map of client ids to the frozenset of the normalised redirect uris each client may use, so that
+    checking a redirect uri is a set lookup. Entries are invalidated whenever this process changes the redirect uris of
+    a client; other processes see the change within the registry's time-to-live at most.
+    '''
+
+    def allowed(self, client_id, loader):
+        '''Return the redirect uris of a client or an empty frozenset if it does not exist
+
+        :param loader: callable that, given a list of client ids, returns a dictionary of their redirect uris
+        '''
+        uris = self.get(client_id)
+        if uris is None:
+            uris = loader([client_id]).get(client_id)
+            if uris is None:
+                return frozenset()
+            self.set(client_id, uris)
+        return uris
+
+    def is_allowed(self, client_id, uri, loader):
+        return isinstance(uri, str) and normalise(uri) in self.allowed(client_id, loader)
+
+    def invalidate(self, client_id):
+        self.pop(client_id)
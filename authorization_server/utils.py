@@ -1,4 +1,6 @@
 import functools
+import re
+
 from flask import request, current_app, redirect, url_for
 from flask_login import current_user
 
@@ -29,3 +31,17 @@ def login_required(route, request_args=False, **additional_args):
             return func(*args, **kwargs)
         return wrapper
     return decorator
+
+
+# Messages of unique constraint violations: MySQL -5.7 and 8.0-, SQLite and PostgreSQL
+DUPLICATE_KEY_PATTERN = re.compile(r"Duplicate entry .* for key '(?:\w+\.)?(\w+)'|"
+                                   r"UNIQUE constraint failed: \w+\.(\w+)|"
+                                   r"Key \((\w+)\)=\(.*\) already exists")
+
+
+def duplicate_column(error):
+    '''Return the column whose unique constraint a sqlalchemy.exc.IntegrityError was raised for or None if it was not
+    raised by a unique constraint on a single column. Unnamed unique constraints are named after their column in MySQL.
+    '''
+    match = DUPLICATE_KEY_PATTERN.search(str(error.orig))
+    return next((group for group in match.groups() if group), None) if match else None
@@ -0,0 +1,43 @@
+'''Benchmark signing and verification throughput of the supported JWS algorithms -RS256, ES256 and EdDSA- as used for
+authorisation codes and access tokens.
+
+Usage: python -m benchmarks.bench_algorithms [iterations]
+'''
+
+import json
+import sys
+import timeit
+
+from jwcrypto import jws
+from authorization_server import keys
+
+PAYLOAD = json.dumps({'client_id': 'client', 'redirect_uri': 'aHR0cHM6Ly9hcHAuY29t', 'code_id': 1}).encode()
+
+
+def main(iterations=1000):
+    print(f"{'algorithm':<12}{'sign/s':>12}{'verify/s':>12}{'size':>8}")
+    for alg in sorted(keys.KEY_PARAMETERS):
+        ring = keys.KeyRing()
+        ring.load(keys.generate_key(alg).export_private())
+        entry = ring.signing_entry()
+        header = json.dumps({"alg": entry.alg, "kid": entry.kid})
+
+        def sign():
+            jws_obj = jws.JWS(PAYLOAD)
+            jws_obj.add_signature(entry.private, None, header)
+            return jws_obj.serialize(compact=True)
+
+        token = sign()
+
+        def verify():
+            jws_obj = jws.JWS()
+            jws_obj.deserialize(token)
+            jws_obj.verify(entry.public)
+
+        sign_rate = iterations / timeit.timeit(sign, number=iterations)
+        verify_rate = iterations / timeit.timeit(verify, number=iterations)
+        print(f"{alg:<12}{sign_rate:>12.0f}{verify_rate:>12.0f}{len(token):>8}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
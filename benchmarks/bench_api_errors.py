@@ -0,0 +1,66 @@
+'''Benchmark the error path of the API: building an error response by evaluating the name of its envelop and replacing
+the placeholder on every call compared to looking the envelop up in the message catalog, and the throughput of
+'/api/client/' -the token endpoint- answering requests that are rejected before any database or cryptographic work,
+as when a bad client hammers it.
+
+Usage: python -m benchmarks.bench_api_errors [iterations]
+'''
+
+import json
+import sys
+import time
+import timeit
+
+from authorization_server import config
+from authorization_server.app import create_app
+from authorization_server.apis import errors as api_errors, utils as api_utils
+
+MESSAGE = "The client application did not provide a authorisation code"
+
+
+def eval_response(code, method=None, message=None):
+    envelop = eval('api_utils.RESPONSE_' + str(code) + ('' if not method else ('_' + method)))
+    if message:
+        envelop = envelop.replace('{description}', message)
+    return {'message': envelop}, code
+
+
+def replace_error(message, envelop):
+    return (envelop.replace('{description}', message) if envelop and message else envelop or message), 400
+
+
+def report(title, strategies, iterations):
+    print(title)
+    for name, func in strategies.items():
+        micro_seconds = timeit.timeit(func, number=iterations) / iterations * 1000000
+        print(f"    {name:<30}{micro_seconds:10.3f} us/call")
+
+
+def main(iterations=200000):
+    report('make_response', {
+        'eval + replace': lambda: eval_response(409, message=MESSAGE),
+        'message catalog': lambda: api_utils.make_response(409, message=MESSAGE)
+    }, iterations)
+    report('error message', {
+        'replace': lambda: replace_error(MESSAGE, api_utils.RESPONSE_400),
+        'message catalog': lambda: api_utils.wrap(api_utils.RESPONSE_400, MESSAGE)
+    }, iterations)
+    report('error response', {
+        'BadRequest400Error': lambda: api_errors.BadRequest400Error(message=MESSAGE,
+                                                                    envelop=api_utils.RESPONSE_400).to_response()
+    }, iterations)
+
+    client = create_app(config_class=config.Config).test_client()
+    body = json.dumps({'grand_type': 'authorization_code', 'client_secret': 'secret'})
+    requests = iterations // 100
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.post('/api/client/', data=body, content_type='application/json')
+    seconds = time.perf_counter() - started
+    assert response.status_code == 400, response.status_code
+    print('/api/client/ rejecting requests without a code')
+    print(f"    {requests / seconds:10.0f} requests/s")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
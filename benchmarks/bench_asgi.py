@@ -0,0 +1,131 @@
+'''Benchmark the '/api/client/' token endpoint served by the WSGI app -as a threaded WSGI server would, one thread per
+request in flight- and by the ASGI app, at increasing numbers of concurrent requests. Both are given the same number
+of threads for the blocking work, so the comparison is the latency -p50 and p99- and throughput at each concurrency.
+
+The database is a SQLite file unless BENCH_DATABASE_URI is set, i.e. to the MySQL database of a deployment. Codes are
+stateless so that no row is written per code.
+
+Usage: python -m benchmarks.bench_asgi [requests per level] [threads]
+'''
+
+import asyncio
+import json
+import os
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+
+from concurrent import futures
+from authorization_server import asgi, config, models, oauth_code
+from authorization_server.app import create_app, db, secret_hasher, claims_validator, crypto_executor, key_ring
+
+LEVELS = (1, 8, 32, 128)
+
+
+class BenchConfig(config.Config):
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URI') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    SQLALCHEMY_ENGINE_OPTIONS = config.Config.SQLALCHEMY_ENGINE_OPTIONS if os.getenv('BENCH_DATABASE_URI') else {}
+    AUTH_CODE_STATELESS = True
+
+
+def setup(app, count):
+    '''Register a client and issue 'count' authorisation codes to it for each server and concurrency level
+    '''
+
+    with app.app_context():
+        db.create_all()
+        client = models.Application(id=models.Application.generate_id(), email=f"{time.time()}@bench.com",
+                                    name='Bench', description='Bench', web_url=f"https://{time.time()}.bench.com",
+                                    redirect_uri=f"https://{time.time()}.bench.com/callback", is_allowed=True,
+                                    client_secret=secret_hasher.hash('secret'))
+        db.session.add(client)
+        db.session.commit()
+        payloads = []
+        for _ in range(count * len(LEVELS) * 2):
+            claims = dict(claims_validator.issue(config.Config.AUTH_CODE_EXPIRATION_TIME, oauth_code.AUTH_CODE_USE),
+                          client_id=client.id, redirect_uri=client.redirect_uri, jti=secrets.token_urlsafe(16))
+            code = crypto_executor.sign(json.dumps(claims).encode(), key_ring.signing_entry())
+            payloads.append({'grand_type': 'authorization_code', 'client_secret': 'secret', 'code': code})
+        return payloads
+
+
+def percentiles(latencies, seconds):
+    latencies = sorted(latencies)
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000, len(latencies) / seconds
+
+
+def run_wsgi(app, payloads, concurrency, threads):
+    '''Send the requests from 'concurrency' clients to a server with 'threads' threads: requests queue until a thread
+    is free, as they would in the listen backlog
+    '''
+
+    def post(payload):
+        response = app.test_client().post('/api/client/', data=json.dumps(payload), content_type='application/json')
+        assert response.status_code == 201, response.get_json()
+        return time.perf_counter()
+
+    latencies = []
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        for batch in range(0, len(payloads), concurrency):
+            submitted = time.perf_counter()
+            latencies.extend(completed - submitted for completed in
+                             executor.map(post, payloads[batch:batch + concurrency]))
+    return percentiles(latencies, time.perf_counter() - started)
+
+
+def run_asgi(asgi_app, payloads, concurrency):
+    '''Send the requests from 'concurrency' clients to the ASGI app
+    '''
+
+    async def post(payload):
+        body = json.dumps(payload).encode()
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            sent.append(message)
+
+        started = time.perf_counter()
+        await asgi_app({'type': 'http', 'method': 'POST', 'path': '/api/client/', 'headers': []}, receive, send)
+        assert sent[0]['status'] == 201, sent[1]['body']
+        return time.perf_counter() - started
+
+    async def main():
+        latencies = []
+        for batch in range(0, len(payloads), concurrency):
+            latencies.extend(await asyncio.gather(*(post(payload) for payload in payloads[batch:batch + concurrency])))
+        return latencies
+
+    started = time.perf_counter()
+    loop = asyncio.new_event_loop()
+    try:
+        latencies = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return percentiles(latencies, time.perf_counter() - started)
+
+
+def main(requests=256, threads=8):
+    app = create_app(BenchConfig)
+    asgi_app = asgi.ASGIApp(app, workers=threads)
+    payloads = setup(app, requests)
+
+    print(f"{'concurrency':<13}{'server':<7}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for concurrency in LEVELS:
+        for server in ('wsgi', 'asgi'):
+            batch, payloads = payloads[:requests], payloads[requests:]
+            if server == 'wsgi':
+                p50, p99, throughput = run_wsgi(app, batch, concurrency, threads)
+            else:
+                p50, p99, throughput = run_asgi(asgi_app, batch, concurrency)
+            print(f"{concurrency:<13}{server:<7}{p50:>10.2f}{p99:>10.2f}{throughput:>10.0f}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
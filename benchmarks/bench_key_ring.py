@@ -0,0 +1,64 @@
+'''Benchmark the per-request cost of the key material on the '/api/client/' token path and on '/auth/code_response'
+when the private JWK is parsed on every request compared to reusing the process-wide key ring.
+
+Usage: python -m benchmarks.bench_key_ring [iterations]
+'''
+
+import json
+import sys
+import timeit
+
+from jwcrypto import jwk, jws, jwt
+from authorization_server import config, keys
+
+PAYLOAD = json.dumps({'client_id': 'client', 'redirect_uri': 'aHR0cHM6Ly9hcHAuY29t', 'code_id': 1}).\
+    encode(config.Config.AUTH_CODE_ENCODING)
+HEADER = json.dumps({"alg": config.Config.JWT_ALGORITHM})
+
+
+def sign_code(key_factory):
+    jws_obj = jws.JWS(PAYLOAD)
+    jws_obj.add_signature(key_factory(), None, HEADER)
+    return jws_obj.serialize(compact=True)
+
+
+def verify_code(code, key_factory):
+    jws_obj = jws.JWS()
+    jws_obj.deserialize(code)
+    jws_obj.verify(key_factory())
+
+
+def sign_token(key_factory):
+    jwt_obj = jwt.JWT(header={"alg": config.Config.alg},
+                      claims={'expires_in': config.Config.AUTH_TOKEN_EXPIRATION_TIME})
+    jwt_obj.make_signed_token(key_factory())
+    return jwt_obj.serialize()
+
+
+def main(iterations=200):
+    ring = keys.KeyRing()
+    ring.load(config.Config.JWK_PRIVATE)
+    code = sign_code(lambda: ring.signing_key)
+    strategies = {
+        'per-request parsing': (lambda: jwk.JWK.from_json(config.Config.JWK_PRIVATE),) * 2,
+        'key ring': (lambda: ring.signing_key, ring.verification_key)
+    }
+    paths = {
+        '/auth/code_response (sign code)': lambda sign_key, _: sign_code(sign_key),
+        '/api/client/ (verify code + sign token)': lambda sign_key, verify_key: (verify_code(code, verify_key),
+                                                                                 sign_token(sign_key))
+    }
+
+    for path, func in paths.items():
+        print(path)
+        timings = {}
+        for name, (sign_key, verify_key) in strategies.items():
+            seconds = timeit.timeit(lambda: func(sign_key, verify_key), number=iterations)
+            timings[name] = seconds / iterations * 1000
+            print(f"    {name:<22}{timings[name]:8.3f} ms/request")
+        saving = timings['per-request parsing'] - timings['key ring']
+        print(f"    {'saving':<22}{saving:8.3f} ms/request")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,26 @@
+'''Benchmark client secret verification with the bcrypt and hmac-sha256 schemes, as run on every token exchange that
+misses the verified secret cache.
+
+Usage: python -m benchmarks.bench_secret_hashing [iterations]
+'''
+
+import sys
+import timeit
+
+from authorization_server import executor, hashers
+from authorization_server.apis import utils as api_utils
+
+
+def main(iterations=20):
+    schemes = (hashers.BcryptHasher(executor.CryptoExecutor()), hashers.HMACSHA256Hasher('benchmark key'))
+    print(f"{'scheme':<14}{'secret':>8}{'verify/s':>14}{'ms/verify':>12}")
+    for scheme in schemes:
+        for length in (10, 40):
+            secret = api_utils.generate_password(length)
+            pw_hash = scheme.hash(secret)
+            elapsed = timeit.timeit(lambda: scheme.verify(pw_hash, secret), number=iterations)
+            print(f"{scheme.name:<14}{length:>8}{iterations / elapsed:>14.0f}{1000 * elapsed / iterations:>12.3f}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
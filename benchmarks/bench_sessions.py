@@ -0,0 +1,76 @@
+'''Benchmark the per-request cost of loading and saving a session with each session store: a login, which writes the
+session, and a request of a logged-in user, which only reads it and does not write it back. Timings are net of the cost
+of a request context without a session. The size of the session is also compared with that of the session that held
+the authorisation request before consent tickets.
+
+The SQL store uses a SQLite file unless BENCH_DATABASE_URI is set, i.e. to the MySQL database of a deployment.
+
+Usage: python -m benchmarks.bench_sessions [iterations]
+'''
+
+import json
+import os
+import secrets
+import sys
+import tempfile
+import timeit
+
+from flask import session
+from authorization_server import config, sessions
+from authorization_server.app import create_app, db
+
+STORES = ('MemoryStore', 'FileStore', 'SQLStore', 'KeyValueStore')
+LOGIN = {'_fresh': True, '_id': 'f' * 128, 'user_id': '1', 'csrf_token': 'c' * 40}
+AUTH_CODE_REQUEST = {'client_id': 'c' * 32, 'redirect_uri': 'aHR0cHM6Ly9hcHAuZXhhbXBsZS5jb20vY2FsbGJhY2s=',
+                     'state': 's' * 16, 'scope': None, 'response_type': 'code', 'name': 'Example App',
+                     'description': 'An application requesting access', 'web_url': 'https://app.example.com',
+                     'errors': {'addressee': 'resource_owner', 'code': 400, 'error': None, 'error_description': None}}
+
+
+class BenchConfig(config.Config):
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URI') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    SQLALCHEMY_ENGINE_OPTIONS = config.Config.SQLALCHEMY_ENGINE_OPTIONS if os.getenv('BENCH_DATABASE_URI') else {}
+    SESSION_FILE_DIR = tempfile.mkdtemp()
+
+
+def run_request(app, cookie, func):
+    '''Open the session of a request with the given cookie, run func with it and save it as Flask does
+    '''
+    with app.test_request_context(headers={'Cookie': f"{app.session_cookie_name}={cookie}"}):
+        func(session)
+        app.session_interface.save_session(app, session._get_current_object(), app.response_class())
+
+
+def login(data):
+    data.update(LOGIN)
+
+
+def read_only(data):
+    return data['user_id']
+
+
+def main(iterations=2000):
+    payload = dict(LOGIN)
+    for name, data in (('Session', payload), ('Session with the authorisation request',
+                                              dict(payload, auth_code_request=AUTH_CODE_REQUEST))):
+        print(f"{name}: {len(sessions.dumps(data))} bytes serialised, {len(json.dumps(data))} bytes as JSON")
+
+    for store in STORES:
+        class StoreConfig(BenchConfig):
+            SESSION_STORE = f"authorization_server.sessions.{store}"
+
+        app = create_app(config_class=StoreConfig)
+        with app.app_context():
+            db.create_all()
+            sid = secrets.token_urlsafe(32)
+            app.session_interface.store.save(sid, sessions.dumps(payload), 3600)
+            baseline = timeit.timeit(lambda: run_request(app, '', lambda data: None), number=iterations)
+            print(store)
+            for name, func in (('login (load + save)', login), ('logged-in request (load)', read_only)):
+                seconds = timeit.timeit(lambda: run_request(app, sid, func), number=iterations) - baseline
+                print(f"    {name:<28}{seconds / iterations * 1000:8.3f} ms/request")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
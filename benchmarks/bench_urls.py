@@ -0,0 +1,74 @@
+'''Benchmark the url validator when its pattern is compiled on every call compared to the module-level compiled pattern,
+and the check of a redirect uri against the database row of the client compared to a lookup in the redirect registry.
+Python's own cache of compiled patterns makes a 're.compile' call on every validation a dictionary lookup rather than
+a full compilation, so the first saving is smaller than the second.
+
+The database is a SQLite file unless BENCH_DATABASE_URI is set, i.e. to the MySQL database of a deployment.
+
+Usage: python -m benchmarks.bench_urls [iterations]
+'''
+
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+from authorization_server import config, models, oauth_code, urls
+from authorization_server.app import create_app, db, redirect_registry
+
+URLS = ('https://app.example.com/callback', 'https://localhost:8443/callback?next=1', 'http://app.example.com',
+        'https://[::1]/callback', 'not an url')
+
+
+class BenchConfig(config.Config):
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URI') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    SQLALCHEMY_ENGINE_OPTIONS = config.Config.SQLALCHEMY_ENGINE_OPTIONS if os.getenv('BENCH_DATABASE_URI') else {}
+
+
+def compile_per_call(url):
+    url_regex = re.compile(urls.URL_PATTERN.pattern, re.IGNORECASE)
+    return url_regex.match(url) is not None
+
+
+def query_per_check(client_id, redirect_uri):
+    stored = db.session.query(models.Application.redirect_uri).filter_by(id=client_id).scalar()
+    return redirect_uri == stored
+
+
+def report(title, strategies, iterations):
+    print(title)
+    for name, func in strategies.items():
+        micro_seconds = timeit.timeit(func, number=iterations) / iterations * 1000000
+        print(f"    {name:<30}{micro_seconds:10.2f} us/call")
+
+
+def main(iterations=20000):
+    report('url validation (5 urls)', {
+        'compiled on every call': lambda: [compile_per_call(url) for url in URLS],
+        'module-level pattern': lambda: [urls.is_url_valid(url) for url in URLS]
+    }, iterations)
+
+    app = create_app(config_class=BenchConfig)
+    with app.app_context():
+        db.create_all()
+        client = models.Application(id=models.Application.generate_id(), email='bench@example.com', name='Bench',
+                                    description='Bench', web_url='https://example.com',
+                                    redirect_uri='https://example.com/callback')
+        db.session.add(client)
+        db.session.add_all(models.RedirectURI(application_id=client.id, uri=f"https://example.com/callback/{number}")
+                           for number in range(10))
+        db.session.commit()
+
+        redirect_registry.clear()
+        redirect_uri = 'https://EXAMPLE.com/callback/9'
+        report('redirect uri check', {
+            'database row per check': lambda: query_per_check(client.id, redirect_uri),
+            'redirect registry': lambda: redirect_registry.is_allowed(client.id, redirect_uri,
+                                                                      oauth_code.load_redirect_uris)
+        }, iterations // 10)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,24 @@
+"""Index authorisation codes by creation time
+
+Revision ID: c5a1e9d7f2b4
+Revises: 83e3d614d9a6
+Create Date: 2026-10-17 10:12:41.270115
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a1e9d7f2b4'
+down_revision = '83e3d614d9a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves the purge of expired codes
+    op.create_index('ix_authorisation_code_created', 'authorisation_code', ['created'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_authorisation_code_created', table_name='authorisation_code')
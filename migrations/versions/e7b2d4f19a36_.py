@@ -0,0 +1,31 @@
+"""Add the table of the SQL session store
+
+Revision ID: e7b2d4f19a36
+Revises: c5a1e9d7f2b4
+Create Date: 2026-10-17 15:40:12.804512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2d4f19a36'
+down_revision = 'c5a1e9d7f2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('web_session',
+    sa.Column('id', sa.String(length=43), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('expires', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_web_session_expires'), 'web_session', ['expires'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_web_session_expires'), table_name='web_session')
+    op.drop_table('web_session')
@@ -0,0 +1,31 @@
+"""Add the redirect uris clients may use besides the one they registered with
+
+Revision ID: f3a81c5e0d27
+Revises: e7b2d4f19a36
+Create Date: 2026-10-17 17:05:48.316094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a81c5e0d27'
+down_revision = 'e7b2d4f19a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('redirect_uri',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('application_id', sa.String(length=40), nullable=False),
+    sa.Column('uri', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['application_id'], ['application.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('application_id', 'uri')
+    )
+
+
+def downgrade():
+    op.drop_table('redirect_uri')
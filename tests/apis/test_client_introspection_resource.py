@@ -0,0 +1,93 @@
+import json
+
+from authorization_server import oauth_code
+from tests import utils as test_utils
+
+RESOURCE_URI = '/api/client/introspection'
+
+
+def client_credentials():
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    return {'client_id': client_data[0]['id'], 'client_secret': client_data[0]['client_secret']}
+
+
+def test_post_400_error(frontend_app):
+    '''Test that when posting to /introspection a 400 error is issued if:
+
+    1) The data provided isn't the expected data structure
+    2) The client credentials are not provided
+    3) Neither 'token' nor 'tokens' are provided
+    4) 'tokens' is not a list or has more tokens than allowed
+    '''
+
+    credentials = client_credentials()
+
+    # (1)
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps([]), content_type='application/json')
+    assert response.status_code == 400
+
+    # (2)
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps({'token': 'token'}), content_type='application/json')
+    assert response.status_code == 400
+    assert "'client_id'" in response.get_json()['error']['message']
+
+    # (3)
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps(credentials), content_type='application/json')
+    assert response.status_code == 400
+    assert all(keyword in response.get_json()['error']['message'] for keyword in ('Invalid receive', "'token'"))
+
+    # (4)
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps(dict(credentials, tokens='token')),
+                                 content_type='application/json')
+    assert response.status_code == 400
+    batch_limit = frontend_app.application.config['INTROSPECTION_BATCH_LIMIT']
+    response = frontend_app.post(RESOURCE_URI,
+                                 data=json.dumps(dict(credentials, tokens=['token'] * (batch_limit + 1))),
+                                 content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_post_401_error(frontend_app):
+    '''Test that posting to /introspection with credentials that are not those of a registered client gives a 401
+    '''
+
+    credentials = client_credentials()
+    for client_id, client_secret in ((credentials['client_id'], 'not the secret'), ('unknown', 'secret'),
+                                     (None, credentials['client_secret'])):
+        response = frontend_app.post(RESOURCE_URI,
+                                     data=json.dumps({'client_id': client_id, 'client_secret': client_secret,
+                                                      'token': oauth_code.AuthorisationToken().response()}),
+                                     content_type='application/json')
+        assert response.status_code == 401
+
+
+def test_post_200_success(frontend_app):
+    '''Test that posting to /introspection:
+
+    1) Returns whether a single token is active and its claims
+    2) Introspects a batch of tokens in order
+    '''
+
+    credentials = client_credentials()
+    token = oauth_code.AuthorisationToken().response()
+
+    # (1)
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps(dict(credentials, token=token)),
+                                 content_type='application/json')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert response.get_json()['active'] is True
+
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps(dict(credentials, token='invalid')),
+                                 content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json() == {'active': False}
+
+    # (2)
+    response = frontend_app.post(RESOURCE_URI,
+                                 data=json.dumps(dict(credentials, tokens=[token, 'invalid'] * 100)),
+                                 content_type='application/json')
+    assert response.status_code == 200
+    ret_data = response.get_json()['tokens']
+    assert len(ret_data) == 200
+    assert all(item['active'] is (index % 2 == 0) for index, item in enumerate(ret_data))
@@ -15,6 +15,7 @@ def test_post(frontend_app):
     3) if the redirect_uri isn't a valid url => 409
     5) if the client's email is already register => 409
     6) Otherwise create client record and return client_id
+    7) if the client's web_url or redirect_uri is already registered => 409 naming it
     '''
 
     # (1)
@@ -88,3 +89,18 @@ def test_post(frontend_app):
     ret_data = response.get_json()
     assert ret_data['id']
     assert db.session.query(models.Application).filter_by(email=post_data['email']).first()
+
+    # (7)
+    for field in ('web_url', 'redirect_uri'):
+        duplicate_data = dict(post_data)
+        duplicate_data['email'] = f"{field.replace('_', '')}@appdomain.com"
+        other_field = 'web_url' if field == 'redirect_uri' else 'redirect_uri'
+        duplicate_data[other_field] = f"https://{field.replace('_', '')}.appdomain.com"
+        response = frontend_app.post(RESOURCE_URI,
+                                     data=json.dumps(duplicate_data),
+                                     content_type='application/json')
+        assert response.status_code == 409
+        ret_data = response.get_json()
+        assert all(keyword in ret_data['error']['message'] for keyword in (duplicate_data[field],
+                                                                           'has already been registered'))
+    assert db.session.query(models.Application).count() == 1
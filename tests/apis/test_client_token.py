@@ -1,44 +1,74 @@
 import json
+import pytest
+import secrets
+import time
 
-from datetime import datetime, timedelta
 from jwcrypto import jws, jwk
-from authorization_server import models, config
-from authorization_server.app import db
+from unittest.mock import patch
+from authorization_server import models, config, oauth_code
+from authorization_server.app import db, key_ring, replay_set
 from tests import utils as test_utils
 
 RESOURCE_URI = '/api/client/'
+BATCH_RESOURCE_URI = '/api/client/batch'
 
 
-def generate_db_auth_code_context(client_secret=None):
-    # --> Generate a valid authorization code
-    client_data, user_data = test_utils.add_user_client_context_to_db()
-    db_auth_code = models.AuthorisationCode(application_id=client_data[0]['id'])
-    db.session.add(db_auth_code)
-    db.session.commit()
-    assert db_auth_code.id
+def generate_auth_code(client_id, redirect_uri, stateless=False):
+    '''Generate a valid authorization code for a client. Stateless codes have no row in the database
+    '''
+    db_auth_code = None
+    if not stateless:
+        db_auth_code = models.AuthorisationCode(application_id=client_id)
+        db.session.add(db_auth_code)
+        db.session.commit()
+        assert db_auth_code.id
 
     # --> Create an appropriate payload to be signed in
-    now = datetime.utcnow()
-    before = now - timedelta(seconds=10)
+    now = int(time.time())
     payload = {
-        'client_id': client_data[0]['id'],
-        'redirect_uri': client_data[0]['redirect_uri'],
-        'expiration_date': before.strftime("%d-%m-%Y %H:%M:%S"),
-        'code_id': db_auth_code.id
+        'client_id': client_id,
+        'redirect_uri': redirect_uri,
+        'iat': now,
+        'exp': now + config.Config.AUTH_CODE_EXPIRATION_TIME,
+        'token_use': oauth_code.AUTH_CODE_USE
     }
+    if stateless:
+        payload['jti'] = secrets.token_urlsafe(16)
+    else:
+        payload['code_id'] = db_auth_code.id
 
     # --> Sign the payload and generate the JWS authorization code
     jws_obj = jws.JWS(json.dumps(payload).encode(config.Config.AUTH_CODE_ENCODING))
     private_key = jwk.JWK.from_json(config.Config.private_jwk)
     jws_obj.add_signature(private_key, None, json.dumps({"alg": config.Config.JWT_ALGORITHM}))
+    return jws_obj.serialize(compact=True), db_auth_code
+
+
+def generate_db_auth_code_context(client_secret=None, stateless=False):
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    code, db_auth_code = generate_auth_code(client_data[0]['id'], client_data[0]['redirect_uri'], stateless)
     post_data = {
         'grand_type': 'authorization_code',
         'client_secret': client_data[0]['client_secret'] if not client_secret else client_secret,
-        'code': jws_obj.serialize(compact=True)
+        'code': code
     }
     return post_data, client_data, db_auth_code
 
 
+def use_auth_code(post_data, db_auth_code):
+    '''Mark the code of a token request as used, either in the database or in the replay set
+    '''
+    if db_auth_code:
+        db_auth_code.used = True
+        db.session.add(db_auth_code)
+        db.session.commit()
+    else:
+        jws_obj = jws.JWS()
+        jws_obj.deserialize(post_data['code'], key_ring.verification_key())
+        payload = json.loads(jws_obj.payload)
+        assert replay_set.redeem(payload['jti'], payload['exp'])
+
+
 def test_get_token_400_error(frontend_app):
     '''Test that when calling the client's get token endpoint the following 400 error are issued:
 
@@ -69,14 +99,15 @@ def test_get_token_400_error(frontend_app):
     assert response.status_code == 400
 
 
-def test_get_token_401_403_error(frontend_app):
+def test_get_token_401_403_error(auth_code_mode, frontend_app):
     '''Test that when calling the client's get token endpoint a
 
     1) 401 error is issued if client's details do not match our records
     2) a 403 error is issued if somehow the authorization code has the right format but is invalid
     '''
 
-    post_data, client_data, db_auth_code = generate_db_auth_code_context('not the expected password')
+    post_data, client_data, db_auth_code = generate_db_auth_code_context('not the expected password',
+                                                                         auth_code_mode == 'stateless')
 
     # (1)
     response = frontend_app.post(RESOURCE_URI,
@@ -88,9 +119,8 @@ def test_get_token_401_403_error(frontend_app):
     assert response.status_code == 401
 
     # (2)
-    db_auth_code.used = True
-    db.session.add(db_auth_code)
-    db.session.commit()
+    use_auth_code(post_data, db_auth_code)
+    post_data['client_secret'] = client_data[0]['client_secret']
     response = frontend_app.post(RESOURCE_URI,
                                  data=json.dumps(post_data),
                                  content_type='application/json')
@@ -100,11 +130,11 @@ def test_get_token_401_403_error(frontend_app):
     assert response.status_code == 403
 
 
-def test_get_token_201_success(frontend_app):
+def test_get_token_201_success(auth_code_mode, frontend_app):
     '''When the authorization code is valid, a token is issued back to the client.
     '''
 
-    post_data, client_data, db_auth_code = generate_db_auth_code_context()
+    post_data, client_data, db_auth_code = generate_db_auth_code_context(stateless=auth_code_mode == 'stateless')
     response = frontend_app.post(RESOURCE_URI,
                                  data=json.dumps(post_data),
                                  content_type='application/json')
@@ -112,3 +142,80 @@ def test_get_token_201_success(frontend_app):
     assert all(keyword in response.headers for keyword in ('Cache-Control', 'Pragma'))
     ret_data = response.get_json()
     assert all(keyword in ret_data for keyword in ('token', 'token_type'))
+
+    # --> Codes cannot be replayed
+    response = frontend_app.post(RESOURCE_URI,
+                                 data=json.dumps(post_data),
+                                 content_type='application/json')
+    assert response.status_code == 403
+    assert "has used this 'authorization_code' already" in response.get_json()['error']['message']
+
+
+@pytest.mark.parametrize('auth_code_mode', ['stateless'], indirect=True)
+def test_get_token_stateless_replay_within_clock_skew(auth_code_mode, frontend_app):
+    '''A stateless code is remembered as redeemed for as long as it passes validation, i.e. after
+    AUTH_CODE_EXPIRATION_TIME has gone by but before it expires beyond the clock skew leeway
+    '''
+
+    post_data, client_data, db_auth_code = generate_db_auth_code_context(stateless=True)
+    now = time.time()
+    response = frontend_app.post(RESOURCE_URI, data=json.dumps(post_data), content_type='application/json')
+    assert response.status_code == 201
+
+    with patch('time.time', return_value=now + config.Config.AUTH_CODE_EXPIRATION_TIME + 15):
+        response = frontend_app.post(RESOURCE_URI, data=json.dumps(post_data), content_type='application/json')
+    assert response.status_code == 403
+    assert "has used this 'authorization_code' already" in response.get_json()['error']['message']
+
+
+def test_get_batch_tokens_400_error(frontend_app):
+    '''Test that a 400 error is issued when exchanging a batch of codes if:
+
+    1) client_secret or codes are not provided
+    2) codes is not a list of objects or has more codes than allowed
+    '''
+
+    # (1)
+    response = frontend_app.post(BATCH_RESOURCE_URI, data=json.dumps({'codes': []}), content_type='application/json')
+    assert response.status_code == 400
+    assert 'Required key' in response.get_json()['error']['message']
+
+    # (2)
+    for codes in ('code', ['code'], [{}] * (frontend_app.application.config['TOKEN_BATCH_LIMIT'] + 1)):
+        response = frontend_app.post(BATCH_RESOURCE_URI,
+                                     data=json.dumps({'client_secret': 'secret', 'codes': codes}),
+                                     content_type='application/json')
+        assert response.status_code == 400
+        assert "'codes' must be a list" in response.get_json()['error']['message']
+
+
+def test_get_batch_tokens_200_success(auth_code_mode, frontend_app):
+    '''Test that a batch of codes is answered with a token or an error per code, in the same order
+    '''
+
+    post_data, client_data, db_auth_code = generate_db_auth_code_context(stateless=auth_code_mode == 'stateless')
+    batch_data = {
+        'client_secret': post_data['client_secret'],
+        'codes': [
+            {'grand_type': 'authorization_code', 'code': post_data['code']},
+            {'grand_type': 'authorization_code', 'code': 'Not a token'},
+            {'grand_type': 'something unexpected', 'code': post_data['code']}
+        ]
+    }
+    response = frontend_app.post(BATCH_RESOURCE_URI, data=json.dumps(batch_data), content_type='application/json')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    tokens = response.get_json()['tokens']
+    assert len(tokens) == 3
+    assert tokens[0]['token'] and tokens[0]['token_type'] == 'bearer'
+    assert tokens[1]['error']['code'] == 400 and 'non-valid representation' in tokens[1]['error']['message']
+    assert tokens[2]['error']['code'] == 400 and 'grand_type' in tokens[2]['error']['message']
+
+    # --> Codes redeemed above cannot be used again so a new one is needed
+    batch_data['codes'][0]['code'], db_auth_code = generate_auth_code(client_data[0]['id'],
+                                                                      client_data[0]['redirect_uri'],
+                                                                      auth_code_mode == 'stateless')
+    batch_data['client_secret'] = 'not the expected password'
+    response = frontend_app.post(BATCH_RESOURCE_URI, data=json.dumps(batch_data), content_type='application/json')
+    tokens = response.get_json()['tokens']
+    assert tokens[0]['error']['code'] == 401
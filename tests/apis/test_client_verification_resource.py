@@ -1,8 +1,8 @@
 import json
 import secrets
 
-from authorization_server import models
-from authorization_server.app import db, bcrypt
+from authorization_server import config, models
+from authorization_server.app import db, secret_cache, secret_hasher
 
 RESOURCE_URI = '/api/client/verification'
 
@@ -111,6 +111,7 @@ def test_post(frontend_app):
     db.session.commit()
     db_data = db.session.query(models.Application).filter_by(email=data['email']).one()
     assert db_data.reg_token == client_app.reg_token and db_data.is_allowed == client_app.is_allowed
+    secret_cache.remember(client_id, 'old secret', 'old hash')
     response = frontend_app.post(RESOURCE_URI,
                                  data=json.dumps(post_data),
                                  content_type='application/json')
@@ -119,4 +120,7 @@ def test_post(frontend_app):
     ret_data = response.get_json()
     assert ret_data['id'] == client_id
     db_data = db.session.query(models.Application).filter_by(email=data['email']).one()
-    assert bcrypt.check_password_hash(db_data.client_secret, ret_data['client_secret'])
+    assert len(ret_data['client_secret']) == config.Config.CLIENT_SECRET_LENGTH
+    assert secret_hasher.verify(db_data.client_secret, ret_data['client_secret']) == (True, False)
+    # --> authentications with the previous secret are no longer remembered
+    assert client_id not in secret_cache
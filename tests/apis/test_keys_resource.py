@@ -0,0 +1,40 @@
+import pytest
+
+from authorization_server.app import key_ring
+
+RESOURCE_URI = '/api/keys/jwks.json'
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_get(frontend_app):
+    '''Test that when getting the JWK Set:
+
+    1) All published public keys are served with a strong ETag and a long-lived public Cache-Control
+    2) If the ETag provided in If-None-Match is still valid => 304 without body
+    3) If the ETag provided is stale => 200 with the full JWK Set
+    '''
+
+    # (1)
+    response = frontend_app.get(RESOURCE_URI)
+    assert response.status_code == 200
+    ret_data = response.get_json()
+    assert [key['kid'] for key in ret_data['keys']] == [entry.kid for entry in key_ring.published()]
+    assert all('d' not in key for key in ret_data['keys'])
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert response.cache_control.public
+    assert response.cache_control.max_age == frontend_app.application.config['JWKS_MAX_AGE']
+
+    # (2)
+    response = frontend_app.get(RESOURCE_URI, headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304
+    assert not response.get_data()
+
+    # (3)
+    response = frontend_app.get(RESOURCE_URI, headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    assert response.get_json() == ret_data
@@ -0,0 +1,57 @@
+import os
+import pytest
+
+from authorization_server.app import client_cache
+
+RESOURCE_URI = '/api/metrics/pool'
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_get_pool(frontend_app):
+    '''Ensure that the connection pool metrics:
+
+    1) Are not served unless METRICS_ENABLED is set
+    2) Are those of the worker process serving the request otherwise
+    '''
+
+    # (1)
+    response = frontend_app.get(RESOURCE_URI)
+    assert response.status_code == 404
+
+    # (2)
+    frontend_app.application.config['METRICS_ENABLED'] = True
+    response = frontend_app.get(RESOURCE_URI)
+    assert response.status_code == 200
+    ret_data = response.get_json()
+    assert ret_data['pid'] == os.getpid()
+    assert ret_data['pool']
+    assert response.cache_control.no_store
+
+
+def test_get_caches(frontend_app):
+    '''Ensure that the cache metrics:
+
+    1) Are not served unless METRICS_ENABLED is set
+    2) Report the hits and misses of every per-process cache otherwise
+    '''
+
+    # (1)
+    response = frontend_app.get('/api/metrics/caches')
+    assert response.status_code == 404
+
+    # (2)
+    frontend_app.application.config['METRICS_ENABLED'] = True
+    client_cache.clear()
+    client_cache.get('unknown')
+    response = frontend_app.get('/api/metrics/caches')
+    assert response.status_code == 200
+    ret_data = response.get_json()
+    assert ret_data['pid'] == os.getpid()
+    assert set(ret_data) == {'pid', 'client_cache', 'introspection_cache', 'user_cache', 'redirect_registry'}
+    assert ret_data['client_cache'] == {'hits': 0, 'misses': 1, 'size': 0,
+                                        'maxsize': frontend_app.application.config['CLIENT_CACHE_SIZE']}
+    assert response.cache_control.no_store
@@ -1,6 +1,7 @@
 import pytest
 
-from authorization_server.apis import utils
+from unittest.mock import patch
+from authorization_server.apis import errors as api_errors, utils
 
 
 @pytest.fixture
@@ -12,27 +13,45 @@ def test_make_response():
     '''
     1) RESPONSE_<<CODE>> attribute is picked up
     2) RESPONSE_<<CODE>>_<<METHOD>> attribute is picked up
-    3) Referencing to a CODE whose associated attribute does not exist => throw a NameError
+    3) Referencing to a CODE whose associated attribute does not exist => throw a KeyError
     '''
 
-    attributes = ['RESPONSE_700', 'RESPONSE_800_POST']
     ms_body = 'This a test string representing a non-existing NUMBER error {description}'
-    setattr(utils, attributes[0], ms_body.replace('NUMBER', '700'))
-    setattr(utils, attributes[1], ms_body.replace('NUMBER', '800'))
+    namespace = {'RESPONSE_700': ms_body.replace('NUMBER', '700'),
+                 'RESPONSE_800_POST': ms_body.replace('NUMBER', '800'),
+                 'RESPONSE_900_POST': {'id': 'Not an envelop'}}
 
-    try:
-        assert all([keyword in utils.make_response(700, message='Custom Description')]
-                   for keyword in ('non-existing 700', 'Custom Description'))
+    with patch.dict(utils.MESSAGES, utils.build_catalog(namespace)):
+        # (1)
+        message, code = utils.make_response(700, message='Custom Description')
+        assert code == 700
+        assert message['message'] == 'This a test string representing a non-existing 700 error Custom Description'
+        message, code = utils.make_response(700)
+        assert message['message'] == namespace['RESPONSE_700']
 
-        assert all([keyword in utils.make_response(800, method='POST', message='Custom Description')]
-                   for keyword in ('non-existing 700', 'Custom Description'))
+        # (2)
+        message, code = utils.make_response(800, method='POST', message='Custom Description')
+        assert message['message'] == 'This a test string representing a non-existing 800 error Custom Description'
 
-        with pytest.raises(NameError):
-            utils.make_response(900)
+        # (3)
+        for args in ((900,), (900, 'POST'), (800,)):
+            with pytest.raises(KeyError):
+                utils.make_response(*args)
 
-    finally:
-        list(delattr(utils, x) for x in attributes)
-        assert not all([getattr(utils, x, None) for x in attributes])
+    assert utils.make_response(409, message='Custom Description')[0]['message'] == \
+        utils.RESPONSE_409.replace('{description}', 'Custom Description')
+
+
+def test_api_errors():
+    '''Ensure that errors wrap their message up with their envelop, if any, as the envelop's placeholder was replaced
+    '''
+
+    for envelop in (utils.RESPONSE_400, 'Not in the catalog: {description}', 'No placeholder', None):
+        for message in ('Custom Description', None):
+            error = api_errors.Conflict409Error(message=message, envelop=envelop)
+            expected = envelop.replace('{description}', message) if envelop and message else envelop or message
+            assert error.message == expected
+            assert error.to_response() == ({'error': {'code': 409, 'message': expected}}, 409)
 
 
 def test_generate_password():
@@ -44,9 +63,3 @@ def test_generate_password():
         assert any(c.islower() for c in password)
         assert any(c.isupper() for c in password)
         assert sum(c.isdigit() for c in password) >= 3
-
-
-def test_is_url_valid():
-
-    assert not any(map(utils.is_url_valid, ['something', 'https://not url', 'http://www.appdomain.com']))
-    assert all(map(utils.is_url_valid, ['https://localhost', 'https://appdomain.com', 'https://www.appdomain.com']))
@@ -1,6 +1,7 @@
 import pytest
 import shutil
 
+from flask import current_app
 from authorization_server import config
 from authorization_server.app import create_app
 from tests import utils as test_utils
@@ -11,9 +12,8 @@ class TestConfig(config.Config):
     # Needed for form's unit test validation
     WTF_CSRF_ENABLED = False
 
-    # Needed for flask_beaker_session extension
-    SESSION_TESTING = True
-    SESSION_DATA_DIR = './.sessions'
+    SESSION_FILE_DIR = './.sessions'
+    CLIENT_SECRET_HMAC_KEY = 'client secret hmac key'
 
 
 @pytest.fixture(scope='session', autouse=True)
@@ -25,7 +25,7 @@ def reset_test_suite():
         yield
     finally:
         try:
-            shutil.rmtree(TestConfig.SESSION_DATA_DIR)
+            shutil.rmtree(TestConfig.SESSION_FILE_DIR)
         except Exception:
             pass
 
@@ -45,6 +45,17 @@ def reset_database():
     yield
 
 
+@pytest.fixture(params=['database', 'stateless'])
+def auth_code_mode(request, monkeypatch):
+    '''Run a test with authorisation codes stored in the database and with stateless ones. Must be requested before
+    frontend_app so that the app it creates picks the mode up.
+    '''
+    stateless = request.param == 'stateless'
+    monkeypatch.setattr(TestConfig, 'AUTH_CODE_STATELESS', stateless)
+    monkeypatch.setitem(current_app.config, 'AUTH_CODE_STATELESS', stateless)
+    return request.param
+
+
 @pytest.fixture
 def frontend_app():
     app = create_app(config_class=TestConfig)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import pytest
+
+from authorization_server import asgi, models
+from authorization_server.app import db
+from tests.conftest import TestConfig
+from tests.apis.test_client_token import generate_db_auth_code_context
+
+
+@pytest.fixture
+def asgi_app():
+    return asgi.ASGIApp(asgi.create_app(TestConfig), workers=2)
+
+
+def request(asgi_app, method, path, payload=None):
+    '''Send a request to the ASGI app -its body in two chunks- and return its status, headers and json body
+    '''
+
+    body = json.dumps(payload).encode()
+    received = [{'type': 'http.request', 'body': body[:5], 'more_body': True},
+                {'type': 'http.request', 'body': body[5:]}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'scheme': 'https', 'headers': [(b'host', b'auth.com')]}
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(asgi_app(scope, receive, send))
+    finally:
+        loop.close()
+    return sent[0]['status'], dict(sent[0]['headers']), json.loads(sent[1]['body'])
+
+
+def test_routing(asgi_app):
+    '''Ensure that only the routes served are found and that they only accept POST requests
+    '''
+
+    status, headers, body = request(asgi_app, 'POST', '/api/client/introspection')
+    assert status == 404 and body['error']['code'] == 404
+
+    status, headers, body = request(asgi_app, 'GET', '/api/client/')
+    assert status == 405 and headers[b'allow'] == b'POST'
+
+
+def test_registration_verification(asgi_app):
+    '''Ensure that registering and verifying a client goes through the same validation as the Flask resources:
+
+    1) Invalid requests get the same errors
+    2) A registered client is created and, once allowed, can be verified, getting its client secret
+    '''
+
+    # (1)
+    status, headers, body = request(asgi_app, 'POST', '/api/client/registration', [])
+    assert status == 400 and 'Incorrect type' in body['error']['message']
+    status, headers, body = request(asgi_app, 'POST', '/api/client/verification', {'id': 'x', 'reg_token': 'y'})
+    assert status == 409 and 'https://auth.com/api/client/registration' in body['error']['message']
+
+    # (2)
+    post_data = {
+        'email': 'info@appdomain.com',
+        'name': 'App Domain',
+        'description': 'App Domain ...',
+        'web_url': 'https://www.appdomain.com',
+        'redirect_uri': 'https://appdomain.com/callback'
+    }
+    status, headers, body = request(asgi_app, 'POST', '/api/client/registration', post_data)
+    assert status == 201
+    # --> the registration is then allowed by an administrator
+    db_app = db.session.query(models.Application).filter_by(id=body['id']).one()
+    db_app.reg_token = 'this is a token'
+    db_app.is_allowed = True
+    db.session.commit()
+
+    status, headers, body = request(asgi_app, 'POST', '/api/client/verification',
+                                    {'id': db_app.id, 'reg_token': db_app.reg_token})
+    assert status == 201 and body['client_secret']
+
+
+def test_token(asgi_app):
+    '''Ensure that a valid authorisation code is exchanged for a token once only
+    '''
+
+    post_data, client_data, db_auth_code = generate_db_auth_code_context()
+    status, headers, body = request(asgi_app, 'POST', '/api/client/', post_data)
+    assert status == 201 and body['token_type'] == 'bearer'
+    assert headers[b'cache-control'] == b'no-store'
+
+    status, headers, body = request(asgi_app, 'POST', '/api/client/', post_data)
+    assert status == 403 and "'authorization_code' already" in body['error']['message']
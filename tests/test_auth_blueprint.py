@@ -1,7 +1,9 @@
 import base64
+import re
+import time
 
 from sqlalchemy.orm import exc
-from authorization_server import models, oauth_code
+from authorization_server import consent, models, oauth_code
 from authorization_server.app import db
 from unittest.mock import patch
 from tests import utils as test_utils
@@ -137,8 +139,13 @@ def test_code_request_view_200_successfully(frontend_app):
     assert response.status_code == 200
     assert all([keyword in response.get_data(as_text=True)]
                for keyword in ['This application would like:', 'Allow', 'Cancel'])
+    # The authorisation request is carried by the consent ticket of the form instead of the session
+    ticket = re.search(r'name="ticket"[^>]* value="([^"]+)"', response.get_data(as_text=True)).group(1)
+    user_id = db.session.query(models.User).one().id
+    assert consent.load_ticket(ticket, user_id) == {'client_id': client_id, 'state': state, 'scope': None,
+                                                    'redirect_uri': client_data[0]['redirect_uri']}
     with frontend_app.session_transaction() as session:
-        assert 'auth_code_request' in session
+        assert 'auth_code_request' not in session
 
 
 def test_code_response_login_required(frontend_app):
@@ -156,12 +163,16 @@ def test_code_response_login_required(frontend_app):
 def test_code_response_view_302_wrong_source(frontend_app):
     '''Test 302 redirection cases for code_response as follows:
 
-    1) If not coming from code_request view => redirect to code_request
-    2) if does come from code_request view but the form was not submitted up there => redirect to code_request
+    1) If the form was not submitted => redirect to code_request
+    2) If not coming from code_request view -the consent ticket is forged, issued to another user or expired- =>
+    redirect to code_request
     '''
 
     client_data, user_data = test_utils.add_user_client_context_to_db()
     test_utils.perform_logged_in(frontend_app, user_data)
+    user_id = db.session.query(models.User).one().id
+    auth_code = oauth_code.AuthorisationCode(url_args={'client_id': client_data[0]['id'], 'state': 'state',
+                                                       'redirect_uri': client_data[0]['redirect_uri']})
 
     # (1)
     response = frontend_app.get('/auth/code_response')
@@ -169,12 +180,14 @@ def test_code_response_view_302_wrong_source(frontend_app):
     assert all(keywords in response.headers['Location'] for keywords in ('auth', 'code_request'))
 
     # (2)
-    with frontend_app.session_transaction() as session:
-        session['auth_code_request'] = 'something'
-
-    response = frontend_app.get('/auth/code_response')
-    assert response.status_code == 302
-    assert all(keywords in response.headers['Location'] for keywords in ('auth', 'code_request'))
+    expired = consent.issue_ticket(auth_code, user_id)
+    time.sleep(1)
+    for ticket in ('something', consent.issue_ticket(auth_code, user_id + 1), expired):
+        with patch.dict(frontend_app.application.config, {'CONSENT_TICKET_MAX_AGE': 0 if ticket == expired else 120}):
+            response = frontend_app.post('/auth/code_response', data={'ticket': ticket, 'allow': 'Allow'})
+        assert response.status_code == 302
+        assert all(keywords in response.headers['Location'] for keywords in ('auth', 'code_request'))
+    assert not db.session.query(models.AuthorisationCode).all()
 
 
 def test_code_response_view_302_cancel(frontend_app):
@@ -184,17 +197,15 @@ def test_code_response_view_302_cancel(frontend_app):
     client_data, user_data = test_utils.add_user_client_context_to_db()
     test_utils.perform_logged_in(frontend_app, user_data)
 
-    # Emulate that the auth_code request was successfully passed via session variable
+    # Emulate that the auth_code request was successfully passed via consent ticket
     redirect_uri = 'http://client_domain.com/callback'
     state = 'checksum_issued_by_client'
-    with frontend_app.session_transaction() as session:
-        session['auth_code_request'] = {
-            'redirect_uri': redirect_uri,
-            'state': state
-        }
+    auth_code = oauth_code.AuthorisationCode(url_args={'redirect_uri': redirect_uri, 'state': state})
+    ticket = consent.issue_ticket(auth_code, db.session.query(models.User).one().id)
 
     # Mock up that 'Cancel' button has been pressed
     with patch('authorization_server.auth.views.AuthorisationForm') as form:
+        form.return_value.ticket.data = ticket
         form.return_value.cancel.data = True
         response = frontend_app.get('/auth/code_response')
 
@@ -217,20 +228,17 @@ def test_code_response_view_302_allow(frontend_app):
     client_data, user_data = test_utils.add_user_client_context_to_db()
     test_utils.perform_logged_in(frontend_app, user_data)
 
-    # Emulate that the auth_code request was successfully passed via session variable
+    # Emulate that the auth_code request was successfully passed via consent ticket
     redirect_uri = 'http://client_domain.com/callback'
     state = 'checksum_issued_by_client'
-
-    with frontend_app.session_transaction() as session:
-        session['auth_code_request'] = {
-            'redirect_uri': redirect_uri,
-            'state': state,
-            'client_id': client_data[0]['id']
-        }
+    auth_code = oauth_code.AuthorisationCode(url_args={'redirect_uri': redirect_uri, 'state': state,
+                                                       'client_id': client_data[0]['id']})
+    ticket = consent.issue_ticket(auth_code, db.session.query(models.User).one().id)
 
     assert not db.session.query(models.AuthorisationCode).all()
     # Mock up that 'OK' button has been pressed
     with patch('authorization_server.auth.views.AuthorisationForm') as form:
+        form.return_value.ticket.data = ticket
         form.return_value.cancel.data = False
         form.return_value.allow.data = True
         response = frontend_app.get('/auth/code_response')
@@ -243,3 +251,23 @@ def test_code_response_view_302_allow(frontend_app):
         redirect_uri,
         state
     ))
+
+
+def test_code_response_view_302_ticket_replayed(frontend_app):
+    '''Ensure that a consent ticket is single-use: posting it again redirects to code_request and issues no other code
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    test_utils.perform_logged_in(frontend_app, user_data)
+    auth_code = oauth_code.AuthorisationCode(url_args={'client_id': client_data[0]['id'], 'state': 'state',
+                                                       'redirect_uri': client_data[0]['redirect_uri']})
+    ticket = consent.issue_ticket(auth_code, db.session.query(models.User).one().id)
+
+    response = frontend_app.post('/auth/code_response', data={'ticket': ticket, 'allow': 'Allow'})
+    assert response.status_code == 302
+    assert all(keywords in response.headers['Location'] for keywords in ('code=', client_data[0]['redirect_uri']))
+
+    response = frontend_app.post('/auth/code_response', data={'ticket': ticket, 'allow': 'Allow'})
+    assert response.status_code == 302
+    assert all(keywords in response.headers['Location'] for keywords in ('auth', 'code_request'))
+    assert len(db.session.query(models.AuthorisationCode).all()) == 1
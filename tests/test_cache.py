@@ -0,0 +1,148 @@
+import pytest
+
+from authorization_server import cache
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_ttl_cache_get_set():
+    '''Ensure that the cache:
+
+    1) Returns the stored value until its time-to-live elapses and the default afterwards
+    2) Never keeps a value longer than its default time-to-live
+    3) Counts hits and misses
+    '''
+
+    ttl_cache = cache.TTLCache(maxsize=10, ttl=10)
+
+    # (1)
+    ttl_cache.set('key', 'value', ttl=5, now=0)
+    assert ttl_cache.get('key', now=4) == 'value'
+    assert ttl_cache.get('key', default='default', now=5) == 'default'
+    assert not len(ttl_cache)
+
+    # (2)
+    ttl_cache.set('key', 'value', ttl=100, now=0)
+    assert ttl_cache.get('key', now=9) == 'value'
+    assert ttl_cache.get('key', now=10) is None
+
+    # (3)
+    assert ttl_cache.stats() == {'hits': 2, 'misses': 2, 'size': 0, 'maxsize': 10}
+
+
+def test_ttl_cache_lru_eviction():
+    '''When the cache is full, the least recently used entry is evicted
+    '''
+
+    ttl_cache = cache.TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set('a', 1, now=0)
+    ttl_cache.set('b', 2, now=0)
+    assert ttl_cache.get('a', now=1) == 1
+    ttl_cache.set('c', 3, now=1)
+    assert ttl_cache.get('b', now=1) is None
+    assert ttl_cache.get('a', now=1) == 1 and ttl_cache.get('c', now=1) == 3
+
+
+def test_ttl_cache_pop_clear():
+    ttl_cache = cache.TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set('a', 1)
+    assert 'a' in ttl_cache
+    assert ttl_cache.pop('a') == 1
+    assert ttl_cache.pop('a', 'default') == 'default'
+
+    ttl_cache.set('a', 1)
+    ttl_cache.clear()
+    assert 'a' not in ttl_cache
+    assert ttl_cache.stats()['hits'] == 0
+
+
+def test_verified_secret_cache():
+    '''Ensure that a remembered authentication:
+
+    1) Only matches the same client, secret and stored hash
+    2) Is forgotten once invalidated or once its time-to-live elapses
+    3) Is not stored as the plain secret
+    '''
+
+    secret_cache = cache.VerifiedSecretCache(maxsize=10, ttl=10)
+    secret_cache.remember('client', 'secret', 'hash')
+
+    # (1)
+    assert secret_cache.is_verified('client', 'secret', 'hash')
+    assert not secret_cache.is_verified('client', 'other secret', 'hash')
+    assert not secret_cache.is_verified('client', 'secret', 'new hash')
+    assert not secret_cache.is_verified('other client', 'secret', 'hash')
+
+    # (2)
+    secret_cache.invalidate('client')
+    assert not secret_cache.is_verified('client', 'secret', 'hash')
+    secret_cache.set('client', secret_cache._digest('client', 'secret', 'hash'), now=0)
+    assert not secret_cache.is_verified('client', 'secret', 'hash')
+
+    # (3)
+    secret_cache.remember('client', 'secret', 'hash')
+    assert b'secret' not in secret_cache.get('client')
+
+
+def test_client_cache():
+    '''Ensure that the client cache:
+
+    1) Only loads -in a single call- the clients that are not cached and does not cache those that do not exist
+    2) Serves cached clients afterwards, counting hits and misses
+    3) Loads a client again once invalidated
+    '''
+
+    loaded = []
+
+    def loader(client_ids):
+        loaded.append(sorted(client_ids))
+        return {client_id: client_id.upper() for client_id in client_ids if client_id != 'unknown'}
+
+    client_cache = cache.ClientCache(maxsize=10, ttl=10)
+
+    # (1)
+    assert client_cache.fetch_many(['a', 'b', 'unknown'], loader) == {'a': 'A', 'b': 'B'}
+    assert loaded == [['a', 'b', 'unknown']]
+
+    # (2)
+    assert client_cache.fetch('a', loader) == 'A'
+    assert client_cache.fetch_many(['a', 'b'], loader) == {'a': 'A', 'b': 'B'}
+    assert len(loaded) == 1
+    assert client_cache.stats() == {'hits': 3, 'misses': 3, 'size': 2, 'maxsize': 10}
+
+    # (3)
+    client_cache.invalidate('a')
+    assert client_cache.fetch('a', loader) == 'A'
+    assert loaded[-1] == ['a']
+
+
+def test_client_cache_refresh():
+    '''Ensure that refreshing a client:
+
+    1) Serves it from the cache if its entry is younger than the given age
+    2) Loads it again otherwise, or if it is not cached
+    '''
+
+    loaded = []
+
+    def loader(client_ids):
+        loaded.append(sorted(client_ids))
+        return {client_id: client_id.upper() for client_id in client_ids}
+
+    client_cache = cache.ClientCache(maxsize=10, ttl=60)
+    client_cache.set('a', 'A', now=0)
+
+    # (1)
+    assert client_cache.age('a', now=4) == 4
+    assert client_cache.refresh('a', loader, 5, now=4) == 'A'
+    assert not loaded
+
+    # (2)
+    assert client_cache.refresh('a', loader, 5, now=5) == 'A'
+    assert loaded == [['a']]
+    assert client_cache.refresh('b', loader, 5) == 'B'
+    assert loaded[-1] == ['b']
+    assert client_cache.age('unknown') is None
@@ -0,0 +1,61 @@
+import pytest
+
+from authorization_server import claims, errors
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_issue():
+    '''Ensure that issued claims are integer seconds valid for the given lifetime and the given use
+    '''
+
+    validator = claims.ClaimsValidator()
+    issued = validator.issue(600, 'access', now=1000)
+    assert issued == {'iat': 1000, 'nbf': 1000, 'exp': 1600, 'token_use': 'access'}
+    assert validator.validate(issued, 'access', now=1599) == issued
+
+
+def test_validate():
+    '''Ensure that:
+
+    1) Claims past their 'exp' -beyond the leeway- raise ExpiredClaimsError
+    2) A missing 'exp' or a time claim that is not an integer raise InvalidClaimsError
+    3) 'nbf' or 'iat' in the future -beyond the leeway- raise InvalidClaimsError
+    '''
+
+    validator = claims.ClaimsValidator(leeway=30)
+
+    # (1)
+    assert validator.validate({'exp': 1000, 'token_use': 'access'}, 'access', now=1029)
+    with pytest.raises(errors.ExpiredClaimsError):
+        validator.validate({'exp': 1000, 'token_use': 'access'}, 'access', now=1030)
+
+    # (2)
+    for invalid in ({}, {'exp': '1000'}, {'exp': 1000.5}, {'exp': True}, {'exp': 2000, 'iat': None}):
+        with pytest.raises(errors.InvalidClaimsError):
+            validator.validate(dict(invalid, token_use='access'), 'access', now=1000)
+
+    # (3)
+    assert validator.validate({'exp': 2000, 'nbf': 1030, 'iat': 1030, 'token_use': 'access'}, 'access', now=1000)
+    with pytest.raises(errors.InvalidClaimsError):
+        validator.validate({'exp': 2000, 'nbf': 1031, 'token_use': 'access'}, 'access', now=1000)
+    with pytest.raises(errors.InvalidClaimsError):
+        validator.validate({'exp': 2000, 'iat': 1031, 'token_use': 'access'}, 'access', now=1000)
+
+
+def test_validate_token_use():
+    '''Ensure that claims are only valid for the use they were issued for: the claims of an authorisation code, or
+    claims without a 'token_use', never pass for an access token and the other way round
+    '''
+
+    validator = claims.ClaimsValidator()
+    code_claims = validator.issue(60, 'authorization_code', now=1000)
+    token_claims = validator.issue(600, 'access', now=1000)
+    assert validator.validate(code_claims, 'authorization_code', now=1000)
+    for invalid, token_use in ((code_claims, 'access'), (token_claims, 'authorization_code'),
+                               ({'exp': 2000}, 'access')):
+        with pytest.raises(errors.InvalidClaimsError):
+            validator.validate(invalid, token_use, now=1000)
@@ -0,0 +1,212 @@
+import csv
+import json
+import os
+
+from datetime import datetime, timedelta
+from authorization_server import models, oauth_code, onboarding
+from authorization_server.app import create_app, crypto_executor, db, key_ring, secret_hasher
+from tests import utils as test_utils
+from tests.conftest import TestConfig
+from unittest.mock import patch
+
+
+def test_keys_rotate(tmp_path):
+    '''Test that 'flask keys rotate':
+
+    1) Fails if no keys directory is configured
+    2) Writes a new private key only readable by its owner that the key ring publishes straight away
+    '''
+
+    # (1)
+    app = create_app(config_class=TestConfig)
+    result = app.test_cli_runner().invoke(args=['keys', 'rotate'])
+    assert result.exit_code != 0
+    assert 'JWT_KEYS_DIR' in result.output
+
+    # (2)
+    class KeysDirConfig(TestConfig):
+        JWT_KEYS_DIR = str(tmp_path)
+
+    app = create_app(config_class=KeysDirConfig)
+    try:
+        result = app.test_cli_runner().invoke(args=['keys', 'rotate', '--size', '1024'])
+        assert result.exit_code == 0
+        filenames = os.listdir(str(tmp_path))
+        assert len(filenames) == 1
+        assert os.stat(os.path.join(str(tmp_path), filenames[0])).st_mode & 0o777 == 0o600
+        kid = filenames[0][:-len('.pem')].split('-', 1)[1]
+        assert kid in key_ring
+        assert key_ring.signing_kid != kid
+    finally:
+        # Leave the shared key ring as the rest of the test suite expects it
+        create_app(config_class=TestConfig)
+
+
+def test_codes_purge():
+    '''Test that 'flask codes purge':
+
+    1) Deletes expired codes and reports how many
+    2) Fails, telling to partition the table first, if AUTH_CODE_PARTITIONED is set but the table is not partitioned
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    db.session.add(models.AuthorisationCode(application_id=client_data[0]['id'],
+                                            created=datetime.now() - timedelta(days=1)))
+    db.session.add(models.AuthorisationCode(application_id=client_data[0]['id']))
+    db.session.commit()
+
+    # (1)
+    app = create_app(config_class=TestConfig)
+    result = app.test_cli_runner().invoke(args=['codes', 'purge', '--batch-size', '10'])
+    assert result.exit_code == 0
+    assert '1 authorisation codes deleted in 1 batches' in result.output
+    assert db.session.query(models.AuthorisationCode).count() == 1
+
+    # (2)
+    class PartitionedConfig(TestConfig):
+        AUTH_CODE_PARTITIONED = True
+
+    app = create_app(config_class=PartitionedConfig)
+    result = app.test_cli_runner().invoke(args=['codes', 'purge'])
+    assert result.exit_code != 0
+    assert "flask codes partition" in result.output
+
+
+def test_clients_import(tmp_path):
+    '''Test that 'flask clients import':
+
+    1) Imports the valid rows as verified clients whose credentials are written to a file only readable by its owner
+    2) Rejects rows that are invalid, repeated in the file or already registered, reporting their line
+    3) Refuses to overwrite an existing credentials file
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    rows = [{'name': f"App {number}", 'description': 'Partner app', 'email': f"app{number}@partner.com",
+             'web_url': f"https://app{number}.partner.com", 'redirect_uri': f"https://app{number}.partner.com/callback"}
+            for number in range(5)]
+    rows[1]['web_url'] = 'not a url'
+    rows[2]['email'] = rows[0]['email']
+    rows[3]['redirect_uri'] = client_data[0]['redirect_uri']
+    del rows[4]['name']
+    rows.extend(dict(rows[0], email=f"app{number}@partner.com", web_url=f"https://app{number}.partner.com",
+                     redirect_uri=f"https://app{number}.partner.com/callback") for number in range(5, 10))
+    source = tmp_path / 'clients.jsonl'
+    source.write_text('\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+    credentials = tmp_path / 'credentials.csv'
+
+    app = create_app(config_class=TestConfig)
+    result = app.test_cli_runner().invoke(args=['clients', 'import', str(source), str(credentials),
+                                                '--chunk-size', '3', '--workers', '1'])
+    assert result.exit_code == 0
+    assert '6 clients imported and 5 rejected' in result.output
+
+    # (1)
+    assert os.stat(str(credentials)).st_mode & 0o777 == 0o600
+    with open(str(credentials)) as fh:
+        imported = list(csv.DictReader(fh))
+    assert sorted(client['email'] for client in imported) == \
+        sorted(rows[number]['email'] for number in (0, 5, 6, 7, 8, 9))
+    for client in imported:
+        db_app = db.session.query(models.Application).filter_by(id=client['id']).one()
+        assert db_app.is_allowed and db_app.email == client['email']
+        assert secret_hasher.verify(db_app.client_secret, client['client_secret']) == (True, False)
+
+    # (2)
+    for line, reason in ((2, 'valid url'), (3, 'repeated in the file'), (4, 'redirect_uri'), (5, "'name'"),
+                         (11, 'could not be parsed')):
+        assert reason in result.output.split(f"Line {line}: ")[1].split('\n')[0]
+
+    # (3)
+    result = app.test_cli_runner().invoke(args=['clients', 'import', str(source), str(credentials)])
+    assert result.exit_code != 0
+    assert 'already exists' in result.output
+
+
+def test_users_import(tmp_path):
+    '''Test that 'flask users import':
+
+    1) Imports bcrypt hashes as they are and hashes plaintext passwords
+    2) Rejects rows that are invalid or whose email is repeated in the file or already registered, reporting their line
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    pw_hash = crypto_executor.generate_password_hash('legacy password').decode('utf-8')
+    rows = [['Jane', 'Doe', 'jane@legacy.com', pw_hash, ''],
+            ['John', 'Doe', 'john@legacy.com', '', 'plain password'],
+            ['Jim', 'Doe', 'jane@legacy.com', '', 'other password'],
+            ['Joe', 'Doe', user_data['email'], '', 'other password'],
+            ['Jack', 'Doe', 'jack@legacy.com', 'not a hash', ''],
+            ['Jill', 'Doe', 'jill@legacy.com', '', ''],
+            ['Jo', 'Doe', 'not an email', '', 'other password']]
+    rows.extend([f"User {number}", 'Doe', f"user{number}@legacy.com", '', 'password'] for number in range(3))
+    source = tmp_path / 'users.csv'
+    with open(str(source), 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['firstname', 'lastname', 'email', 'password_hash', 'password'])
+        writer.writerows(rows)
+
+    app = create_app(config_class=TestConfig)
+    result = app.test_cli_runner().invoke(args=['users', 'import', str(source), '--chunk-size', '2', '--workers', '1'])
+    assert result.exit_code == 0
+    assert '5 users imported and 5 rejected' in result.output
+
+    # (1)
+    users = {user.email: user for user in db.session.query(models.User).filter(models.User.email.like('%@legacy.com'))}
+    assert sorted(users) == sorted(['jane@legacy.com', 'john@legacy.com'] +
+                                   [f"user{number}@legacy.com" for number in range(3)])
+    assert users['jane@legacy.com'].password == pw_hash
+    assert crypto_executor.check_password_hash(users['john@legacy.com'].password, 'plain password')
+    assert users['user0@legacy.com'].firstname == 'User 0'
+
+    # (2)
+    for line, reason in ((4, 'already been registered'), (5, 'already been registered'), (6, 'bcrypt'),
+                         (7, "'password'"), (8, 'valid email')):
+        assert reason in result.output.split(f"Line {line}: ")[1].split('\n')[0]
+
+
+def test_insert_chunk():
+    '''Test that a chunk with a row already registered is split rather than inserted row by row: only that row is
+    rejected and the rest of the chunk takes a number of statements logarithmic in its size
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    records = [(line, {'firstname': 'User', 'lastname': 'Doe', 'email': f"user{line}@chunk.com", 'password': None})
+               for line in range(16)]
+    records[5][1]['email'] = user_data['email']
+    rejected = []
+
+    with patch.object(db.session, 'execute', wraps=db.session.execute) as mock_execute:
+        inserted = onboarding.insert_chunk(models.User.__table__, records, lambda *args: rejected.append(args))
+    assert [line for line, _ in inserted] == [line for line in range(16) if line != 5]
+    assert rejected == [(5, f"email '{user_data['email']}' has already been registered")]
+    assert mock_execute.call_count == 9
+    assert db.session.query(models.User).filter(models.User.email.like('%@chunk.com')).count() == 15
+
+
+def test_clients_add_redirect_uri():
+    '''Test that 'flask clients add-redirect-uri':
+
+    1) Adds the normalised uri to the redirect uris of the client, which the redirect registry picks up straight away
+    2) Refuses invalid urls, unknown clients and uris the client has already
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    client_id = client_data[0]['id']
+    app = create_app(config_class=TestConfig)
+    runner = app.test_cli_runner()
+    assert not oauth_code.is_redirect_uri_allowed(oauth_code.fetch_client(client_id), 'https://other.appdomain.com/')
+
+    # (1)
+    result = runner.invoke(args=['clients', 'add-redirect-uri', client_id, 'https://Other.AppDomain.com'])
+    assert result.exit_code == 0
+    assert db.session.query(models.RedirectURI.uri).filter_by(application_id=client_id).scalar() == \
+        'https://other.appdomain.com/'
+    assert oauth_code.is_redirect_uri_allowed(oauth_code.fetch_client(client_id), 'https://other.appdomain.com/')
+
+    # (2)
+    for args, error in (([client_id, 'http://other.appdomain.com'], 'not a valid url'),
+                        (['unknown', 'https://other.appdomain.com'], 'does not exist'),
+                        ([client_id, 'https://other.appdomain.com:443/'], 'already')):
+        result = runner.invoke(args=['clients', 'add-redirect-uri'] + args)
+        assert result.exit_code != 0
+        assert error in result.output
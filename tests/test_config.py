@@ -85,3 +85,28 @@ def test_public_key_verification():
     # Deconstruct the signed jwt token by decrypting it with the public key
     deconstructed_jwt_token = jwt.JWT(key=jwk.JWK.from_json(config.Config.JWK_PUBLIC), jwt=signed_jwt_token)
     assert json.loads(deconstructed_jwt_token.claims) == payload
+
+
+@pytest.mark.parametrize('filename, alg', [('rs256.pem', 'RS256'), ('es256.pem', 'ES256'), ('eddsa.pem', 'EdDSA')])
+def test_config_mixin_algorithms(filename, alg):
+    '''Ensure that RSA, EC P-256 and Ed25519 private keys are loaded and the JWS algorithm is given by the key
+    '''
+
+    try:
+        with patch.object(config.os, 'getenv', return_value=join(test_utils.TEST_PATH, 'keys', filename)):
+            config.ConfigMixin.init()
+        assert config.ConfigMixin.alg == alg
+        assert json.loads(config.ConfigMixin.private_jwk)['alg'] == alg
+        assert json.loads(config.ConfigMixin.public_jwk)['alg'] == alg
+    finally:
+        config.ConfigMixin = utils.init_class(config.ConfigMixin)
+
+
+def test_config_mixin_unsupported_key(tmp_path):
+    '''Keys that we do not know how to sign with are rejected
+    '''
+
+    path = tmp_path / 'es384.pem'
+    path.write_bytes(jwk.JWK.generate(kty='EC', crv='P-384').export_to_pem(private_key=True, password=None))
+    with pytest.raises(errors.ConfigError):
+        config.ConfigMixin.load_private_key(str(path))
@@ -0,0 +1,77 @@
+import pytest
+
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, sqlite
+from authorization_server import models, partitions
+from authorization_server.app import db
+
+
+def query_plan(query):
+    '''Return the plan the database follows to run a query as a list of rows, one per table accessed
+    '''
+    dialect = db.engine.dialect.name
+    statement = query.statement if hasattr(query, 'statement') else query
+    sql = str(statement.compile(dialect=mysql.dialect() if dialect == 'mysql' else sqlite.dialect(),
+                                compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN' if dialect == 'mysql' else 'EXPLAIN QUERY PLAN'
+    return [dict(row) for row in db.engine.execute(f"{prefix} {sql}")]
+
+
+def uses_index(plan, name=None):
+    '''Whether every table access in a query plan searches an index -the given one if any- rather than scanning the
+    table. SQLite may search the table by rowid instead, in which case no index is named.
+    '''
+    if db.engine.dialect.name == 'mysql':
+        return all(row['key'] and (name is None or row['key'] == name) for row in plan)
+    return all(row['detail'].startswith('SEARCH') and
+               (name is None or name in row['detail'] or 'INDEX' not in row['detail']) for row in plan)
+
+
+@pytest.mark.parametrize('query', [
+    lambda: db.session.query(models.Application).filter_by(id='client id'),
+    lambda: db.session.query(models.Application).filter_by(email='client@appdomain.com'),
+    lambda: db.session.query(models.Application).filter_by(id='client id', reg_token='token', is_allowed=True),
+    lambda: db.session.query(models.User).filter(models.User.email == 'johndoe@gmail.com'),
+    lambda: db.session.query(models.AuthorisationCode.id).filter_by(id=1, application_id='client id')
+])
+def test_hot_queries_use_indexes(query):
+    '''Ensure the lookups run on every request are served by an index
+    '''
+    assert uses_index(query_plan(query()))
+
+
+def test_purge_uses_created_index():
+    '''Ensure that finding the newest expired code -the upper bound of the purge- does not scan the table
+    '''
+    table = models.AuthorisationCode.__table__
+    query = db.session.query(func.max(table.c.id)).filter(table.c.created < datetime(2019, 1, 1))
+    assert uses_index(query_plan(query), 'ix_authorisation_code_created')
+
+
+def test_partition_statements():
+    '''Ensure that partitioning creates a partition per day ahead and that maintenance creates the days to come and
+    drops the days before the cutoff, refusing tables that are not partitioned
+    '''
+
+    today = datetime(2019, 8, 10).date()
+    statements = partitions.partition_statements(today, 2, foreign_keys=['authorisation_code_ibfk_1'])
+    assert statements[0] == 'ALTER TABLE authorisation_code DROP FOREIGN KEY authorisation_code_ibfk_1'
+    assert 'ADD PRIMARY KEY (id, created)' in statements[1]
+    assert all(f"PARTITION {name} VALUES LESS THAN" in statements[2] for name in ('p20190810', 'p20190812', 'pmax'))
+    assert "p20190812 VALUES LESS THAN (TO_DAYS('2019-08-13'))" in statements[2]
+
+    existing = ['p20190808', 'p20190809', 'p20190810', 'p20190811', 'p20190812', 'pmax']
+    statements, dropped = partitions.maintenance_statements(existing, datetime(2019, 8, 10, 0, 0, 0), today, 3)
+    assert dropped == ['p20190808', 'p20190809']
+    assert statements == [
+        "ALTER TABLE authorisation_code REORGANIZE PARTITION pmax INTO "
+        "(PARTITION p20190813 VALUES LESS THAN (TO_DAYS('2019-08-14')), PARTITION pmax VALUES LESS THAN MAXVALUE)",
+        "ALTER TABLE authorisation_code DROP PARTITION p20190808, p20190809"
+    ]
+    assert partitions.maintenance_statements(existing, datetime(2019, 8, 9, 23, 0, 0), today, 2) == \
+        (["ALTER TABLE authorisation_code DROP PARTITION p20190808"], ['p20190808'])
+
+    # --> A table that is not partitioned yet is not maintained but partitioned first
+    with pytest.raises(ValueError, match="flask codes partition"):
+        partitions.maintenance_statements([], datetime(2019, 8, 10, 0, 0, 0), today, 3)
@@ -0,0 +1,111 @@
+import json
+import pytest
+import time
+
+from flask_bcrypt import Bcrypt
+from jwcrypto import jws
+from authorization_server import config, errors, executor, keys
+
+
+class ExecutorConfig:
+    CRYPTO_EXECUTOR_WORKERS = 1
+    CRYPTO_EXECUTOR_QUEUE_DEPTH = 1
+    CRYPTO_EXECUTOR_TIMEOUT = 10
+    BCRYPT_LOG_ROUNDS = 4
+
+
+class FakeApp:
+    def __init__(self, **settings):
+        self.config = {key: getattr(ExecutorConfig, key) for key in dir(ExecutorConfig) if key.isupper()}
+        self.config.update(settings)
+        self.extensions = {}
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+@pytest.fixture
+def key_ring():
+    ring = keys.KeyRing()
+    ring.load(config.Config.JWK_PRIVATE)
+    return ring
+
+
+@pytest.fixture
+def pool_executor():
+    crypto_executor = executor.CryptoExecutor(FakeApp())
+    yield crypto_executor
+    crypto_executor.shutdown()
+
+
+def verify(token, ring):
+    jws_token = jws.JWS()
+    jws_token.deserialize(token)
+    jws_token.verify(ring.verification_key(jws_token.jose_header['kid']))
+    return jws_token
+
+
+def test_inline_executor(key_ring):
+    '''Ensure that with no workers the executor:
+
+    1) Runs jobs in the calling thread, producing hashes compatible with flask_bcrypt
+    2) Signs with the algorithm and kid of the given key ring entry
+    '''
+
+    crypto_executor = executor.CryptoExecutor(FakeApp(CRYPTO_EXECUTOR_WORKERS=0))
+
+    # (1)
+    pw_hash = crypto_executor.generate_password_hash('password')
+    assert Bcrypt().check_password_hash(pw_hash, 'password')
+    assert crypto_executor.check_password_hash(pw_hash.decode(), 'password')
+    assert not crypto_executor.check_password_hash(pw_hash.decode(), 'other password')
+    assert crypto_executor._pool is None
+
+    # (2)
+    token = crypto_executor.sign(b'payload', key_ring.signing_entry())
+    jws_token = verify(token, key_ring)
+    assert jws_token.jose_header == {'alg': config.Config.JWT_ALGORITHM, 'kid': key_ring.signing_kid}
+    assert jws_token.payload == b'payload'
+
+
+def test_pool_executor(pool_executor, key_ring):
+    '''Ensure that jobs run in worker processes give the same results as those run inline
+    '''
+
+    pw_hash = pool_executor.generate_password_hash('password')
+    assert pool_executor._pool is not None
+    assert Bcrypt().check_password_hash(pw_hash, 'password')
+    assert pool_executor.check_password_hash(pw_hash, 'password')
+    assert not pool_executor.check_password_hash(pw_hash, 'other password')
+
+    payload = json.dumps({'data': 1}).encode()
+    token = pool_executor.sign(payload, key_ring.signing_entry(), header={'typ': 'JWT'})
+    jws_token = verify(token, key_ring)
+    assert jws_token.jose_header['typ'] == 'JWT'
+    assert json.loads(jws_token.payload) == {'data': 1}
+
+
+def test_pool_executor_limits(pool_executor):
+    '''Ensure that:
+
+    1) A job not completed in time raises CryptoExecutorError
+    2) A job is rejected with CryptoExecutorError when as many jobs as the queue depth are pending
+    3) Once pending jobs are completed, new jobs are accepted again
+    '''
+
+    # (1)
+    pool_executor.timeout = 0.1
+    with pytest.raises(errors.CryptoExecutorError):
+        pool_executor.run(time.sleep, 1)
+
+    # (2)
+    with pytest.raises(errors.CryptoExecutorError) as ex:
+        pool_executor.run(time.sleep, 0)
+    assert 'pending' in str(ex.value)
+
+    # (3)
+    time.sleep(1.5)
+    pool_executor.timeout = 10
+    assert pool_executor.run(abs, -1) == 1
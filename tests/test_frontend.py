@@ -1,7 +1,11 @@
+import threading
+
 from authorization_server import models
-from authorization_server.app import db, bcrypt
+from authorization_server.app import db, bcrypt, crypto_executor, user_cache
 from authorization_server.frontend import forms
 from authorization_server.frontend.views import LOGIN_ERROR_MESSAGE
+from unittest.mock import patch
+from tests import utils as test_utils
 
 
 def test_registration_form(frontend_app):
@@ -150,3 +154,53 @@ def test_login_logout(frontend_app):
     response = frontend_app.post('/login', data=data, follow_redirects=True)
     assert response.status_code == 200
     assert forms.INVALID_PASSWORD_ERROR in response.get_data(as_text=True)
+
+
+def test_user_cache(frontend_app):
+    '''Ensure that the identity of a logged-in user:
+
+    1) Is cached, so that further page views do not query the database
+    2) Is forgotten when the user is updated and when the user logs out
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    test_utils.perform_logged_in(frontend_app, user_data)
+    user_id = str(user_data['id'])
+
+    # (1)
+    assert user_cache.get(user_id).email == user_data['email']
+    with patch.object(db.session, 'query') as mock_query:
+        response = frontend_app.get('/profile')
+        assert not mock_query.called
+    assert response.status_code == 200
+    assert user_data['email'] in response.get_data(as_text=True)
+
+    # (2)
+    user = db.session.query(models.User).get(user_data['id'])
+    user.email = 'new.email@example.com'
+    db.session.commit()
+    assert user_id not in user_cache
+    assert 'new.email@example.com' in frontend_app.get('/profile').get_data(as_text=True)
+
+    assert user_id in user_cache
+    frontend_app.get('/logout')
+    assert user_id not in user_cache
+
+
+def test_login_crypto_executor_saturated(frontend_app):
+    '''Ensure that a login whose password check is rejected by a saturated crypto executor is answered with a 503 and
+    a Retry-After header rather than with a 500
+    '''
+
+    user = models.User(email='johndoe@gmail.com', password=bcrypt.generate_password_hash('password'))
+    db.session.add(user)
+    db.session.commit()
+
+    # --> A pool executor with every slot taken by pending jobs
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    with patch.object(crypto_executor, 'workers', 1), patch.object(crypto_executor, '_slots', slots):
+        response = frontend_app.post('/login', data={'email': user.email, 'password': 'password'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert 'pending' in response.get_data(as_text=True)
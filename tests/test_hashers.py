@@ -0,0 +1,88 @@
+import logging
+import pytest
+
+from concurrent import futures
+from authorization_server import errors, hashers
+from authorization_server.app import crypto_executor
+
+
+class FakeApp:
+    def __init__(self, **settings):
+        self.config = {'CLIENT_SECRET_SCHEME': 'hmac-sha256', 'CLIENT_SECRET_HMAC_KEY': 'hmac key',
+                       'SECRET_KEY': 'secret key'}
+        self.config.update(settings)
+        self.extensions = {}
+        self.logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_hmac_sha256_hasher():
+    '''Ensure that hashes are tagged with the scheme, salted and only verify with the same secret and key
+    '''
+
+    hasher = hashers.HMACSHA256Hasher('key')
+    pw_hash = hasher.hash('secret')
+    assert pw_hash.startswith('hmac-sha256$') and hasher.identify(pw_hash)
+    assert pw_hash != hasher.hash('secret')
+    assert hasher.verify(pw_hash, 'secret')
+    assert not hasher.verify(pw_hash, 'other secret')
+    assert not hashers.HMACSHA256Hasher('other key').verify(pw_hash, 'secret')
+    assert not hasher.verify('hmac-sha256$malformed', 'secret')
+
+
+def test_secret_hasher(caplog):
+    '''Ensure that the secret hasher:
+
+    1) Hashes with the configured scheme
+    2) Verifies hashes of every known scheme, flagging those of other schemes to be rehashed
+    3) Does not verify unrecognised hashes
+    4) Refuses unknown schemes
+    5) Falls back to bcrypt with a warning when the HMAC scheme has no key of its own, even if SECRET_KEY is set
+    '''
+
+    secret_hasher = hashers.SecretHasher(crypto_executor, FakeApp())
+    bcrypt_hash = hashers.BcryptHasher(crypto_executor).hash('secret')
+
+    # (1)
+    pw_hash = secret_hasher.hash('secret')
+    assert secret_hasher.identify(pw_hash).name == 'hmac-sha256'
+
+    # (2)
+    assert secret_hasher.verify(pw_hash, 'secret') == (True, False)
+    assert secret_hasher.verify(bcrypt_hash, 'secret') == (True, True)
+    assert secret_hasher.verify(bcrypt_hash, 'other secret') == (False, False)
+    bcrypt_hasher = hashers.SecretHasher(crypto_executor, FakeApp(CLIENT_SECRET_SCHEME='bcrypt'))
+    assert bcrypt_hasher.verify(bcrypt_hash, 'secret') == (True, False)
+    assert bcrypt_hasher.verify(pw_hash, 'secret') == (True, True)
+
+    # (3)
+    assert secret_hasher.identify('secret') is None
+    assert secret_hasher.verify('secret', 'secret') == (False, False)
+    assert secret_hasher.verify(None, 'secret') == (False, False)
+
+    # (4)
+    with pytest.raises(errors.ConfigError):
+        hashers.SecretHasher(crypto_executor, FakeApp(CLIENT_SECRET_SCHEME='md5'))
+
+    # (5)
+    keyless_hasher = hashers.SecretHasher(crypto_executor, FakeApp(CLIENT_SECRET_HMAC_KEY=None))
+    assert keyless_hasher.default.name == 'bcrypt' and 'hmac-sha256' not in keyless_hasher.schemes
+    assert 'CLIENT_SECRET_HMAC_KEY' in caplog.text
+
+
+@pytest.mark.parametrize('scheme', ['hmac-sha256', 'bcrypt'])
+def test_secret_hasher_hash_many(scheme):
+    '''Ensure that hashing several secrets at once gives hashes of the default scheme, in order, whether or not they are
+    spread across a process pool
+    '''
+
+    secret_hasher = hashers.SecretHasher(crypto_executor, FakeApp(CLIENT_SECRET_SCHEME=scheme))
+    values = ['first secret', 'second secret']
+    with futures.ProcessPoolExecutor(max_workers=1) as pool:
+        for pw_hashes in (secret_hasher.hash_many(values), secret_hasher.hash_many(values, pool)):
+            assert [secret_hasher.identify(pw_hash).name for pw_hash in pw_hashes] == [scheme] * 2
+            assert [secret_hasher.verify(pw_hash, value)[0] for pw_hash, value in zip(pw_hashes, values)] == [True] * 2
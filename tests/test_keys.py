@@ -0,0 +1,166 @@
+import json
+import os
+import pytest
+import threading
+
+from os.path import join
+from jwcrypto import jwk, jws
+from authorization_server import config, keys
+from authorization_server.app import key_ring
+from tests import utils as test_utils
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+@pytest.fixture(scope='module')
+def other_private_jwk():
+    return jwk.JWK.generate(kty='RSA', size=2048)
+
+
+def test_key_ring_load():
+    '''Ensure that the key ring:
+
+    1) Parses the configured private key once and indexes it by its thumbprint
+    2) Provides a private signing key and a public-only verification key
+    3) Returns None for unknown kids
+    '''
+
+    ring = keys.KeyRing()
+    kid = ring.load(config.Config.JWK_PRIVATE)
+
+    # (1)
+    assert kid == jwk.JWK.from_json(config.Config.JWK_PRIVATE).thumbprint()
+    assert kid in ring and len(ring) == 1
+    assert ring.signing_kid == kid
+
+    # (2)
+    assert ring.signing_key.has_private
+    assert not ring.verification_key().has_private
+    assert ring.verification_key(kid) is ring.verification_key()
+
+    # (3)
+    assert ring.verification_key('unknown kid') is None
+
+
+def test_key_ring_is_shared_by_the_app():
+    '''The key ring built by create_app hands out the very same objects to every caller and thread
+    '''
+
+    assert key_ring.signing_kid
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(key_ring.signing_key)) for _ in range(10)]
+    list(thread.start() for thread in threads)
+    list(thread.join() for thread in threads)
+    assert all(key is key_ring.signing_key for key in results)
+
+
+def test_key_ring_sign_and_verify():
+    '''Anything signed with the signing key can be verified with the verification key
+    '''
+
+    ring = keys.KeyRing()
+    ring.load(config.Config.JWK_PRIVATE)
+    jws_obj = jws.JWS(json.dumps({'data': 1}).encode())
+    jws_obj.add_signature(ring.signing_key, None, json.dumps({"alg": config.Config.JWT_ALGORITHM}))
+
+    jws_token = jws.JWS()
+    jws_token.deserialize(jws_obj.serialize(compact=True))
+    jws_token.verify(ring.verification_key())
+    assert json.loads(jws_token.payload) == {'data': 1}
+
+
+def test_key_ring_rotation(other_private_jwk):
+    '''Ensure that when a new key is added to the ring:
+
+    1) It is published but does not sign until it is activated
+    2) Once activated, it signs and the previous key retires: it still verifies but no longer signs
+    3) Once the overlap window has elapsed, the retired key is neither published nor verifies
+    '''
+
+    ring = keys.KeyRing()
+    ring.overlap = 100
+    old_kid = ring.load(config.Config.JWK_PRIVATE)
+    new_kid = ring.add(other_private_jwk.export_private(), activates=1000)
+
+    # (1)
+    assert [entry.kid for entry in ring.published(now=500)] == [new_kid, old_kid]
+    assert ring.signing_entry(now=500).kid == old_kid
+    assert ring.verification_key(new_kid, now=500)
+
+    # (2)
+    assert ring.signing_entry(now=1050).kid == new_kid
+    assert [entry.kid for entry in ring.published(now=1050)] == [new_kid, old_kid]
+    assert ring.verification_key(old_kid, now=1050)
+
+    # (3)
+    assert [entry.kid for entry in ring.published(now=1100)] == [new_kid]
+    assert ring.verification_key(old_kid, now=1100) is None
+    assert old_kid not in ring
+
+
+def test_key_ring_jwks(other_private_jwk):
+    '''The JWK Set holds the public part of every published key with its kid, and its digest changes with the set
+    '''
+
+    ring = keys.KeyRing()
+    ring.overlap = 100
+    kid = ring.load(config.Config.JWK_PRIVATE)
+    document, digest = ring.jwks(now=0)
+    assert [key['kid'] for key in document['keys']] == [kid]
+    assert all(key['use'] == 'sig' and 'd' not in key for key in document['keys'])
+    assert ring.jwks(now=0) == (document, digest)
+
+    ring.add(other_private_jwk.export_private(), activates=1000)
+    other_document, other_digest = ring.jwks(now=0)
+    assert len(other_document['keys']) == 2
+    assert other_digest != digest
+
+
+def test_key_ring_refresh(tmp_path, other_private_jwk):
+    '''Keys written as PEM files into the keys directory are added to the ring and activated 'overlap' seconds after
+    they were written. Files of keys that are no longer published are reported as expired.
+    '''
+
+    paths = []
+    for mtime, jwk_obj in ((1000, other_private_jwk), (2000, jwk.JWK.generate(kty='RSA', size=2048))):
+        path = tmp_path / f"{mtime}.pem"
+        path.write_bytes(jwk_obj.export_to_pem(private_key=True, password=None))
+        os.utime(str(path), (mtime, mtime))
+        paths.append(str(path))
+
+    ring = keys.KeyRing()
+    ring.overlap = 100
+    ring.keys_dir = str(tmp_path)
+    ring.load(config.Config.JWK_PRIVATE)
+    assert len(ring) == 3
+
+    assert ring.signing_entry(now=1100).kid == other_private_jwk.thumbprint()
+    assert not ring.expired_files(now=2150)
+    assert ring.expired_files(now=2250) == [paths[0]]
+
+
+@pytest.mark.parametrize('filename, alg', [('rs256.pem', 'RS256'), ('es256.pem', 'ES256'), ('eddsa.pem', 'EdDSA')])
+def test_key_ring_algorithms(filename, alg):
+    '''Ensure RSA, EC P-256 and Ed25519 keys sign and verify with their own algorithm, which is also published
+    '''
+
+    ring = keys.KeyRing()
+    jwk_obj = config.ConfigMixin.load_private_key(join(test_utils.TEST_PATH, 'keys', filename))
+    ring.load(jwk_obj.export_private())
+    signing_entry = ring.signing_entry()
+    assert signing_entry.alg == alg
+    assert [key['alg'] for key in ring.jwks()[0]['keys']] == [alg]
+
+    jws_obj = jws.JWS(json.dumps({'data': 1}).encode())
+    jws_obj.add_signature(signing_entry.private, None, json.dumps({"alg": alg, "kid": signing_entry.kid}))
+    jws_token = jws.JWS()
+    jws_token.deserialize(jws_obj.serialize(compact=True))
+    jws_token.verify(ring.verification_key(jws_token.jose_header['kid']))
+
+
+def test_generate_key():
+    assert all(keys.algorithm_for(keys.generate_key(alg)) == alg for alg in ('ES256', 'EdDSA'))
+    assert keys.algorithm_for(keys.generate_key('RS256', size=1024)) == 'RS256'
@@ -2,11 +2,15 @@ import pytest
 import uuid
 import base64
 import json
+import secrets
+import threading
+import time
 
-from datetime import datetime, timedelta
+from os.path import join
+from flask import current_app
 from jwcrypto import jws, jwk, jwt
 from authorization_server import config, models, oauth_code
-from authorization_server.app import db
+from authorization_server.app import db, key_ring, introspection_cache, secret_cache, secret_hasher
 from unittest.mock import patch
 from tests import utils as test_utils
 
@@ -19,6 +23,18 @@ def other_private_jwk():
     return jwk.JWK.from_json(json.dumps(private_key_obj))
 
 
+@pytest.fixture(params=['es256.pem', 'eddsa.pem'])
+def other_algorithm_key_ring(request):
+    '''Sign with an EC P-256 or an Ed25519 key rather than with the configured RSA key
+    '''
+    jwk_obj = config.ConfigMixin.load_private_key(join(test_utils.TEST_PATH, 'keys', request.param))
+    key_ring.load(jwk_obj.export_private())
+    try:
+        yield key_ring
+    finally:
+        key_ring.load(config.Config.JWK_PRIVATE)
+
+
 def test_asdict():
     auth_code = oauth_code.AuthorisationCode()
     assert all([getattr(auth_code, key) == value for key, value in auth_code.as_dict().items()])
@@ -33,7 +49,7 @@ class TestAuthorisationCode:
         2) redirect_uri, if provided, must match the one stored in the database
         3) response_type is required and must be supported
         4) state is required and must valid
-        5) Otherwise return True
+        5) Otherwise return True, the client's metadata being served from the client cache afterwards
         '''
 
         url_args = {}
@@ -137,8 +153,46 @@ class TestAuthorisationCode:
         assert auth_code.description == db_data.description
         assert auth_code.web_url == db_data.web_url
         assert auth_code.redirect_uri == db_data.redirect_uri
+        with patch.object(oauth_code.db.session, 'query') as mock_query:
+            assert oauth_code.AuthorisationCode(url_args=url_args).validate_request()
+            assert not mock_query.called
 
-    def test_response(self):
+    def test_other_redirect_uris(self):
+        '''Ensure that a client may use the redirect uris added besides the one it registered with, as follows:
+
+        1) A request with any of them -in any case of its scheme and host- is valid and redirects to it
+        2) A code issued for any of them is exchanged for a token
+        3) Other redirect uris are not registered with us
+        '''
+
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        client_id = client_data[0]['id']
+        db.session.add(models.RedirectURI(application_id=client_id, uri='https://other.appdomain.com/callback'))
+        db.session.commit()
+        url_args = {'client_id': client_id, 'response_type': oauth_code.AuthorisationCode.grand_type, 'state': 'state'}
+
+        # (1)
+        for redirect_uri in (client_data[0]['redirect_uri'], 'https://OTHER.appdomain.com:443/callback'):
+            url_args['redirect_uri'] = base64.urlsafe_b64encode(redirect_uri.encode()).decode()
+            auth_code = oauth_code.AuthorisationCode(url_args=url_args)
+            assert auth_code.validate_request()
+            assert auth_code.redirect_uri == redirect_uri
+
+            # (2)
+            auth_token = oauth_code.AuthorisationToken(url_args={
+                'grand_type': 'authorization_code',
+                'client_secret': client_data[0]['client_secret'],
+                'code': auth_code.response()['code']
+            })
+            assert auth_token.validate_request()
+
+        # (3)
+        url_args['redirect_uri'] = base64.urlsafe_b64encode(b'https://other.appdomain.com/Callback').decode()
+        auth_code = oauth_code.AuthorisationCode(url_args=url_args)
+        assert not auth_code.validate_request()
+        assert 'is not registered with us' in auth_code.errors['error_description']
+
+    def test_response(self, auth_code_mode):
         '''Ensure that response is up to the standards set by oAuth2
         '''
 
@@ -186,15 +240,18 @@ class TestAuthorisationCode:
         # Check payload is the one expected
         payload = json.loads(jws_obj.payload.decode(config.Config.AUTH_CODE_ENCODING))
         assert payload['client_id'] == url_args['client_id']
-        assert payload['redirect_uri'] == url_args['redirect_uri']
-        assert base64.urlsafe_b64decode(payload['redirect_uri'].
-                                        encode(config.Config.AUTH_CODE_ENCODING)).decode() == db_data.redirect_uri
+        assert payload['redirect_uri'] == db_data.redirect_uri
         auth_code_id = db.session.\
             query(models.AuthorisationCode.id).\
             order_by(models.AuthorisationCode.id.desc()).\
             limit(1).\
             scalar()
-        assert payload['code_id'] == auth_code_id
+        if auth_code_mode == 'stateless':
+            # --> Stateless codes are identified by a random jti and are not stored
+            assert len(payload['jti']) >= 16 and 'code_id' not in payload
+            assert auth_code_id is None
+        else:
+            assert payload['code_id'] == auth_code_id and 'jti' not in payload
 
 
 class TestAuthorisationToken:
@@ -263,7 +320,7 @@ class TestAuthorisationToken:
                     'code': 'Not a valid token'}
         auth_token = oauth_code.AuthorisationToken(url_args=url_args)
 
-        with patch.object(oauth_code, 'jwk'):
+        with patch.object(oauth_code, 'key_ring'):
             with patch.object(oauth_code, 'jws'):
                 with patch.object(oauth_code.json, 'loads') as mock_loads:
                     # No fields
@@ -289,20 +346,33 @@ class TestAuthorisationToken:
                     assert 'did not provide all the required fields' in auth_token.errors['error_description']
                     assert auth_token.errors['code'] == 403
 
-                    # only 'client_id', 'redirect_uri' and 'expiration_date' provided
+                    # only 'client_id', 'redirect_uri' and 'exp' provided
                     mock_loads.return_value = {
                         'client_id': '',
                         'redirect_uri': '',
-                        'expiration_date': '',
+                        'exp': int(time.time()) + 60,
                     }
                     assert not auth_token.validate_request()
                     assert 'did not provide all the required fields' in auth_token.errors['error_description']
                     assert auth_token.errors['code'] == 403
 
+                    # 'exp' is not an integer
+                    mock_loads.return_value = {
+                        'client_id': '',
+                        'redirect_uri': '',
+                        'exp': '09-08-2019 15:10:25',
+                        'token_use': oauth_code.AUTH_CODE_USE,
+                        'code_id': ''
+                    }
+                    assert not auth_token.validate_request()
+                    assert "invalid 'authorization_code'" in auth_token.errors['error_description']
+                    assert auth_token.errors['code'] == 403
+
                     mock_loads.return_value = {
                         'client_id': '',
                         'redirect_uri': '',
-                        'expiration_date': '',
+                        'exp': int(time.time()) + 60,
+                        'token_use': oauth_code.AUTH_CODE_USE,
                         'code_id': ''
                     }
                     # client_id and/or code_id are not recognised
@@ -311,8 +381,8 @@ class TestAuthorisationToken:
                     assert auth_token.errors['code'] == 403
 
     def test_valid_request_correct_url_code_payload_fields_and_values(self):
-        '''Ensure that fields provided in the payload are those expected and the authorisation code provided was not
-        used before
+        '''Ensure that fields provided in the payload are those expected and that the authorisation code provided is
+        redeemed only once
         '''
 
         # Prepare underlying database so that an application and code exist
@@ -327,15 +397,17 @@ class TestAuthorisationToken:
                     'code': 'Not a valid token'}
         auth_token = oauth_code.AuthorisationToken(url_args=url_args)
 
-        with patch.object(oauth_code, 'jwk'):
+        with patch.object(oauth_code, 'key_ring'):
             with patch.object(oauth_code, 'jws'):
                 with patch.object(oauth_code.json, 'loads') as mock_loads:
 
-                    # If either client_id or code_id does not exist
+                    # If client_id does not exist
+                    now = int(time.time())
                     payload = {
                         'client_id': 'something that does not match our records',
-                        'redirect_uri': '',
-                        'expiration_date': '',
+                        'redirect_uri': client_data[0]['redirect_uri'],
+                        'exp': now + 60,
+                        'token_use': oauth_code.AUTH_CODE_USE,
                         'code_id': db_auth_code.id
                     }
                     mock_loads.return_value = payload
@@ -343,31 +415,24 @@ class TestAuthorisationToken:
                     assert 'Either the client does not exist' in auth_token.errors['error_description']
                     assert auth_token.errors['code'] == 403
 
+                    # If code has expired -beyond the clock skew allowed- it is rejected before querying the database
                     payload['client_id'] = db_auth_code.application_id
-                    payload['code_id'] = 5555555555
-                    assert not auth_token.validate_request()
-                    assert 'Either the client does not exist' in auth_token.errors['error_description']
-                    assert auth_token.errors['code'] == 403
-
-                    # If code has already being used
-                    payload['code_id'] = db_auth_code.id
-                    assert not auth_token.validate_request()
-                    assert "'authorization_code' already" in auth_token.errors['error_description']
+                    payload['exp'] = now - config.Config.JWT_CLOCK_SKEW - 10
+                    with patch.object(oauth_code.db.session, 'query') as mock_query:
+                        assert not auth_token.validate_request()
+                        assert not mock_query.called
+                    assert "expired" in auth_token.errors['error_description']
                     assert auth_token.errors['code'] == 403
 
-                    # If code has expired
-                    db_auth_code.used = False
-                    db.session.commit()
-                    now = datetime.utcnow()
-                    after = now + timedelta(seconds=10)
-                    payload['expiration_date'] = after.strftime("%d-%m-%Y %H:%M:%S")
+                    # If an access token is presented as a code -both are signed with the same keys-
+                    payload['exp'] = now + 60
+                    payload['token_use'] = oauth_code.ACCESS_TOKEN_USE
                     assert not auth_token.validate_request()
-                    assert "expired" in auth_token.errors['error_description']
+                    assert "invalid 'authorization_code'" in auth_token.errors['error_description']
                     assert auth_token.errors['code'] == 403
+                    payload['token_use'] = oauth_code.AUTH_CODE_USE
 
                     # if client_id and client_secret do not coincide
-                    before = now - timedelta(seconds=10)
-                    payload['expiration_date'] = before.strftime("%d-%m-%Y %H:%M:%S")
                     assert not auth_token.validate_request()
                     assert "that don't match" in auth_token.errors['error_description']
                     auth_token.client_secret = 'no within the database'
@@ -382,6 +447,111 @@ class TestAuthorisationToken:
                     assert "'redirect_uri'" in auth_token.errors['error_description']
                     assert auth_token.errors['code'] == 403
 
+                    # If code_id does not exist
+                    payload['redirect_uri'] = client_data[0]['redirect_uri']
+                    payload['code_id'] = 5555555555
+                    assert not auth_token.validate_request()
+                    assert 'Either the client does not exist' in auth_token.errors['error_description']
+                    assert auth_token.errors['code'] == 403
+
+                    # If code has already being used
+                    payload['code_id'] = db_auth_code.id
+                    assert not auth_token.validate_request()
+                    assert "'authorization_code' already" in auth_token.errors['error_description']
+                    assert auth_token.errors['code'] == 403
+
+                    # A valid code is redeemed once
+                    db_auth_code.used = False
+                    db.session.commit()
+                    assert auth_token.validate_request()
+                    db.session.refresh(db_auth_code)
+                    assert db_auth_code.used and db_auth_code.updated
+                    assert not auth_token.validate_request()
+                    assert "'authorization_code' already" in auth_token.errors['error_description']
+
+    def test_authenticate_cache(self):
+        '''Ensure that a successful authentication is remembered, so that the client secret is not hashed again, while
+        failed ones are not
+        '''
+
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        db_app = db.session.query(models.Application).filter_by(id=client_data[0]['id']).one()
+        secret_cache.clear()
+
+        auth_token = oauth_code.AuthorisationToken(url_args={'client_secret': 'not the secret'})
+        assert not auth_token.authenticate(db_app)
+        assert not len(secret_cache)
+
+        auth_token.client_secret = client_data[0]['client_secret']
+        assert auth_token.authenticate(db_app)
+        with patch.object(oauth_code.secret_hasher, 'verify') as mock_verify:
+            assert auth_token.authenticate(db_app)
+            assert not mock_verify.called
+
+            auth_token.client_secret = 'not the secret'
+            mock_verify.return_value = False, False
+            assert not auth_token.authenticate(db_app)
+            assert mock_verify.called
+
+    def test_authenticate_rehash(self):
+        '''Ensure that a client secret stored as a bcrypt hash is rehashed with the default scheme once the client
+        authenticates, and that it still authenticates afterwards
+        '''
+
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        db_app = db.session.query(models.Application).filter_by(id=client_data[0]['id']).one()
+        assert secret_hasher.identify(db_app.client_secret).name == 'bcrypt'
+        secret_cache.clear()
+
+        auth_token = oauth_code.AuthorisationToken(url_args={'client_secret': 'not the secret'})
+        assert not auth_token.authenticate(db_app)
+        assert secret_hasher.identify(db_app.client_secret).name == 'bcrypt'
+
+        auth_token.client_secret = client_data[0]['client_secret']
+        assert auth_token.authenticate(db_app)
+        db_app = db.session.query(models.Application).filter_by(id=client_data[0]['id']).one()
+        assert secret_hasher.identify(db_app.client_secret) is secret_hasher.default
+        secret_cache.clear()
+        assert auth_token.authenticate(db_app)
+
+    def test_authenticate_renewed_secret(self):
+        '''Ensure that when the secret of a client was renewed by another process but the client cache still holds the
+        old one:
+
+        1) The new secret is rejected from the cache, without reading the database, while the cached metadata is younger
+        than CLIENT_SECRET_RECHECK_INTERVAL
+        2) The old secret does not overwrite the new one when rehashing it
+        3) Once the cached metadata is older, the new secret authenticates and the cache is refreshed
+        '''
+
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        client = oauth_code.fetch_client(client_data[0]['id'])
+        secret_cache.clear()
+
+        # --> Renew the secret in the database only, as another process would
+        db.session.query(models.Application).filter_by(id=client.id).\
+            update({'client_secret': secret_hasher.hash('new')})
+        db.session.commit()
+        assert oauth_code.fetch_client(client.id) == client
+
+        # (1)
+        auth_token = oauth_code.AuthorisationToken(url_args={'client_secret': 'new'})
+        with patch.object(oauth_code, 'load_clients') as mock_load_clients:
+            assert not auth_token.authenticate(client)
+            assert not mock_load_clients.called
+
+        # (2)
+        auth_token.client_secret = client_data[0]['client_secret']
+        assert not auth_token.authenticate(client)
+        db_app = db.session.query(models.Application).filter_by(id=client.id).one()
+        assert secret_hasher.verify(db_app.client_secret, 'new') == (True, False)
+
+        # (3)
+        auth_token.client_secret = 'new'
+        with patch.dict(current_app.config, {'CLIENT_SECRET_RECHECK_INTERVAL': 0}):
+            assert auth_token.authenticate(client)
+        assert oauth_code.fetch_client(client.id).client_secret != client.client_secret
+
     def test_response(self):
         '''Test the issuing of a Authorisation Token. A Token that encrypted by us should also be able to be
         decrypted by the public key.
@@ -392,5 +562,209 @@ class TestAuthorisationToken:
         assert len(signed_jwt_token.split('.')) == 3
 
         raw_token = jwt.JWT(key=jwk.JWK.from_json(config.Config.JWK_PUBLIC), jwt=signed_jwt_token)
-        payload = {'expires_in': config.Config.AUTH_TOKEN_EXPIRATION_TIME}
-        assert json.loads(raw_token.claims) == payload
+        claims = json.loads(raw_token.claims)
+        assert claims['expires_in'] == config.Config.AUTH_TOKEN_EXPIRATION_TIME
+        # --> Time claims are integer epoch seconds
+        assert all(isinstance(claims[name], int) for name in ('iat', 'nbf', 'exp'))
+        assert claims['exp'] - claims['iat'] == config.Config.AUTH_TOKEN_EXPIRATION_TIME
+        assert abs(claims['iat'] - time.time()) < 5
+        # --> Resource servers can pick the verification key up from the JWK Set by kid
+        assert json.loads(raw_token.header)['kid'] == key_ring.signing_kid
+
+    def test_redeem_exactly_once(self, auth_code_mode):
+        '''Ensure that when the same code is exchanged by many threads at once, it is redeemed by only one of them
+        '''
+
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        payload = {
+            'client_id': client_data[0]['id'],
+            'redirect_uri': client_data[0]['redirect_uri'],
+            'exp': int(time.time()) + 60,
+            'token_use': oauth_code.AUTH_CODE_USE
+        }
+        if auth_code_mode == 'stateless':
+            payload['jti'] = secrets.token_urlsafe(16)
+        else:
+            db_auth_code = models.AuthorisationCode(application_id=client_data[0]['id'])
+            db.session.add(db_auth_code)
+            db.session.commit()
+            payload['code_id'] = db_auth_code.id
+        jws_obj = jws.JWS(json.dumps(payload).encode(config.Config.AUTH_CODE_ENCODING))
+        jws_obj.add_signature(key_ring.signing_key, None, json.dumps({"alg": config.Config.JWT_ALGORITHM}))
+        url_args = {'grand_type': 'authorization_code',
+                    'client_secret': client_data[0]['client_secret'],
+                    'code': jws_obj.serialize(compact=True)}
+
+        app = current_app._get_current_object()
+        workers = 8
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def exchange():
+            with app.app_context():
+                auth_token = oauth_code.AuthorisationToken(url_args=url_args)
+                barrier.wait()
+                try:
+                    results.append(auth_token.validate_request() or auth_token.errors['error_description'])
+                finally:
+                    db.session.remove()
+
+        with patch.object(oauth_code.AuthorisationToken, 'authenticate', return_value=True):
+            threads = [threading.Thread(target=exchange) for _ in range(workers)]
+            list(thread.start() for thread in threads)
+            list(thread.join() for thread in threads)
+
+        assert len(results) == workers
+        assert results.count(True) == 1
+        assert all("'authorization_code' already" in result for result in results if result is not True)
+
+
+class TestIntrospectToken:
+
+    def test_introspect_token(self, other_private_jwk):
+        '''Ensure that introspecting a token:
+
+        1) Returns 'active' alongside the claims of tokens issued by us
+        2) Returns 'active' False for malformed tokens, tokens not signed by us, expired tokens and tokens that are not
+        access tokens
+        3) Returns 'active' False for authorisation codes, though signed by us and unexpired
+        '''
+
+        # (1)
+        token = oauth_code.AuthorisationToken().response()
+        response = oauth_code.introspect_token(token)
+        assert response['active'] is True
+        assert response['token_type'] == 'bearer'
+        assert response['expires_in'] == config.Config.AUTH_TOKEN_EXPIRATION_TIME
+
+        # (2)
+        assert oauth_code.introspect_token('Not a valid token') == {'active': False}
+        assert oauth_code.introspect_token(None) == {'active': False}
+
+        jwt_obj = jwt.JWT(header={"alg": config.Config.alg}, claims={'data': 'data'})
+        jwt_obj.make_signed_token(other_private_jwk)
+        assert oauth_code.introspect_token(jwt_obj.serialize()) == {'active': False}
+
+        for claims in ({'exp': 1000, 'token_use': oauth_code.ACCESS_TOKEN_USE}, {'exp': int(time.time()) + 60},
+                       {'exp': int(time.time()) + 60, 'token_use': oauth_code.AUTH_CODE_USE}):
+            jwt_obj = jwt.JWT(header={"alg": config.Config.alg, "kid": key_ring.signing_kid}, claims=claims)
+            jwt_obj.make_signed_token(key_ring.signing_key)
+            assert oauth_code.introspect_token(jwt_obj.serialize()) == {'active': False}
+
+        # (3)
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        code = oauth_code.AuthorisationCode(url_args={'client_id': client_data[0]['id'],
+                                                      'redirect_uri': client_data[0]['redirect_uri'],
+                                                      'state': 'state'}).response()['code']
+        assert oauth_code.introspect_token(code) == {'active': False}
+
+    def test_introspect_token_within_clock_skew(self):
+        '''Ensure that a token past its 'exp' but within the clock skew leeway is reported active -as it is accepted
+        when verified- and that the result is cached
+        '''
+
+        introspection_cache.clear()
+        claims = oauth_code.claims_validator.issue(config.Config.AUTH_TOKEN_EXPIRATION_TIME,
+                                                   oauth_code.ACCESS_TOKEN_USE,
+                                                   now=int(time.time()) - config.Config.AUTH_TOKEN_EXPIRATION_TIME - 10)
+        jwt_obj = jwt.JWT(header={"alg": config.Config.alg, "kid": key_ring.signing_kid}, claims=claims)
+        jwt_obj.make_signed_token(key_ring.signing_key)
+        token = jwt_obj.serialize()
+
+        assert oauth_code.verified_token_claims(token)
+        assert oauth_code.introspect_token(token)['active']
+        assert oauth_code.introspect_token(token)['active']
+        assert introspection_cache.stats()['hits'] == 1
+
+    def test_introspect_token_cache(self):
+        '''Ensure verified tokens are served from the cache and their signature is not verified again
+        '''
+
+        introspection_cache.clear()
+        token = oauth_code.AuthorisationToken().response()
+        assert oauth_code.introspect_token(token)['active']
+        assert introspection_cache.stats()['misses'] == 1
+
+        with patch.object(oauth_code, 'verified_token_claims') as mock_verify:
+            assert oauth_code.introspect_token(token)['active']
+            assert not mock_verify.called
+        assert introspection_cache.stats()['hits'] == 1
+
+
+def test_other_algorithms(other_algorithm_key_ring):
+    '''Ensure codes and access tokens signed with EC P-256 and Ed25519 keys are verified end to end
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    auth_code = oauth_code.AuthorisationCode(url_args={
+        'client_id': client_data[0]['id'],
+        'redirect_uri': client_data[0]['redirect_uri'],
+        'state': 'state'
+    })
+    code = auth_code.response()['code']
+
+    auth_token = oauth_code.AuthorisationToken(url_args={
+        'grand_type': 'authorization_code',
+        'client_secret': client_data[0]['client_secret'],
+        'code': code
+    })
+    assert auth_token.validate_request()
+    assert auth_token.errors['error_description'] is None
+    # --> the payload is only read once the signature has been verified
+    assert auth_token.client_id == client_data[0]['id']
+
+    signed_jwt_token = auth_token.response()
+    header = json.loads(base64.urlsafe_b64decode(signed_jwt_token.split('.')[0] + '=='))
+    assert header['alg'] == other_algorithm_key_ring.signing_entry().alg
+    public_key = jwk.JWK(**other_algorithm_key_ring.jwks()[0]['keys'][0])
+    assert json.loads(jwt.JWT(key=public_key, jwt=signed_jwt_token).claims)
+
+
+class TestAuthorisationTokenBatch:
+
+    def test_validate_request(self):
+        '''Ensure that validating a batch of token requests:
+
+        1) Sets the errors of each invalid request and returns the valid ones
+        2) Checks the client secret once per client, fetches all clients in a single query and only queries codes that
+        could not be redeemed
+        3) Redeems the valid codes
+        '''
+
+        client_data, user_data = test_utils.add_user_client_context_to_db()
+        db_auth_codes = [models.AuthorisationCode(application_id=client_data[0]['id']) for _ in range(3)]
+        db_auth_codes[1].used = True
+        db.session.add_all(db_auth_codes)
+        db.session.commit()
+
+        codes = []
+        for db_auth_code in db_auth_codes:
+            payload = {
+                'client_id': client_data[0]['id'],
+                'redirect_uri': client_data[0]['redirect_uri'],
+                'exp': int(time.time()) + 60,
+                'token_use': oauth_code.AUTH_CODE_USE,
+                'code_id': db_auth_code.id
+            }
+            jws_obj = jws.JWS(json.dumps(payload).encode(config.Config.AUTH_CODE_ENCODING))
+            jws_obj.add_signature(key_ring.signing_key, None, json.dumps({"alg": config.Config.JWT_ALGORITHM}))
+            codes.append({'grand_type': 'authorization_code', 'code': jws_obj.serialize(compact=True)})
+        codes.append({'grand_type': 'authorization_code', 'code': 'Not a valid token'})
+
+        batch = oauth_code.AuthorisationTokenBatch(client_secret=client_data[0]['client_secret'], codes=codes)
+        with patch.object(oauth_code.AuthorisationToken, 'authenticate', return_value=True) as mock_authenticate:
+            with patch.object(oauth_code.db.session, 'query', wraps=oauth_code.db.session.query) as mock_query:
+                valid = batch.validate_request()
+
+        # (1)
+        assert valid == [batch.tokens[0], batch.tokens[2]]
+        assert "'authorization_code' already" in batch.tokens[1].errors['error_description']
+        assert batch.tokens[3].errors['code'] == 400
+
+        # (2)
+        assert mock_authenticate.call_count == 1
+        assert mock_query.call_count == 2
+
+        # (3)
+        list(db.session.refresh(db_auth_code) for db_auth_code in db_auth_codes)
+        assert all(db_auth_code.used for db_auth_code in db_auth_codes)
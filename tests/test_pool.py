@@ -0,0 +1,51 @@
+import pytest
+
+from sqlalchemy import create_engine
+from authorization_server import pool
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_wait_times():
+    '''Ensure that percentiles are given in milliseconds over the most recent samples only, while every checkout is
+    counted
+    '''
+
+    wait_times = pool.WaitTimes(samples=100)
+    assert wait_times.percentiles() == {'count': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+
+    for seconds in [10] * 10 + [i / 1000 for i in range(1, 101)]:
+        wait_times.record(seconds)
+    assert wait_times.percentiles() == {'count': 110, 'p50': 51, 'p90': 91, 'p99': 100, 'max': 100}
+
+
+def test_metered_queue_pool():
+    '''Ensure that the metered pool:
+
+    1) Reports connections checked out, idle and in overflow
+    2) Times every checkout, even after the pool is recreated
+    '''
+
+    engine = create_engine('sqlite://', poolclass=pool.MeteredQueuePool, pool_size=1, max_overflow=1)
+    stats = pool.pool_stats(engine.pool)
+    assert stats['pool'] == 'MeteredQueuePool'
+    assert (stats['size'], stats['checked_out'], stats['idle'], stats['overflow']) == (1, 0, 0, 0)
+
+    # (1)
+    first, second = engine.connect(), engine.connect()
+    stats = pool.pool_stats(engine.pool)
+    assert (stats['checked_out'], stats['idle'], stats['overflow']) == (2, 0, 1)
+    second.close()
+    first.close()
+    stats = pool.pool_stats(engine.pool)
+    assert (stats['checked_out'], stats['idle'], stats['overflow']) == (0, 1, 0)
+
+    # (2)
+    assert stats['checkout_wait']['count'] == 2
+    assert stats['checkout_wait']['max'] >= stats['checkout_wait']['p50'] > 0
+    engine.dispose()
+    engine.connect().close()
+    assert pool.pool_stats(engine.pool)['checkout_wait']['count'] == 3
@@ -0,0 +1,52 @@
+import pytest
+
+from authorization_server import replay
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_memory_replay_store():
+    '''Ensure that the in-memory store:
+
+    1) Accepts a key once and rejects it afterwards
+    2) Remembers keys for at least their time-to-live and drops them a bucket at a time afterwards
+    '''
+
+    store = replay.MemoryReplayStore(bucket_width=10)
+
+    # (1)
+    assert store.add('a', ttl=60, now=0)
+    assert not store.add('a', ttl=60, now=1)
+    assert store.add('b', ttl=60, now=5)
+    assert len(store) == 2
+
+    # (2)
+    assert not store.add('a', ttl=60, now=59)
+    assert store.add('c', ttl=60, now=70)
+    assert len(store) == 1
+    assert store.add('a', ttl=60, now=70)
+
+    store = replay.MemoryReplayStore()
+    assert store.add('a', ttl=60)
+    assert 'a' in store and 'b' not in store
+
+
+def test_replay_set():
+    '''The replay set remembers redeemed codes until they expire plus the clock skew leeway, in the configured store
+    '''
+
+    class FakeApp:
+        config = {'JWT_CLOCK_SKEW': 30,
+                  'AUTH_CODE_REPLAY_STORE': 'authorization_server.replay.MemoryReplayStore',
+                  'AUTH_CODE_REPLAY_BUCKET': 5}
+        extensions = {}
+
+    replay_set = replay.ReplaySet(FakeApp())
+    assert isinstance(replay_set.store, replay.MemoryReplayStore) and replay_set.store.bucket_width == 5
+    assert replay_set.redeem('jti', exp=60, now=1)
+    assert not replay_set.redeem('jti', exp=60, now=75)
+    assert not replay_set.redeem('jti', exp=60, now=89)
+    assert replay_set.redeem('jti', exp=60, now=95)
@@ -0,0 +1,77 @@
+import pytest
+
+from authorization_server import models, replicas
+from authorization_server.app import create_app, db
+from tests.conftest import TestConfig
+from tests import utils as test_utils
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    '''An app whose primary and only replica are two SQLite files with the same schema but -no replication- not the
+    same rows
+    '''
+
+    class ReplicaConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = replicas.replica_binds([f"sqlite:///{tmp_path / 'replica.db'}"])
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = create_app(ReplicaConfig)
+    db.session.remove()
+    with app.app_context():
+        for bind in (None, 'replica_0'):
+            db.Model.metadata.create_all(db.get_engine(app, bind))
+        yield app
+        db.session.remove()
+
+
+def insert_user(bind, **user_data):
+    db.get_engine(db.get_app(), bind).execute(models.User.__table__.insert().values(**user_data))
+
+
+def test_routing(replica_app):
+    '''Ensure that:
+
+    1) Queries go to the primary unless they are run within a read-only block, which sends them to the replica
+    2) Flushes go to the primary even within a read-only block, and reads are sent to the primary afterwards
+    3) Reads are also sent to the primary after a commit, until the session is closed
+    '''
+
+    user_data = test_utils.generate_model_user_instance()
+    insert_user(None, id=1, **user_data)
+    insert_user('replica_0', id=2, **test_utils.generate_model_user_instance(random=True))
+
+    # (1)
+    assert db.session.query(models.User.id).scalar() == 1
+    with db.read_only():
+        assert db.session.query(models.User.id).scalar() == 2
+        assert models.load_user(1) is None
+
+    # (2)
+    with db.read_only():
+        db.session.add(models.User(**test_utils.generate_model_user_instance(random=True)))
+        assert db.session.query(models.User).count() == 2
+    db.session.rollback()
+
+    # (3)
+    db.session.remove()
+    with db.read_only():
+        assert db.session.query(models.User.id).scalar() == 2
+    db.session.commit()
+    with db.read_only():
+        assert db.session.query(models.User.id).scalar() == 1
+    db.session.remove()
+    with db.read_only():
+        assert db.session.query(models.User.id).scalar() == 2
+
+
+def test_no_replicas():
+    '''Without replicas, read-only blocks are served by the primary
+    '''
+
+    assert not replicas.replica_binds([])
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    db.session.remove()
+    with db.read_only():
+        assert models.load_user(user_data['id']).email == user_data['email']
@@ -0,0 +1,71 @@
+import time
+
+from datetime import datetime, timedelta
+from authorization_server import models, retention
+from authorization_server.app import db, create_app
+from tests import utils as test_utils
+from tests.conftest import TestConfig
+
+
+def add_codes(client_id, created):
+    codes = [models.AuthorisationCode(application_id=client_id, created=value) for value in created]
+    db.session.add_all(codes)
+    db.session.commit()
+    return codes
+
+
+def test_purge_codes():
+    '''Ensure that purging:
+
+    1) Deletes the codes, used or not, created more than AUTH_CODE_EXPIRATION_TIME + grace seconds ago
+    2) Deletes them in batches of consecutive ids
+    3) Does nothing when there is nothing to delete
+    '''
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    now = datetime.now()
+    expired = now - timedelta(seconds=TestConfig.AUTH_CODE_EXPIRATION_TIME + 100)
+    codes = add_codes(client_data[0]['id'], [expired] * 5 + [now] * 2)
+    codes[0].used = True
+    db.session.commit()
+    kept = [code.id for code in codes[5:]]
+
+    # (1)
+    report = retention.purge_codes(batch_size=2, grace=200, now=now)
+    assert report.deleted == 0
+    report = retention.purge_codes(batch_size=2, grace=50, now=now)
+    assert report.deleted == 5
+    assert [code_id for code_id, in db.session.query(models.AuthorisationCode.id)] == kept
+
+    # (2)
+    assert report.batches == 3
+
+    # (3)
+    report = retention.purge_codes(batch_size=2, grace=50, now=now)
+    assert report == (0, 0, report.seconds, [])
+
+
+def test_purge_scheduler():
+    '''The scheduler is off unless an interval is configured and, when on, purges from a background thread
+    '''
+
+    scheduler = retention.PurgeScheduler(create_app(config_class=TestConfig))
+    assert scheduler._thread is None
+
+    client_data, user_data = test_utils.add_user_client_context_to_db()
+    add_codes(client_data[0]['id'], [datetime.now() - timedelta(days=1)])
+
+    class SchedulerConfig(TestConfig):
+        AUTH_CODE_PURGE_INTERVAL = 0.05
+
+    scheduler.init_app(create_app(config_class=SchedulerConfig))
+    try:
+        assert scheduler._thread.is_alive()
+        deadline = time.time() + 5
+        while db.session.query(models.AuthorisationCode).count() and time.time() < deadline:
+            db.session.commit()
+            time.sleep(0.05)
+        assert not db.session.query(models.AuthorisationCode).count()
+    finally:
+        scheduler.stop()
+    assert scheduler._thread is None
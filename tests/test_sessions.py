@@ -0,0 +1,147 @@
+import pytest
+import time
+
+from datetime import datetime, timedelta
+from flask import current_app, session
+from authorization_server import sessions
+from authorization_server.app import create_app
+from tests.conftest import TestConfig
+
+
+class FakeApp:
+    def __init__(self, tmp_path):
+        self.config = {'SESSION_MEMORY_SIZE': 2, 'SESSION_FILE_DIR': str(tmp_path),
+                       'SESSION_KV_CLIENT': 'authorization_server.sessions.LocalKeyValueClient'}
+        self.permanent_session_lifetime = timedelta(days=1)
+        self.extensions = current_app.extensions
+
+
+class CountingStore(sessions.MemoryStore):
+    def __init__(self, app):
+        super().__init__(app)
+        self.calls = []
+
+    def load(self, sid):
+        self.calls.append('load')
+        return super().load(sid)
+
+    def save(self, sid, data, ttl):
+        self.calls.append('save')
+        super().save(sid, data, ttl)
+
+
+class CountingStoreConfig(TestConfig):
+    SESSION_STORE = 'tests.test_sessions.CountingStore'
+
+
+@pytest.fixture(params=['MemoryStore', 'FileStore', 'SQLStore', 'KeyValueStore'])
+def store(request, tmp_path):
+    return getattr(sessions, request.param)(FakeApp(tmp_path))
+
+
+def test_serializer():
+    '''Test that sessions are serialised back and forth and that data that cannot be read gives None
+    '''
+
+    data = {'user_id': '1', '_fresh': True, 'auth_code_request': {'client_id': 'abc', 'state': None, 'errors': {}},
+            '_flashes': [('danger', 'message')]}
+    assert sessions.loads(sessions.dumps(data)) == data
+    for blob in (None, b'', b'\x00' + sessions.dumps(data)[1:], sessions.dumps(data)[:-3], sessions.dumps([1])):
+        assert sessions.loads(blob) is None
+
+
+def test_stores(store):
+    '''Test that every store:
+
+    1) Returns what was saved under a session id and None for unknown ids
+    2) Overwrites and deletes sessions
+    3) Forgets sessions once they expire
+    '''
+
+    sid, other_sid = 'a' * 43, 'b' * 43
+
+    # (1)
+    store.save(sid, b'data', 60)
+    assert store.load(sid) == b'data'
+    assert store.load(other_sid) is None
+
+    # (2)
+    store.save(sid, b'new data', 60)
+    assert store.load(sid) == b'new data'
+    store.delete(sid)
+    store.delete(sid)
+    assert store.load(sid) is None
+
+    # (3)
+    store.save(other_sid, b'data', 1)
+    time.sleep(1.1)
+    assert store.load(other_sid) is None
+
+
+def test_purge(tmp_path):
+    '''Test that the file and SQL stores purge the expired sessions only
+    '''
+
+    for store in sessions.FileStore(FakeApp(tmp_path)), sessions.SQLStore(FakeApp(tmp_path)):
+        store.save('a' * 43, b'data', 60)
+        store.save('b' * 43, b'data', 1)
+        assert store.purge(datetime.now() + timedelta(seconds=2) if isinstance(store, sessions.SQLStore) else
+                           time.time() + 2) == 1
+        assert store.load('a' * 43) == b'data'
+
+
+def test_session_interface():
+    '''Test that:
+
+    1) A session is only written back, and its cookie set, when it is modified
+    2) A session is only loaded from the store when it is used, i.e. not for requests without a session cookie
+    3) Unknown session ids are replaced by new ones
+    4) An emptied session is deleted from the store and its cookie removed
+    '''
+
+    app = create_app(config_class=CountingStoreConfig)
+    store = app.extensions['sessions'].store
+
+    @app.route('/write')
+    def write():
+        session['value'] = 1
+        return ''
+
+    @app.route('/read')
+    def read():
+        return str(session.get('value'))
+
+    @app.route('/untouched')
+    def untouched():
+        return ''
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return ''
+
+    client = app.test_client(use_cookies=True)
+
+    # (1)
+    response = client.get('/write')
+    assert store.calls == ['save']
+    sid = response.headers['Set-Cookie'].split(';')[0].split('=')[1]
+    response = client.get('/read')
+    assert response.data == b'1' and 'Set-Cookie' not in response.headers
+    assert store.calls == ['save', 'load']
+
+    # (2)
+    app.test_client().get('/untouched')
+    assert store.calls == ['save', 'load']
+
+    # (3)
+    client.set_cookie('localhost', app.session_cookie_name, 'c' * 43)
+    response = client.get('/write')
+    new_sid = response.headers['Set-Cookie'].split(';')[0].split('=')[1]
+    assert new_sid not in (sid, 'c' * 43)
+    assert store.calls == ['save', 'load', 'load', 'save']
+
+    # (4)
+    response = client.get('/clear')
+    assert store.load(new_sid) is None
+    assert f"{app.session_cookie_name}=;" in response.headers['Set-Cookie']
@@ -0,0 +1,60 @@
+import pytest
+
+from authorization_server import urls
+
+
+@pytest.fixture
+def reset_database():
+    pass
+
+
+def test_is_url_valid():
+
+    assert not any(map(urls.is_url_valid, ['something', 'https://not url', 'http://www.appdomain.com', None]))
+    assert all(map(urls.is_url_valid, ['https://localhost', 'https://appdomain.com', 'https://www.appdomain.com']))
+
+
+def test_normalise():
+    '''Test that scheme and host are lower-cased, default ports dropped and empty paths made '/' while the path and the
+    query are kept, and that strings that are not absolute urls are returned unchanged
+    '''
+
+    assert urls.normalise('HTTPS://App.Domain.com:443') == 'https://app.domain.com/'
+    assert urls.normalise('https://app.domain.com:8443/Call/Back?A=1') == 'https://app.domain.com:8443/Call/Back?A=1'
+    assert urls.normalise('https://user@[::1]:443/callback') == 'https://user@[::1]/callback'
+    assert all(urls.normalise(url) == url for url in ('something', '/callback', 'https://app.domain.com:port/'))
+
+
+def test_redirect_registry():
+    '''Test that the registry:
+
+    1) Loads the redirect uris of a client once and matches uris by their normalised form
+    2) Does not remember clients that do not exist
+    3) Loads the redirect uris of a client again once invalidated
+    '''
+
+    loaded = []
+
+    def loader(client_ids):
+        loaded.extend(client_ids)
+        return {'client': frozenset(['https://app.com/callback', 'https://app.com/other'])} \
+            if 'client' in client_ids else {}
+
+    registry = urls.RedirectRegistry()
+
+    # (1)
+    assert registry.is_allowed('client', 'https://APP.com:443/callback', loader)
+    assert registry.is_allowed('client', 'https://app.com/other', loader)
+    assert not registry.is_allowed('client', 'https://app.com/Callback', loader)
+    assert not registry.is_allowed('client', None, loader)
+    assert loaded == ['client']
+
+    # (2)
+    assert not registry.is_allowed('unknown', 'https://app.com/callback', loader)
+    assert not registry.is_allowed('unknown', 'https://app.com/callback', loader)
+    assert loaded == ['client', 'unknown', 'unknown']
+
+    # (3)
+    registry.invalidate('client')
+    assert registry.is_allowed('client', 'https://app.com/callback', loader)
+    assert loaded == ['client', 'unknown', 'unknown', 'client']
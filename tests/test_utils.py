@@ -1,5 +1,6 @@
 import pytest
 
+from sqlalchemy import exc
 from authorization_server import utils
 from unittest.mock import patch, MagicMock
 
@@ -94,3 +95,18 @@ def test_login_required():
                         query_strings = additional_arguments
                         mock_redirect.assert_called_once()
                         mock_url_for.assert_called_once_with(route, **query_strings)
+
+
+@pytest.mark.parametrize('message, column', [
+    ("(1062, \"Duplicate entry 'info@app.com' for key 'email'\")", 'email'),
+    ("(1062, \"Duplicate entry 'https://app.com' for key 'application.web_url'\")", 'web_url'),
+    ('UNIQUE constraint failed: application.redirect_uri', 'redirect_uri'),
+    ('duplicate key value violates unique constraint "application_email_key"\nDETAIL:  Key (email)=(a@b.com) already '
+     'exists.', 'email'),
+    ('NOT NULL constraint failed: application.name', None),
+])
+def test_duplicate_column(message, column):
+    '''Ensure that the column of a unique constraint violation is told from the error message of each database
+    '''
+
+    assert utils.duplicate_column(exc.IntegrityError('INSERT ...', {}, Exception(message))) == column
@@ -6,7 +6,7 @@ from sqlalchemy import Table
 from authorization_server import config, models
 from authorization_server.app import db, bcrypt
 
-table_names = [models.User, models.AuthorisationCode, models.Application]
+table_names = [models.User, models.AuthorisationCode, models.RedirectURI, models.Application, models.WebSession]
 TEST_PATH = join(config.ROOT_PATH, 'tests')
 COMMON_ENTITY_PASSWORD = 'abcD1234'
 